@@ -0,0 +1,157 @@
+"""
+Two-level answer cache for RAG queries: exact normalized question, then
+semantic match on the query embedding
+"""
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+import numpy as np
+
+
+class AnswerCache:
+    def __init__(self, max_entries: int = None, ttl_seconds: float = None,
+                 semantic_threshold: float = None, semantic_max_entries: int = None):
+        self.max_entries = max_entries or int(os.getenv("RAG_CACHE_MAX_ENTRIES", "1024"))
+        self.ttl = ttl_seconds if ttl_seconds is not None else float(os.getenv("RAG_CACHE_TTL_SECONDS", "3600"))
+        self.semantic_threshold = semantic_threshold if semantic_threshold is not None else float(
+            os.getenv("RAG_CACHE_SEMANTIC_THRESHOLD", "0.92")
+        )
+        self.semantic_max_entries = semantic_max_entries or int(os.getenv("RAG_CACHE_SEMANTIC_MAX_ENTRIES", "512"))
+
+        self._lock = threading.Lock()
+        # Bumped on every invalidation; answers computed against an older
+        # knowledge base are dropped instead of being stored
+        self.generation = 0
+
+        # Level 1: normalized question -> (result, expires_at)
+        self._exact = OrderedDict()
+
+        # Level 2: fixed slots of unit-normalized embeddings, LRU order kept by key
+        self._semantic_order = OrderedDict()  # normalized question -> slot
+        self._matrix = None
+        self._expires = np.zeros(self.semantic_max_entries, dtype=np.float64)
+        self._active = np.zeros(self.semantic_max_entries, dtype=bool)
+        self._results = [None] * self.semantic_max_entries
+        self._slot_keys = [None] * self.semantic_max_entries
+        self._free_slots = list(range(self.semantic_max_entries - 1, -1, -1))
+
+        self._counters = {"exact_hits": 0, "semantic_hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    @staticmethod
+    def normalize(question: str) -> str:
+        """Lowercase, drop punctuation and collapse whitespace"""
+        return " ".join(re.sub(r"[^\w\s₹]", " ", question.lower()).split())
+
+    def get_exact(self, question: str) -> Optional[Dict]:
+        key = self.normalize(question)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._exact.get(key)
+            if entry is not None:
+                result, expires_at = entry
+                if expires_at > now:
+                    self._exact.move_to_end(key)
+                    self._counters["exact_hits"] += 1
+                    return result
+                del self._exact[key]
+        return None
+
+    def get_semantic(self, question: str, embedding) -> Optional[Dict]:
+        query = self._unit(embedding)
+        now = time.monotonic()
+        with self._lock:
+            if self._matrix is None or not self._active.any():
+                self._counters["misses"] += 1
+                return None
+            scores = self._matrix @ query
+            usable = self._active & (self._expires > now)
+            scores[~usable] = -np.inf
+            best = int(np.argmax(scores))
+            if scores[best] < self.semantic_threshold:
+                self._counters["misses"] += 1
+                return None
+
+            result = self._results[best]
+            self._semantic_order.move_to_end(self._slot_keys[best])
+            # Remember this phrasing too, so the next identical ask skips embedding
+            self._put_exact(self.normalize(question), result, self._expires[best])
+            self._counters["semantic_hits"] += 1
+            return result
+
+    def put(self, question: str, embedding, result: Dict, generation: int):
+        key = self.normalize(question)
+        expires_at = time.monotonic() + self.ttl
+        with self._lock:
+            if generation != self.generation:
+                return
+            self._put_exact(key, result, expires_at)
+            if embedding is not None:
+                self._put_semantic(key, self._unit(embedding), result, expires_at)
+
+    def invalidate(self):
+        with self._lock:
+            self.generation += 1
+            self._exact.clear()
+            self._semantic_order.clear()
+            self._active[:] = False
+            self._results = [None] * self.semantic_max_entries
+            self._slot_keys = [None] * self.semantic_max_entries
+            self._free_slots = list(range(self.semantic_max_entries - 1, -1, -1))
+            self._counters["invalidations"] += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self._counters["exact_hits"] + self._counters["semantic_hits"] + self._counters["misses"]
+            hits = self._counters["exact_hits"] + self._counters["semantic_hits"]
+            return {
+                **self._counters,
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+                "exact_entries": len(self._exact),
+                "semantic_entries": len(self._semantic_order),
+                "max_entries": self.max_entries,
+                "semantic_max_entries": self.semantic_max_entries,
+                "ttl_seconds": self.ttl,
+                "semantic_threshold": self.semantic_threshold,
+                "generation": self.generation
+            }
+
+    def _put_exact(self, key: str, result: Dict, expires_at: float):
+        self._exact[key] = (result, expires_at)
+        self._exact.move_to_end(key)
+        while len(self._exact) > self.max_entries:
+            self._exact.popitem(last=False)
+            self._counters["evictions"] += 1
+
+    def _put_semantic(self, key: str, vector: np.ndarray, result: Dict, expires_at: float):
+        if self._matrix is None:
+            self._matrix = np.zeros((self.semantic_max_entries, vector.shape[0]), dtype=np.float32)
+
+        slot = self._semantic_order.get(key)
+        if slot is None:
+            if not self._free_slots:
+                _, evicted = self._semantic_order.popitem(last=False)
+                self._active[evicted] = False
+                self._results[evicted] = None
+                self._slot_keys[evicted] = None
+                self._free_slots.append(evicted)
+                self._counters["evictions"] += 1
+            slot = self._free_slots.pop()
+            self._semantic_order[key] = slot
+            self._slot_keys[slot] = key
+        else:
+            self._semantic_order.move_to_end(key)
+
+        self._matrix[slot] = vector
+        self._expires[slot] = expires_at
+        self._active[slot] = True
+        self._results[slot] = result
+
+    @staticmethod
+    def _unit(embedding) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32).ravel()
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
@@ -0,0 +1,95 @@
+"""
+Throughput of /api/chat/batch against the same questions sent one by one to /api/chat
+
+Start the backend, then run from the backend directory:
+
+    python benchmarks/bench_batch.py --url http://localhost:8000 --questions 10000
+
+Questions are the labeled set in questions.json, repeated with a numbered
+suffix up to --questions, so none of them is answered from the cache (the
+suffixes differ between the two runs too). The sequential run sends them
+one request at a time over a keep-alive session, the way a script looping
+over /api/chat would; pass --sequential to time only the first N of them and
+extrapolate. The batch run sends one request and reads the NDJSON lines as
+they arrive. Without an API key the server answers with the rule-based
+generator, so this measures the encode, search and request overhead that
+batching removes; point the server's HF_API_URL at stub_llm_server.py to
+include a simulated LLM.
+"""
+import argparse
+import json
+import time
+from pathlib import Path
+
+import requests
+
+QUESTIONS_FILE = Path(__file__).resolve().parent / "questions.json"
+
+
+def make_questions(count: int, tag: str):
+    with open(QUESTIONS_FILE, "r", encoding="utf-8") as f:
+        base = [item["question"] for item in json.load(f)]
+    return [f"{base[i % len(base)]} ({tag} {i})" for i in range(count)]
+
+
+def run_sequential(url: str, questions):
+    session = requests.Session()
+    errors = 0
+    start = time.perf_counter()
+    for question in questions:
+        try:
+            response = session.post(f"{url}/api/chat", json={"message": question}, timeout=120)
+            errors += response.status_code != 200
+        except requests.RequestException:
+            errors += 1
+    return time.perf_counter() - start, errors
+
+
+def run_batch(url: str, questions):
+    start = time.perf_counter()
+    first = None
+    seen = set()
+    errors = 0
+    with requests.post(f"{url}/api/chat/batch", json={"questions": questions}, stream=True, timeout=3600) as response:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            if not line:
+                continue
+            if first is None:
+                first = time.perf_counter() - start
+            item = json.loads(line)
+            if "error" in item:
+                errors += 1
+            else:
+                seen.add(item["index"])
+    missing = len(questions) - len(seen)
+    return time.perf_counter() - start, first or 0.0, errors + missing
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--questions", type=int, default=10000)
+    parser.add_argument("--sequential", type=int, default=0,
+                        help="time only this many sequential requests and extrapolate (0 = all)")
+    args = parser.parse_args()
+
+    sequential_questions = make_questions(args.questions, "seq")
+    if args.sequential:
+        sequential_questions = sequential_questions[:args.sequential]
+    seconds, errors = run_sequential(args.url, sequential_questions)
+    sequential_rate = len(sequential_questions) / seconds
+    sequential_total = args.questions / sequential_rate
+    note = "" if len(sequential_questions) == args.questions else f" (extrapolated from {len(sequential_questions)})"
+    print(f"sequential /api/chat: {sequential_rate:8.1f} questions/s, {sequential_total:8.1f} s for "
+          f"{args.questions}{note}, {errors} errors")
+
+    seconds, first, errors = run_batch(args.url, make_questions(args.questions, "batch"))
+    batch_rate = args.questions / seconds
+    print(f"/api/chat/batch:      {batch_rate:8.1f} questions/s, {seconds:8.1f} s for {args.questions}, "
+          f"first result after {first * 1000:.0f} ms, {errors} errors")
+    print(f"speedup: {batch_rate / sequential_rate:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
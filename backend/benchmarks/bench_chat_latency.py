@@ -0,0 +1,118 @@
+"""
+Load benchmark for /api/chat: p50/p99 latency at several client concurrencies
+
+Start the backend, then run from the backend directory:
+
+    python benchmarks/bench_chat_latency.py --url http://localhost:8000
+
+To compare before/after, run it once against a server started from the
+previous commit and once against the current tree, with the same settings.
+A concurrent GET /health probe is timed alongside the chat load to show
+whether slow queries stall the event loop.
+"""
+import argparse
+import json
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+import requests
+
+QUESTIONS = [
+    "What are the B.Tech courses available?",
+    "What are the hostel fees?",
+    "Tell me about the library",
+    "How do I apply through MET?",
+    "What sports facilities are there?",
+    "What is the fee for M.Tech?",
+]
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def run_level(url: str, concurrency: int, requests_per_client: int) -> Dict:
+    latencies = []
+    statuses = {}
+    lock = threading.Lock()
+    stop_probe = threading.Event()
+    probe_latencies = []
+
+    def client(client_id: int):
+        session = requests.Session()
+        for i in range(requests_per_client):
+            question = QUESTIONS[(client_id + i) % len(QUESTIONS)]
+            start = time.perf_counter()
+            try:
+                response = session.post(f"{url}/api/chat", json={"message": question}, timeout=120)
+                status = response.status_code
+            except requests.RequestException:
+                status = "error"
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                statuses[status] = statuses.get(status, 0) + 1
+
+    def probe():
+        session = requests.Session()
+        while not stop_probe.is_set():
+            start = time.perf_counter()
+            try:
+                session.get(f"{url}/health", timeout=60)
+            except requests.RequestException:
+                pass
+            probe_latencies.append(time.perf_counter() - start)
+            stop_probe.wait(0.1)
+
+    probe_thread = threading.Thread(target=probe, daemon=True)
+    probe_thread.start()
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(client, range(concurrency)))
+    wall = time.perf_counter() - wall_start
+    stop_probe.set()
+    probe_thread.join()
+
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "mean_ms": round(statistics.mean(latencies) * 1000, 1) if latencies else 0.0,
+        "qps": round(len(latencies) / wall, 2) if wall else 0.0,
+        "health_p99_ms": round(percentile(probe_latencies, 99) * 1000, 1),
+        "statuses": statuses
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--levels", default="1,16,64", help="Comma-separated client counts")
+    parser.add_argument("--requests-per-client", type=int, default=10)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    results = []
+    for level in [int(x) for x in args.levels.split(",") if x.strip()]:
+        results.append(run_level(args.url.rstrip("/"), level, args.requests_per_client))
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'clients':>8} {'reqs':>6} {'p50 ms':>10} {'p99 ms':>10} {'qps':>8} {'/health p99':>12}  statuses")
+    for r in results:
+        print(f"{r['concurrency']:>8} {r['requests']:>6} {r['p50_ms']:>10} {r['p99_ms']:>10} "
+              f"{r['qps']:>8} {r['health_p99_ms']:>12}  {r['statuses']}")
+
+
+if __name__ == "__main__":
+    main()
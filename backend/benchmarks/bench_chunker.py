@@ -0,0 +1,170 @@
+"""
+Chunker benchmark: retrieval quality on the real data files and throughput
+plus peak memory on a large synthetic corpus
+
+Run from the backend directory (after the backend has collected data/):
+
+    python benchmarks/bench_chunker.py --synthetic-mb 200
+
+Quality compares the original ". "-split chunker (reproduced below) with
+JsonChunker: a labeled question counts as a hit at k when one of the top-k
+retrieved chunks contains its expected answer. Throughput streams a
+generated JSON file through JsonChunker.chunk_file; peak Python memory is
+measured with tracemalloc (install ijson for flat memory on .json input).
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from chunker import JsonChunker
+from ingest import discover_sources, source_key, source_name
+from rag_system import EMBEDDING_MODEL_NAME
+
+BENCH_DIR = Path(__file__).resolve().parent
+
+
+def legacy_chunks(data, source: str):
+    """The chunker this module replaced: flatten, split on '. ', pack 400 chars"""
+    def extract_text(obj, prefix=""):
+        texts = []
+        if isinstance(obj, dict):
+            for key, value in obj.items():
+                key_text = key.replace("_", " ").title()
+                if isinstance(value, (dict, list)):
+                    texts.extend(extract_text(value, f"{prefix} {key_text}"))
+                else:
+                    texts.append(f"{prefix} {key_text}: {value}")
+        elif isinstance(obj, list):
+            for item in obj:
+                if isinstance(item, (dict, list)):
+                    texts.extend(extract_text(item, prefix))
+                else:
+                    texts.append(f"{prefix}: {item}")
+        else:
+            texts.append(f"{prefix}: {obj}")
+        return texts
+
+    chunks, current, length = [], [], 0
+    for sentence in " ".join(extract_text(data)).split(". "):
+        if length + len(sentence) > 400 and current:
+            chunks.append({"text": ". ".join(current) + ".", "metadata": {"source": source}})
+            current, length = [sentence], len(sentence)
+        else:
+            current.append(sentence)
+            length += len(sentence)
+    if current:
+        chunks.append({"text": ". ".join(current) + ".", "metadata": {"source": source}})
+    return chunks
+
+
+def load_chunks(chunk_fn, data_dir: Path):
+    chunks = []
+    for path in discover_sources(data_dir):
+        if path.suffix == ".json":
+            with open(path, "r", encoding="utf-8") as f:
+                chunks.extend(chunk_fn(json.load(f), source_name(source_key(data_dir, path))))
+    return chunks
+
+
+def hit_rates(model, chunks, questions, ks):
+    vectors = model.encode([c["text"] for c in chunks], normalize_embeddings=True)
+    queries = model.encode([q["question"] for q in questions], normalize_embeddings=True)
+    ranking = np.argsort(-(queries @ vectors.T), axis=1)
+    rates = {}
+    for k in ks:
+        hits = 0
+        for q, question in enumerate(questions):
+            if any(question["answer"] in chunks[i]["text"] for i in ranking[q, :k]):
+                hits += 1
+        rates[k] = hits / len(questions)
+    return rates
+
+
+def quality(data_dir: Path, ks):
+    from sentence_transformers import SentenceTransformer
+
+    with open(BENCH_DIR / "questions.json", "r", encoding="utf-8") as f:
+        questions = json.load(f)
+    model = SentenceTransformer(EMBEDDING_MODEL_NAME)
+    chunker = JsonChunker()
+
+    header = " ".join(f"{'hit@' + str(k):>7}" for k in ks)
+    print(f"{'chunker':<12} {'chunks':>7} {'avg chars':>10} {header}")
+    for name, fn in [("legacy", legacy_chunks), ("structured", lambda d, s: list(chunker.chunk_data(d, s)))]:
+        chunks = load_chunks(fn, data_dir)
+        rates = hit_rates(model, chunks, questions, ks)
+        avg = sum(len(c["text"]) for c in chunks) / max(len(chunks), 1)
+        print(f"{name:<12} {len(chunks):>7} {avg:>10.0f} " + " ".join(f"{rates[k]:>7.2f}" for k in ks))
+
+
+def write_synthetic(path: Path, target_mb: int):
+    """A departments -> pages -> sections tree, written incrementally"""
+    rng = random.Random(0)
+    words = ("fees hostel library admission scholarship laboratory research campus semester "
+             "course faculty placement exam timetable department project seminar").split()
+    target = target_mb * 1024 * 1024
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("{")
+        written, dept = 0, 0
+        while written < target:
+            pages = {
+                f"page_{p}": {
+                    "title": " ".join(rng.choices(words, k=5)),
+                    "sections": [" ".join(rng.choices(words, k=rng.randint(10, 60))) for _ in range(rng.randint(2, 6))],
+                    "contact": f"dept{dept}@manipal.edu"
+                }
+                for p in range(20)
+            }
+            blob = ("," if dept else "") + json.dumps(f"department_{dept}") + ":" + json.dumps(pages)
+            f.write(blob)
+            written += len(blob)
+            dept += 1
+        f.write("}")
+
+
+def throughput(target_mb: int):
+    chunker = JsonChunker()
+    with tempfile.TemporaryDirectory(prefix="manipal-chunker-") as work:
+        path = Path(work) / "synthetic.json"
+        write_synthetic(path, target_mb)
+        size_mb = os.path.getsize(path) / (1024 * 1024)
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        count = 0
+        for _ in chunker.chunk_file(path, "synthetic"):
+            count += 1
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    print(f"synthetic {size_mb:.0f} MB: {count} chunks in {elapsed:.1f} s "
+          f"({size_mb / elapsed:.1f} MB/s, {count / elapsed:.0f} chunks/s), peak traced memory {peak / 1e6:.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data-dir", default="data")
+    parser.add_argument("--k", default="1,3,5,8")
+    parser.add_argument("--synthetic-mb", type=int, default=200)
+    parser.add_argument("--skip-quality", action="store_true")
+    args = parser.parse_args()
+
+    if not args.skip_quality:
+        quality(Path(args.data_dir), [int(k) for k in args.k.split(",")])
+    if args.synthetic_mb:
+        throughput(args.synthetic_mb)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Cold-start knowledge-base build time with an empty vs a warm embedding cache
+
+Run from the backend directory:
+
+    python benchmarks/bench_cold_start.py
+
+Both runs start from an empty Chroma directory, as on a fresh deploy; the
+only difference is whether the on-disk embedding cache already holds the
+document vectors.
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+def build(work: Path, label: str) -> float:
+    from rag_system import RAGSystem
+
+    chroma_dir = work / f"chroma_{label}"
+    shutil.rmtree(chroma_dir, ignore_errors=True)
+    rag = RAGSystem(data_dir=str(work / "data"), chroma_dir=str(chroma_dir))
+    start = time.perf_counter()
+    rag.initialize()
+    elapsed = time.perf_counter() - start
+    stats = rag.embedding_store.stats()
+    print(f"{label:<12} {elapsed * 1000:>10.1f} ms   cache hits {stats['hits']:>6}  misses {stats['misses']:>6}")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--keep", action="store_true", help="Keep the temporary work directory")
+    args = parser.parse_args()
+
+    work = Path(tempfile.mkdtemp(prefix="manipal-coldstart-"))
+    os.environ["RAG_EMBEDDING_CACHE_DIR"] = str(work / "embedding_cache")
+
+    from data_collector import DataCollector
+    collector = DataCollector()
+    collector.data_dir = work / "data"
+    collector.data_dir.mkdir(exist_ok=True)
+    collector.collect_all_data()
+
+    try:
+        cold = build(work, "empty cache")
+        warm = build(work, "warm cache")
+        print(f"speed-up: {cold / warm:.1f}x")
+    finally:
+        if not args.keep:
+            shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
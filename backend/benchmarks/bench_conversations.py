@@ -0,0 +1,80 @@
+"""
+Memory and speed of the conversation store as active sessions grow
+
+    python benchmarks/bench_conversations.py --sessions 10000,50000,100000,200000 --max-mb 64
+    python benchmarks/bench_conversations.py --db /tmp/conversations.db
+
+Each session asks --turns questions (round-robin across sessions, so the
+LRU order is the worst case) with top-8 chunk IDs per turn, then every
+session is looked up once more. Memory is measured with tracemalloc, so it
+covers exactly what the store allocates: it should grow with sessions until
+the cap, then stay flat while older sessions are evicted (or spilled to --db
+and read back on their next lookup).
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from conversations import ConversationStore, Turn
+
+QUESTIONS = [
+    "What are the hostel fees?",
+    "and for girls?",
+    "What are the B.Tech courses available?",
+    "what about their fees?",
+    "Tell me about the library",
+    "what are its timings?",
+]
+
+
+def run(sessions: int, turns: int, max_mb: float, db_path: str):
+    if db_path and os.path.exists(db_path):
+        os.remove(db_path)
+    tracemalloc.start()
+    store = ConversationStore(max_turns=6, max_bytes=int(max_mb * 1024 * 1024), db_path=db_path)
+    start = time.perf_counter()
+    ops = 0
+    for t in range(turns):
+        question = QUESTIONS[t % len(QUESTIONS)]
+        for s in range(sessions):
+            conversation_id = f"session-{s:08d}"
+            store.last(conversation_id)
+            chunk_ids = [f"fees_{(s * 8 + i) % 99991:020x}" for i in range(8)]
+            store.append(conversation_id, Turn(f"{question} ({s})", question, "fees", chunk_ids))
+            ops += 2
+    write_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    found = sum(store.last(f"session-{s:08d}") is not None for s in range(sessions))
+    read_seconds = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    stats = store.stats()
+    print(f"{sessions:>9} {stats['conversations']:>9} {stats['bytes'] / 2**20:>10.1f} {current / 2**20:>10.1f} "
+          f"{peak / 2**20:>9.1f} {ops / write_seconds:>11.0f} {sessions / read_seconds:>11.0f} "
+          f"{found:>9} {stats['spilled']:>9} {stats['restored']:>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", default="10000,50000,100000,200000")
+    parser.add_argument("--turns", type=int, default=3)
+    parser.add_argument("--max-mb", type=float, default=64)
+    parser.add_argument("--db", default="", help="SQLite file to spill evicted sessions to")
+    args = parser.parse_args()
+
+    print(f"cap {args.max_mb:.0f} MB, {args.turns} turns per session, spill: {args.db or 'off'}")
+    print(f"{'sessions':>9} {'in memory':>9} {'est. MB':>10} {'traced MB':>10} {'peak MB':>9} {'write ops/s':>11} "
+          f"{'reads/s':>11} {'found':>9} {'spilled':>9} {'restored':>9}")
+    for sessions in [int(n) for n in args.sessions.split(",")]:
+        run(sessions, args.turns, args.max_mb, args.db)
+
+
+if __name__ == "__main__":
+    main()
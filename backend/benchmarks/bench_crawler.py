@@ -0,0 +1,71 @@
+"""
+Crawler throughput and recrawl cost against the local fixture site
+
+Run from the backend directory:
+
+    python benchmarks/bench_crawler.py --pages 200 --latency-ms 50
+
+1. A sequential crawl (one request at a time) as the baseline.
+2. A concurrent crawl of the same site into an empty cache.
+3. A recrawl: every page should come back 304 and no file is rewritten.
+4. A recrawl after changing a few pages: only those pages are rewritten.
+"""
+import argparse
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from crawler import Crawler
+from fixture_site import FixtureSite, start_fixture_site
+
+
+def crawl(label: str, site: FixtureSite, url: str, work: Path, cache: str, **kwargs):
+    before = dict(site.counts)
+    start = time.perf_counter()
+    stats = Crawler([url], data_dir=str(work / "data"), cache_dir=str(work / cache),
+                    max_pages=site.pages + 10, max_depth=50, delay=0.0, **kwargs).crawl()
+    elapsed = time.perf_counter() - start
+    served = {key: site.counts[key] - before[key] for key in site.counts}
+    print(f"{label:<24} {elapsed:>7.2f} s  {site.pages / elapsed:>7.1f} pages/s  "
+          f"written {stats['written']:>4}  unchanged {stats['unchanged']:>4}  "
+          f"server 200s {served['200']:>4}  304s {served['304']:>4}  disallowed {stats['disallowed']}")
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--changed", type=int, default=5)
+    args = parser.parse_args()
+
+    site = FixtureSite(args.pages, latency_ms=args.latency_ms)
+    server = start_fixture_site(site=site)
+    url = f"http://127.0.0.1:{server.server_address[1]}/"
+    work = Path(tempfile.mkdtemp(prefix="manipal-crawl-"))
+    try:
+        crawl("sequential", site, url, work / "sequential", "cache",
+              concurrency=1, per_host_concurrency=1, parse_workers=0)
+        crawl("concurrent", site, url, work, "cache",
+              concurrency=args.concurrency, per_host_concurrency=args.concurrency)
+        crawl("recrawl (no changes)", site, url, work, "cache",
+              concurrency=args.concurrency, per_host_concurrency=args.concurrency)
+        for page in range(1, args.changed + 1):
+            site.touch(page)
+        stats = crawl(f"recrawl ({args.changed} changed)", site, url, work, "cache",
+                      concurrency=args.concurrency, per_host_concurrency=args.concurrency)
+        pages = sorted((work / "data" / "crawl").rglob("*.md"))
+        print(f"{len(pages)} page files under data/crawl; {stats['written']} rewritten on the last recrawl")
+    finally:
+        server.shutdown()
+        shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Query embedding throughput: one encode call per question vs the micro-batcher
+
+Run from the backend directory:
+
+    python benchmarks/bench_embedding_batcher.py --clients 32 --windows 0,1,2,5,10,20
+
+Each client thread encodes questions back to back, like concurrent
+/api/chat requests on the query worker pool.
+"""
+import argparse
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sentence_transformers import SentenceTransformer
+
+from embedding_batcher import EmbeddingBatcher
+
+QUESTIONS = [
+    "What are the fees for B.Tech?",
+    "hostel fees?",
+    "Which entrance exams are accepted for M.Tech?",
+    "What are the library timings on Sunday?",
+    "Is there a gym on campus?",
+    "How many books does the library have?",
+    "What specializations does CSE offer?",
+    "When does the application start?",
+]
+
+
+def run(encode, clients: int, per_client: int) -> float:
+    def client(client_id: int):
+        for i in range(per_client):
+            encode(QUESTIONS[(client_id + i) % len(QUESTIONS)])
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        list(pool.map(client, range(clients)))
+    return clients * per_client / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--per-client", type=int, default=20)
+    parser.add_argument("--windows", default="0,1,2,5,10,20", help="Batch windows in ms")
+    parser.add_argument("--max-batch-size", type=int, default=32)
+    args = parser.parse_args()
+
+    model = SentenceTransformer(args.model)
+    model.encode(QUESTIONS)  # warm up
+
+    def one_by_one(text):
+        return model.encode([text])[0]
+
+    baseline = run(one_by_one, args.clients, args.per_client)
+    print(f"{'path':<24} {'queries/sec':>12} {'avg batch':>10}")
+    print(f"{'one-by-one':<24} {baseline:>12.1f} {1:>10}")
+
+    for window in [float(x) for x in args.windows.split(",") if x.strip()]:
+        batcher = EmbeddingBatcher(model, max_batch_size=args.max_batch_size, max_wait_ms=window)
+        qps = run(batcher.encode, args.clients, args.per_client)
+        label = f"batched ({window:g} ms)"
+        print(f"{label:<24} {qps:>12.1f} {batcher.stats()['avg_batch_size']:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Encoder backends: single-question latency, bulk docs/sec and agreement with PyTorch
+
+Run from the backend directory (after the backend has collected data/):
+
+    python benchmarks/bench_encoders.py --backends torch,onnx,onnx-int8 --threads 4
+
+Documents are the production chunks of everything under data/ (repeated up
+to --docs), questions are the labeled set in questions.json. Latency is one
+question per encode call, as the micro-batcher sees under light load; bulk
+throughput encodes every document in batches of --batch-size, as a rebuild
+does. Each ONNX backend is compared with the PyTorch vectors of the same
+documents (minimum and mean cosine similarity) and by how many of the top-8
+chunks per question it retrieves in common with PyTorch. The first run
+exports the model to RAG_ONNX_DIR, which is reported as load time.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from eval_retrieval import BENCH_DIR, load_corpus, percentile
+from rag_system import EMBEDDING_MODEL_NAME
+
+
+def measure(encoder, questions, docs, batch_size: int, repeat: int):
+    for question in questions[:8]:
+        encoder.encode([question])  # warm up
+    latencies = []
+    for _ in range(repeat):
+        for question in questions:
+            start = time.perf_counter()
+            encoder.encode([question])
+            latencies.append((time.perf_counter() - start) * 1000)
+    start = time.perf_counter()
+    vectors = np.asarray(encoder.encode(docs, batch_size=batch_size), dtype=np.float32)
+    docs_per_second = len(docs) / (time.perf_counter() - start)
+    query_vectors = np.asarray(encoder.encode(questions, batch_size=batch_size), dtype=np.float32)
+    return latencies, docs_per_second, vectors, query_vectors
+
+
+def top_k(vectors, query_vectors, k: int):
+    return np.argsort(-(query_vectors @ vectors.T), axis=1)[:, :k]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", default="torch,onnx,onnx-int8")
+    parser.add_argument("--data-dir", default="data")
+    parser.add_argument("--questions", default=str(BENCH_DIR / "questions.json"))
+    parser.add_argument("--docs", type=int, default=2000, help="Documents to encode for bulk throughput")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--repeat", type=int, default=5, help="Timed passes over the question set")
+    parser.add_argument("--threads", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    # Same thread budget for every backend
+    os.environ["RAG_ONNX_INTRA_OP_THREADS"] = str(args.threads)
+    import torch
+
+    torch.set_num_threads(args.threads)
+    from encoders import make_encoder
+
+    with open(args.questions, "r", encoding="utf-8") as f:
+        questions = [item["question"] for item in json.load(f)]
+    _, texts, _ = load_corpus(Path(args.data_dir))
+    docs = [texts[i % len(texts)] for i in range(max(args.docs, len(texts)))]
+    print(f"{len(docs)} documents ({len(texts)} distinct chunks), {len(questions)} questions, "
+          f"{args.threads} threads")
+    print(f"{'backend':<10} {'load s':>8} {'p50 ms':>8} {'p95 ms':>8} {'docs/s':>9} "
+          f"{'min cos':>8} {'mean cos':>9} {'top-8 overlap':>14}")
+
+    reference = None
+    for kind in [k.strip() for k in args.backends.split(",") if k.strip()]:
+        start = time.perf_counter()
+        encoder = make_encoder(kind, EMBEDDING_MODEL_NAME)
+        load_seconds = time.perf_counter() - start
+        latencies, docs_per_second, vectors, query_vectors = measure(
+            encoder, questions, docs, args.batch_size, args.repeat
+        )
+        vectors = vectors[:len(texts)]
+        if reference is None:
+            reference = (kind, vectors, query_vectors, top_k(vectors, query_vectors, 8))
+            agreement = "(reference)"
+        else:
+            cosine = np.sum(vectors * reference[1], axis=1) / (
+                np.linalg.norm(vectors, axis=1) * np.linalg.norm(reference[1], axis=1)
+            )
+            found = top_k(vectors, query_vectors, 8)
+            overlap = np.mean([len(set(a) & set(b)) / 8 for a, b in zip(found, reference[3])])
+            agreement = f"{cosine.min():>8.5f} {cosine.mean():>9.5f} {overlap:>14.3f}"
+        print(f"{kind:<10} {load_seconds:>8.2f} {percentile(latencies, 50):>8.2f} {percentile(latencies, 95):>8.2f} "
+              f"{docs_per_second:>9.0f} {agreement}")
+        del encoder
+    if reference is not None and reference[0] != "torch":
+        print(f"(agreement is measured against {reference[0]}, the first backend listed)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Rule-based fallback throughput: the intent engine vs. the old substring chain
+
+Run from the backend directory:
+
+    python benchmarks/bench_fallback.py --seconds 3
+
+This is the path every request takes while the LLM is down. Two workloads:
+
+- intent: questions answered from intents.json alone (RAG not initialized)
+- context: questions answered from their top-8 retrieved chunks (BM25 over
+  data/, so no embedding model is needed); skipped when data/ is empty
+
+The "legacy" side re-creates the previous implementation's costs: an
+any(word in question) substring check per keyword in order, the answer
+concatenated piece by piece on every call, and a substring test of every word
+of every context sentence against the question. It also reports how often
+the two pick a different intent, since whole-word matching no longer fires on
+"lab" in "available" or "met" in "method".
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bm25 import BM25Index
+from chunker import JsonChunker
+from ingest import chunk_id, discover_sources, source_key, source_name
+from intents import CLOSING, INTENTS_FILE, IntentEngine
+
+BENCH_DIR = Path(__file__).resolve().parent
+
+
+class LegacyFallback:
+    def __init__(self, path=INTENTS_FILE):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        self.intents = data["intents"]
+        self.default = data["default"]["answer"]
+
+    def answer(self, question: str) -> str:
+        question_lower = question.lower()
+        lines = self.default
+        for intent in self.intents:
+            if any(word in question_lower for word in intent["keywords"]):
+                lines = intent["answer"]
+                break
+        response = ""
+        for i, line in enumerate(lines):
+            response += line if i == 0 else "\n" + line
+        return response
+
+    def context_answer(self, question: str, contexts) -> str:
+        question_lower = question.lower()
+        relevant_sections = []
+        all_info = {}
+        for context in contexts:
+            for sentence in context.split(". "):
+                sentence_clean = sentence.strip()
+                if not sentence_clean:
+                    continue
+                sentence_lower = sentence_clean.lower()
+                if any(word in question_lower for word in sentence_lower.split()):
+                    relevant_sections.append(sentence_clean)
+                if ":" in sentence_clean:
+                    key, value = sentence_clean.split(":", 1)
+                    all_info.setdefault(key.strip().lower(), []).append(value.strip())
+        if not relevant_sections:
+            return self.answer(question)
+        unique_sections = list(dict.fromkeys(relevant_sections))
+        answer_parts = [unique_sections[0]] + [s for s in unique_sections[1:6] if len(s) > 20]
+        answer = ". ".join(answer_parts)
+        if not answer.endswith((".", "!", "?")):
+            answer += "."
+        if len(answer_parts) > 1:
+            answer += CLOSING
+        return answer
+
+
+def load_contexts(data_dir: Path, questions, top_k: int):
+    chunker = JsonChunker()
+    ids, texts, metadatas = [], [], []
+    for path in discover_sources(data_dir):
+        source = source_name(source_key(data_dir, path))
+        for doc in chunker.chunk_file(path, source):
+            ids.append(chunk_id(source, doc["text"]))
+            texts.append(doc["text"])
+            metadatas.append(doc["metadata"])
+    if not ids:
+        return None
+    index = BM25Index.build(ids, texts, metadatas)
+    return [[hit["text"] for hit in index.search(q, top_k)] for q in questions]
+
+
+def throughput(fn, workload, seconds: float) -> float:
+    done = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        for args in workload:
+            fn(*args)
+        done += len(workload)
+    return done / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data-dir", default="data")
+    parser.add_argument("--questions", default=str(BENCH_DIR / "questions.json"))
+    parser.add_argument("--seconds", type=float, default=3.0, help="Measuring time per case")
+    parser.add_argument("--top-k", type=int, default=8)
+    args = parser.parse_args()
+
+    with open(args.questions, "r", encoding="utf-8") as f:
+        questions = [q["question"] for q in json.load(f)]
+    start = time.perf_counter()
+    engine = IntentEngine.load()
+    print(f"Intent engine compiled in {(time.perf_counter() - start) * 1000:.2f} ms "
+          f"({len(engine.intents)} intents, {len(engine._index)} index keys)")
+    legacy = LegacyFallback()
+
+    changed = [q for q in questions if engine.answer(q) != legacy.answer(q)]
+    print(f"{len(changed)}/{len(questions)} questions map to a different intent than before")
+    for question in changed:
+        print(f"  {question}")
+
+    cases = [("intent", [(q,) for q in questions], engine.answer, legacy.answer)]
+    contexts = load_contexts(Path(args.data_dir), questions, args.top_k)
+    if contexts is None:
+        print(f"No sources under {args.data_dir}, skipping the context workload")
+    else:
+        workload = list(zip(questions, contexts))
+        cases.append(("context", workload, engine.context_answer, legacy.context_answer))
+
+    print(f"\n{'workload':<9} {'legacy q/s':>12} {'engine q/s':>12} {'speedup':>8}")
+    for name, workload, new, old in cases:
+        old_rate = throughput(old, workload, args.seconds)
+        new_rate = throughput(new, workload, args.seconds)
+        print(f"{name:<9} {old_rate:>12.0f} {new_rate:>12.0f} {new_rate / old_rate:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Local generator throughput and latency under concurrent load
+
+Run from the backend directory, with the backend's model dependencies installed
+(transformers for "extractive"; llama-cpp-python and a GGUF file for "llama-cpp"):
+
+    python benchmarks/bench_generators.py --generator extractive --concurrency 1,4,16
+    RAG_LOCAL_MODEL_PATH=models/qwen2.5-0.5b-instruct-q4_k_m.gguf \\
+        python benchmarks/bench_generators.py --generator llama-cpp --concurrency 1,4
+
+Questions come from benchmarks/questions.json, with contexts retrieved by BM25
+over data/ so no embedding model is needed. Each concurrency level runs the
+same number of requests from that many client threads against the single
+shared model instance and reports requests/s, generated tokens/s (streamed
+pieces for llama-cpp, words for extractive answers) and p50/p95 latency.
+"""
+import argparse
+import json
+import sys
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bm25 import BM25Index
+from chunker import JsonChunker
+from generators import make_generator
+from ingest import discover_sources, source_key, source_name
+from prompt_builder import PromptBuilder
+from rag_system import PROMPT_HEADER, PROMPT_INSTRUCTIONS
+
+BENCH_DIR = Path(__file__).resolve().parent
+
+
+def load_workload(data_dir: Path, top_k: int):
+    chunker = JsonChunker()
+    texts, metadatas = [], []
+    for path in discover_sources(data_dir):
+        for doc in chunker.chunk_file(path, source_name(source_key(data_dir, path))):
+            texts.append(doc["text"])
+            metadatas.append(doc["metadata"])
+    index = BM25Index.build([str(i) for i in range(len(texts))], texts, metadatas)
+    with open(BENCH_DIR / "questions.json", "r", encoding="utf-8") as f:
+        questions = [q["question"] for q in json.load(f)]
+    return [(q, [hit["text"] for hit in index.search(q, top_k)]) for q in questions]
+
+
+def run_level(generator, workload, concurrency: int, requests: int):
+    latencies = []
+    tokens = [0]
+    lock = threading.Lock()
+    counter = iter(range(requests))
+
+    def client():
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                return
+            question, contexts = workload[i % len(workload)]
+            start = time.perf_counter()
+            if generator.name == "llama-cpp":
+                count = sum(1 for _ in generator.stream(question, contexts))
+            else:
+                count = len(generator.generate(question, contexts).split())
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                tokens[0] += count
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+    print(f"{concurrency:>11} {requests / wall:>10.2f} {tokens[0] / wall:>10.1f} "
+          f"{np.percentile(latencies, 50) * 1000:>9.0f} {np.percentile(latencies, 95) * 1000:>9.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--generator", default="extractive", choices=["extractive", "llama-cpp"])
+    parser.add_argument("--data-dir", default="data")
+    parser.add_argument("--concurrency", default="1,4,16")
+    parser.add_argument("--requests", type=int, default=64, help="Requests per concurrency level")
+    parser.add_argument("--top-k", type=int, default=5)
+    args = parser.parse_args()
+
+    workload = load_workload(Path(args.data_dir), args.top_k)
+    generator = make_generator(args.generator, PromptBuilder(PROMPT_HEADER, PROMPT_INSTRUCTIONS))
+    start = time.perf_counter()
+    generator.load()
+    print(f"{generator.name} loaded in {time.perf_counter() - start:.1f} s")
+    # Warm-up request (first-call allocations, and the prompt prefix for llama-cpp)
+    generator.generate(*workload[0])
+
+    print(f"\n{'concurrency':>11} {'req/s':>10} {'tokens/s':>10} {'p50 ms':>9} {'p95 ms':>9}")
+    for concurrency in [int(c) for c in args.concurrency.split(",")]:
+        run_level(generator, workload, concurrency, args.requests)
+    print(f"\n{generator.stats()}")
+
+
+if __name__ == "__main__":
+    main()
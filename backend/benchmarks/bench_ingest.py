@@ -0,0 +1,111 @@
+"""
+Ingestion pipeline throughput and peak memory on a synthetic department-page corpus
+
+Run from the backend directory:
+
+    python benchmarks/bench_ingest.py --pages 20000 --workers 0,4
+
+Generates a mix of HTML, Markdown and JSONL pages, then builds a fresh
+knowledge base from them once per worker setting (0 = chunk on the dispatcher
+thread). Each run starts from an empty Chroma directory and embedding cache.
+Prints the per-stage throughput the pipeline reports, the end-to-end rate and
+the peak resident memory of the process, which should stay flat as --pages
+grows.
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+WORDS = ("fees hostel library admission scholarship laboratory research campus semester course faculty "
+         "placement exam timetable department project seminar workshop curriculum credits elective").split()
+
+
+def sentence(rng: random.Random, n: int) -> str:
+    return " ".join(rng.choices(WORDS, k=n)).capitalize() + "."
+
+
+def write_corpus(data_dir: Path, pages: int):
+    rng = random.Random(0)
+    for i in range(pages):
+        dept_dir = data_dir / f"dept_{i % 50}"
+        dept_dir.mkdir(parents=True, exist_ok=True)
+        kind = i % 3
+        if kind == 0:
+            body = "".join(
+                f"<h2>Section {s}</h2>" + "".join(f"<p>{sentence(rng, rng.randint(8, 30))}</p>" for _ in range(3))
+                for s in range(rng.randint(2, 5))
+            )
+            (dept_dir / f"page_{i}.html").write_text(
+                f"<html><head><title>Page {i}</title></head><body><h1>Page {i}</h1>{body}</body></html>",
+                encoding="utf-8"
+            )
+        elif kind == 1:
+            body = "\n\n".join(
+                f"## Section {s}\n\n" + "\n".join(f"- {sentence(rng, rng.randint(5, 15))}" for _ in range(4))
+                for s in range(rng.randint(2, 5))
+            )
+            (dept_dir / f"page_{i}.md").write_text(f"# Page {i}\n\n{body}\n", encoding="utf-8")
+        else:
+            with open(dept_dir / f"page_{i}.jsonl", "w", encoding="utf-8") as f:
+                for r in range(rng.randint(2, 6)):
+                    f.write(json.dumps({"course": f"C{i}-{r}", "summary": sentence(rng, rng.randint(10, 40))}) + "\n")
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def build(work: Path, workers: int, pages: int):
+    from rag_system import RAGSystem
+
+    os.environ["RAG_INGEST_WORKERS"] = str(workers)
+    os.environ["RAG_EMBEDDING_CACHE_DIR"] = str(work / f"embedding_cache_{workers}")
+    chroma_dir = work / f"chroma_{workers}"
+    shutil.rmtree(chroma_dir, ignore_errors=True)
+
+    rag = RAGSystem(data_dir=str(work / "data"), chroma_dir=str(chroma_dir))
+    rag.load()
+    start = time.perf_counter()
+    if not rag.initialize():
+        raise RuntimeError("Build failed")
+    elapsed = time.perf_counter() - start
+
+    print(f"\nworkers={workers}: {pages} pages, {rag.collection.count()} chunks in {elapsed:.1f} s "
+          f"({pages / elapsed:.0f} pages/s), peak RSS so far {peak_rss_mb():.0f} MB")
+    for name, stage in rag.last_build["stages"].items():
+        print(f"  {name:<6} {stage['items']:>8} items  busy {stage['busy_seconds']:>8.2f} s  "
+              f"{stage['items_per_second'] or 0:>10.1f}/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=20000)
+    parser.add_argument("--workers", default="0,4", help="Comma-separated RAG_INGEST_WORKERS values to compare")
+    parser.add_argument("--keep", action="store_true", help="Keep the temporary work directory")
+    args = parser.parse_args()
+
+    work = Path(tempfile.mkdtemp(prefix="manipal-ingest-"))
+    try:
+        start = time.perf_counter()
+        write_corpus(work / "data", args.pages)
+        print(f"Generated {args.pages} pages in {time.perf_counter() - start:.1f} s under {work / 'data'}")
+        for workers in [int(w) for w in args.workers.split(",")]:
+            build(work, workers, args.pages)
+    finally:
+        if not args.keep:
+            shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
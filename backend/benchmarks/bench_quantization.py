@@ -0,0 +1,104 @@
+"""
+Quantized vector search: memory per million vectors and recall@k against exact float32 search
+
+Run from the backend directory:
+
+    python benchmarks/bench_quantization.py --sizes 100000,1000000
+    python benchmarks/bench_quantization.py --vectors chroma_db/shared_index/<version>/vectors.npy
+
+Synthetic vectors are the clustered 384-d set from bench_retrievers.py; with
+--vectors, real embeddings are loaded from a .npy file (for example a
+shared-index export), and queries are held-out rows of it with a little noise,
+so they resemble questions close to existing chunks. The float32 rows are
+written to a temporary file and memory-mapped, as in serving, so the
+in-memory cost of a quantized index is its codes; the float rows are only
+read for the rescoring candidates. Recall is the overlap with exact float32
+top-k; a rescore factor of 1 means the codes alone decide the top-k.
+"""
+import argparse
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bench_retrievers import SOURCES, exact_top_k, measure, synthetic_corpus, synthetic_queries
+from retrievers import NumpyRetriever, QuantizedRetriever
+
+
+def real_corpus(path: str, queries: int, seed: int = 1):
+    vectors = np.load(path, mmap_mode="r")
+    rng = np.random.default_rng(seed)
+    held_out = rng.choice(len(vectors), size=min(queries, len(vectors) // 10), replace=False)
+    keep = np.setdiff1d(np.arange(len(vectors)), held_out)
+    corpus = np.asarray(vectors[keep], dtype=np.float32)
+    corpus /= np.linalg.norm(corpus, axis=1, keepdims=True)
+    noisy = np.asarray(vectors[held_out], dtype=np.float32)
+    noisy += 0.02 * rng.standard_normal(noisy.shape).astype(np.float32)
+    noisy /= np.linalg.norm(noisy, axis=1, keepdims=True)
+    ids = [f"doc_{i}" for i in range(len(corpus))]
+    metadatas = [{"source": SOURCES[i % len(SOURCES)]} for i in range(len(corpus))]
+    return ids, metadatas, corpus, noisy
+
+
+def run(ids, metadatas, vectors, queries, k: int, factors, work: Path):
+    truth = exact_top_k(vectors, queries, k)
+    id_to_row = {doc_id: row for row, doc_id in enumerate(ids)}
+    texts = [""] * len(ids)
+    n, dim = vectors.shape
+
+    baseline = NumpyRetriever(ids, texts, metadatas, vectors)
+    r = measure(baseline, queries, k, truth, id_to_row)
+    per_million = dim * 4 * 1_000_000 / 2**20
+    print(f"{n:>9} {'float32':<8} {'-':>7} {dim * 4:>9} {per_million:>10.0f} {r['recall']:>9.3f} "
+          f"{r['p50_ms']:>8.3f} {r['batched_qps']:>12.0f}")
+    del baseline
+
+    path = work / "vectors.npy"
+    np.save(path, vectors)
+    mapped = np.load(path, mmap_mode="r")
+    for mode in ("int8", "binary"):
+        start = time.perf_counter()
+        retriever = QuantizedRetriever(ids, texts, metadatas, mapped, mode)
+        build = time.perf_counter() - start
+        row_bytes = retriever.codes.shape[1] * retriever.codes.itemsize
+        per_million = row_bytes * 1_000_000 / 2**20
+        for factor in factors:
+            retriever.rescore_factor = factor
+            r = measure(retriever, queries, k, truth, id_to_row)
+            print(f"{n:>9} {mode:<8} {factor:>7} {row_bytes:>9} {per_million:>10.0f} {r['recall']:>9.3f} "
+                  f"{r['p50_ms']:>8.3f} {r['batched_qps']:>12.0f}   (codes built in {build:.2f} s)")
+        del retriever
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="100000,1000000")
+    parser.add_argument("--vectors", help=".npy file of real embeddings to use instead of synthetic ones")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--rescore", default="1,4,8,16", help="rescore factors to try")
+    args = parser.parse_args()
+    factors = [int(f) for f in args.rescore.split(",")]
+
+    print(f"{'vectors':>9} {'codes':<8} {'rescore':>7} {'bytes/vec':>9} {'MB per 1M':>10} "
+          f"{'recall@' + str(args.k):>9} {'p50 ms':>8} {'batched q/s':>12}")
+    work = Path(tempfile.mkdtemp(prefix="manipal-quantization-"))
+    try:
+        if args.vectors:
+            ids, metadatas, vectors, queries = real_corpus(args.vectors, args.queries)
+            run(ids, metadatas, vectors, queries, args.k, factors, work)
+        else:
+            for size in [int(x) for x in args.sizes.split(",") if x.strip()]:
+                ids, metadatas, vectors, centers = synthetic_corpus(size)
+                run(ids, metadatas, vectors, synthetic_queries(centers, args.queries), args.k, factors, work)
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Retriever comparison: recall@k and latency of the NumPy backend vs Chroma
+
+Run from the backend directory:
+
+    python benchmarks/bench_retrievers.py --sizes 1000,100000,1000000
+
+Vectors are synthetic, clustered and unit-normalized (384-d like
+all-MiniLM-L6-v2). Recall is measured against exact brute-force top-k, so
+the NumPy backend scores 1.0 by construction and the number to watch is
+Chroma's HNSW recall. Loading 1M vectors into Chroma takes a while.
+"""
+import argparse
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from retrievers import ChromaRetriever, NumpyRetriever
+
+DIM = 384
+SOURCES = ["official_info", "courses", "hostels", "fees", "facilities", "admissions"]
+
+
+def synthetic_corpus(n: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((max(8, n // 200), DIM)).astype(np.float32)
+    assignment = rng.integers(0, len(centers), n)
+    vectors = centers[assignment] + 0.6 * rng.standard_normal((n, DIM)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    ids = [f"doc_{i}" for i in range(n)]
+    metadatas = [{"source": SOURCES[i % len(SOURCES)]} for i in range(n)]
+    return ids, metadatas, vectors, centers
+
+
+def synthetic_queries(centers: np.ndarray, count: int, seed: int = 1) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    queries = centers[rng.integers(0, len(centers), count)] + 0.6 * rng.standard_normal((count, DIM)).astype(np.float32)
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+
+def exact_top_k(vectors: np.ndarray, queries: np.ndarray, k: int):
+    scores = queries @ vectors.T
+    return np.argsort(-scores, axis=1)[:, :k]
+
+
+def measure(retriever, queries: np.ndarray, k: int, truth, id_to_row) -> dict:
+    latencies = []
+    recalls = []
+    for q, query in enumerate(queries):
+        start = time.perf_counter()
+        hits = retriever.search(query, k)
+        latencies.append(time.perf_counter() - start)
+        found = {id_to_row[hit["id"]] for hit in hits}
+        recalls.append(len(found & set(truth[q].tolist())) / k)
+
+    start = time.perf_counter()
+    retriever.search_many(queries, k)
+    batched = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "recall": float(np.mean(recalls)),
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p95_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000,
+        "p99_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000,
+        "batched_qps": len(queries) / batched if batched else 0.0
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1000,100000,1000000")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=8)
+    parser.add_argument("--skip-chroma", action="store_true")
+    args = parser.parse_args()
+
+    print(f"{'size':>9} {'backend':<8} {'build s':>8} {'recall@' + str(args.k):>9} {'p50 ms':>8} {'p99 ms':>8} {'batched q/s':>12}")
+    for size in [int(x) for x in args.sizes.split(",") if x.strip()]:
+        ids, metadatas, vectors, centers = synthetic_corpus(size)
+        queries = synthetic_queries(centers, args.queries)
+        truth = exact_top_k(vectors, queries, args.k)
+        id_to_row = {doc_id: row for row, doc_id in enumerate(ids)}
+        texts = [""] * size
+
+        start = time.perf_counter()
+        retriever = NumpyRetriever(ids, texts, metadatas, vectors)
+        build = time.perf_counter() - start
+        r = measure(retriever, queries, args.k, truth, id_to_row)
+        print(f"{size:>9} {'numpy':<8} {build:>8.2f} {r['recall']:>9.3f} {r['p50_ms']:>8.3f} {r['p99_ms']:>8.3f} {r['batched_qps']:>12.0f}")
+        del retriever
+
+        if args.skip_chroma:
+            continue
+        import chromadb
+        from chromadb.config import Settings
+
+        work = tempfile.mkdtemp(prefix="manipal-retrievers-")
+        try:
+            client = chromadb.PersistentClient(path=work, settings=Settings(anonymized_telemetry=False))
+            collection = client.create_collection("bench")
+            start = time.perf_counter()
+            batch = 5000
+            for i in range(0, size, batch):
+                collection.add(
+                    ids=ids[i:i + batch],
+                    embeddings=vectors[i:i + batch].tolist(),
+                    documents=texts[i:i + batch],
+                    metadatas=metadatas[i:i + batch]
+                )
+            build = time.perf_counter() - start
+            r = measure(ChromaRetriever(collection), queries, args.k, truth, id_to_row)
+            print(f"{size:>9} {'chroma':<8} {build:>8.2f} {r['recall']:>9.3f} {r['p50_ms']:>8.3f} {r['p99_ms']:>8.3f} {r['batched_qps']:>12.0f}")
+        finally:
+            shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
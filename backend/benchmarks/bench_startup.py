@@ -0,0 +1,93 @@
+"""
+Startup benchmark: import time, time to first /health answer and time to ready
+
+Run from the backend directory:
+
+    python benchmarks/bench_startup.py --port 8765
+
+Import time is measured in a fresh interpreter, which also reports whether
+torch/chromadb were pulled in. The server is then started with uvicorn and
+/health is polled until it answers (port bound) and until it reports
+"healthy" with the knowledge base loaded (ready).
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import requests
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+IMPORT_PROBE = """
+import sys, time, json
+start = time.perf_counter()
+import main
+elapsed = time.perf_counter() - start
+print(json.dumps({
+    "import_s": elapsed,
+    "torch_imported": "torch" in sys.modules,
+    "chromadb_imported": "chromadb" in sys.modules
+}))
+"""
+
+
+def measure_import() -> dict:
+    output = subprocess.check_output([sys.executable, "-c", IMPORT_PROBE], cwd=BACKEND_DIR, text=True)
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def measure_server(port: int, timeout: float) -> dict:
+    env = dict(os.environ)
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port)],
+        cwd=BACKEND_DIR,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+    start = time.perf_counter()
+    first_response = None
+    ready = None
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                health = requests.get(f"http://127.0.0.1:{port}/health", timeout=1).json()
+            except requests.RequestException:
+                time.sleep(0.02)
+                continue
+            if first_response is None:
+                first_response = time.perf_counter() - start
+            if health.get("status") == "healthy":
+                ready = time.perf_counter() - start
+                break
+            time.sleep(0.05)
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+    return {"first_health_s": first_response, "ready_s": ready}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--timeout", type=float, default=600.0)
+    args = parser.parse_args()
+
+    imports = measure_import()
+    server = measure_server(args.port, args.timeout)
+
+    def fmt(value):
+        return "n/a" if value is None else f"{value * 1000:.0f} ms"
+
+    print(f"import main:           {fmt(imports['import_s'])}"
+          f"  (torch imported: {imports['torch_imported']}, chromadb imported: {imports['chromadb_imported']})")
+    print(f"first /health answer:  {fmt(server['first_health_s'])}")
+    print(f"ready (healthy):       {fmt(server['ready_s'])}")
+
+
+if __name__ == "__main__":
+    main()
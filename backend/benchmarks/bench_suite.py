@@ -0,0 +1,499 @@
+"""
+End-to-end benchmark suite: offline, replayable, and compared against a stored baseline
+
+Run from the backend directory:
+
+    python benchmarks/bench_suite.py --output bench_results.json
+    python benchmarks/bench_suite.py --baseline benchmarks/baseline.json
+    python benchmarks/bench_suite.py --save-baseline benchmarks/baseline.json
+    python benchmarks/bench_suite.py --stages chat --llm-latency-ms 800 --concurrency 1,16,64
+
+Stages (--stages):
+
+- chunking: the production chunker over a synthetic JSON tree of --chunk-mb
+  (bench_chunker.py's generator): MB/s, chunks/s and peak traced memory.
+- embedding: the configured encoder (RAG_ENCODER) on the first --embed-docs
+  of those chunks (docs/s), and on single questions from the trace (latency).
+- retrieval: search latency and batched QPS at each of --sizes synthetic
+  vectors (bench_retrievers.py's corpus), for each of --retrievers.
+- chat: the backend started with uvicorn in a scratch directory, over the
+  collected data plus --pages synthetic pages (bench_ingest.py's generator),
+  with HF_API_URL pointing at stub_llm_server.py answering after
+  --llm-latency-ms. The knowledge base is built from scratch (build_s). The
+  query trace is then sent to /api/chat by each of --concurrency closed-loop
+  clients, and replayed once open-loop at its recorded arrival times
+  (--replay-speed, 0 = skip). Latency in the open-loop replay counts from
+  each request's scheduled time, so a stalled server can't hide its queueing
+  delay. The answer cache is off, so every request takes the full path.
+  Server RSS and peak RSS are read from /proc after each run.
+
+Everything runs offline. The Hugging Face Hub is put in offline mode, so the
+models must already be in the local cache; run the backend once online
+first. The crawl is disabled and the LLM is the stub. The query trace
+(benchmarks/query_trace.jsonl) is a fixed file of questions with arrival
+offsets. --write-trace regenerates it from questions.json with a fixed seed.
+
+Results are JSON. A "meta" block records the commit, Python, CPU count and
+settings, and "metrics" holds flat keys like "chat.c8.p95_ms". With
+--baseline, each metric is compared with the baseline's. Latencies (_ms),
+durations (_s), memory (_mb), errors and 503 rejections regress when they
+rise by more than --threshold (default 15%). Throughputs (_per_s, and qps,
+which counts successful answers) and recall regress when they fall by more
+than that. A "thresholds" object in the baseline file overrides the
+tolerance per metric, with fnmatch patterns such as {"chat.*.p99_ms": 0.3}.
+The exit status is 1 when anything regressed. Compare runs from the same
+machine and settings only.
+"""
+import argparse
+import fnmatch
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import requests
+
+BENCH_DIR = Path(__file__).resolve().parent
+BACKEND_DIR = BENCH_DIR.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from bench_chunker import write_synthetic
+from bench_ingest import write_corpus
+from bench_retrievers import exact_top_k, measure, synthetic_corpus, synthetic_queries
+from stub_llm_server import StubConfig, start_stub_server
+
+TRACE_FILE = BENCH_DIR / "query_trace.jsonl"
+STAGES = ("chunking", "embedding", "retrieval", "chat")
+
+# Variants of the labeled questions, as users type them
+PHRASINGS = ["{q}", "{q}", "{lower}", "Can you tell me {lower}", "{short}"]
+OFF_TOPIC = ["hi", "thanks!", "What is the weather in Manipal today?", "who are you?"]
+
+
+def percentiles(values, prefix: str = "") -> dict:
+    if not values:
+        return {f"{prefix}p50_ms": 0.0, f"{prefix}p95_ms": 0.0, f"{prefix}p99_ms": 0.0}
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {f"{prefix}p50_ms": float(p50), f"{prefix}p95_ms": float(p95), f"{prefix}p99_ms": float(p99)}
+
+
+def memory_mb(pid="self"):
+    """(RSS, peak RSS) of a process in MB, from /proc (Linux); zeros elsewhere"""
+    values = {}
+    try:
+        with open(f"/proc/{pid}/status", "r") as f:
+            for line in f:
+                if line.startswith(("VmRSS:", "VmHWM:")):
+                    values[line.split(":")[0]] = int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return values.get("VmRSS", 0.0), values.get("VmHWM", 0.0)
+
+
+# --- query trace --------------------------------------------------------------------------------
+
+def write_trace(path: Path, count: int = 300, rate: float = 20.0, seed: int = 0):
+    """Questions drawn Zipf-like from the labeled set, arriving as a Poisson process at rate/s"""
+    with open(BENCH_DIR / "questions.json", "r", encoding="utf-8") as f:
+        labeled = [item["question"] for item in json.load(f)]
+    rng = random.Random(seed)
+    weights = [1 / (rank + 1) for rank in range(len(labeled))]
+    at = 0.0
+    with open(path, "w", encoding="utf-8") as f:
+        for _ in range(count):
+            at += rng.expovariate(rate)
+            if rng.random() < 0.05:
+                question = rng.choice(OFF_TOPIC)
+            else:
+                q = rng.choices(labeled, weights)[0]
+                lower = q[0].lower() + q[1:]
+                short = " ".join(q.rstrip("?").split()[-3:]).lower() + "?"
+                question = rng.choice(PHRASINGS).format(q=q, lower=lower, short=short)
+            f.write(json.dumps({"at_ms": round(at * 1000, 1), "question": question}) + "\n")
+    print(f"Wrote {count} questions over {at:.1f} s to {path}")
+
+
+def load_trace(path: Path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+# --- in-process stages ----------------------------------------------------------------------------
+
+def bench_chunking(args, work: Path, metrics: dict, state: dict):
+    from chunker import JsonChunker
+
+    path = work / "synthetic.json"
+    write_synthetic(path, args.chunk_mb)
+    size_mb = os.path.getsize(path) / (1024 * 1024)
+    chunker = JsonChunker()
+    tracemalloc.start()
+    start = time.perf_counter()
+    texts = [doc["text"] for doc in chunker.chunk_file(path, "synthetic")]
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    state["texts"] = texts
+    metrics["chunking.mb_per_s"] = size_mb / elapsed
+    metrics["chunking.chunks_per_s"] = len(texts) / elapsed
+    metrics["chunking.peak_traced_mb"] = peak / (1024 * 1024)
+    print(f"chunking   {size_mb:.0f} MB -> {len(texts)} chunks: {size_mb / elapsed:.1f} MB/s, "
+          f"{len(texts) / elapsed:.0f} chunks/s, peak traced {peak / 2**20:.1f} MB")
+
+
+def bench_embedding(args, work: Path, metrics: dict, state: dict, trace):
+    from encoders import make_encoder
+    from rag_system import EMBEDDING_MODEL_NAME, ENCODER_KIND
+
+    texts = state.get("texts")
+    if texts is None:
+        path = work / "synthetic.json"
+        write_synthetic(path, max(1, args.chunk_mb // 10))
+        from chunker import JsonChunker
+
+        texts = [doc["text"] for doc in JsonChunker().chunk_file(path, "synthetic")]
+    docs = texts[:args.embed_docs]
+    encoder = make_encoder(ENCODER_KIND, EMBEDDING_MODEL_NAME)
+    questions = [entry["question"] for entry in trace[:100]]
+    encoder.encode(questions[:8])  # warm up
+    latencies = []
+    for question in questions:
+        start = time.perf_counter()
+        encoder.encode([question])
+        latencies.append((time.perf_counter() - start) * 1000)
+    start = time.perf_counter()
+    encoder.encode(docs, batch_size=64)
+    docs_per_second = len(docs) / (time.perf_counter() - start)
+    metrics["embedding.docs_per_s"] = docs_per_second
+    metrics.update(percentiles(latencies, "embedding.query_"))
+    metrics["embedding.rss_mb"] = memory_mb()[0]
+    print(f"embedding  {ENCODER_KIND}: {docs_per_second:.0f} docs/s over {len(docs)} chunks, single question "
+          f"p50 {metrics['embedding.query_p50_ms']:.2f} ms, p99 {metrics['embedding.query_p99_ms']:.2f} ms")
+
+
+def bench_retrieval(args, work: Path, metrics: dict):
+    from retrievers import NumpyRetriever, QuantizedRetriever
+
+    for size in [int(x) for x in args.sizes.split(",") if x.strip()]:
+        ids, metadatas, vectors, centers = synthetic_corpus(size)
+        queries = synthetic_queries(centers, args.queries)
+        truth = exact_top_k(vectors, queries, args.k)
+        id_to_row = {doc_id: row for row, doc_id in enumerate(ids)}
+        texts = [""] * size
+        for kind in [x.strip() for x in args.retrievers.split(",") if x.strip()]:
+            if kind == "numpy":
+                retriever = NumpyRetriever(ids, texts, metadatas, vectors)
+            else:
+                # Float rows memory-mapped, as in serving
+                np.save(work / "vectors.npy", vectors)
+                mapped = np.load(work / "vectors.npy", mmap_mode="r")
+                retriever = QuantizedRetriever(ids, texts, metadatas, mapped, kind)
+            r = measure(retriever, queries, args.k, truth, id_to_row)
+            prefix = f"retrieval.{kind}.{size}."
+            for name in ("p50_ms", "p95_ms", "p99_ms"):
+                metrics[prefix + name] = r[name]
+            metrics[prefix + "qps"] = r["batched_qps"]
+            metrics[prefix + "recall"] = r["recall"]
+            print(f"retrieval  {kind:<7} {size:>9}: p50 {r['p50_ms']:.3f} ms, p99 {r['p99_ms']:.3f} ms, "
+                  f"batched {r['batched_qps']:.0f} q/s, recall@{args.k} {r['recall']:.3f}")
+            del retriever
+
+
+# --- /api/chat against a server process -------------------------------------------------------------
+
+def start_server(args, work: Path, llm_url: str):
+    env = dict(
+        os.environ,
+        HF_API_URL=llm_url,
+        HUGGINGFACE_API_KEY="stub",
+        HF_HUB_OFFLINE=os.getenv("HF_HUB_OFFLINE", "1"),
+        TRANSFORMERS_OFFLINE=os.getenv("TRANSFORMERS_OFFLINE", "1"),
+        RAG_CRAWL_START_URLS="",
+        RAG_CACHE_TTL_SECONDS="0",
+        PYTHONPATH=os.pathsep.join(filter(None, [str(BACKEND_DIR), os.getenv("PYTHONPATH")]))
+    )
+    log = open(work / "server.log", "w")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(args.port),
+         "--log-level", "warning"],
+        cwd=str(work), env=env, stdout=log, stderr=subprocess.STDOUT
+    )
+    return server, log
+
+
+def wait_initialized(url: str, server, timeout: float) -> float:
+    start = time.perf_counter()
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"Server exited with status {server.returncode}")
+        try:
+            health = requests.get(f"{url}/health", timeout=2).json()
+            if health.get("status") == "healthy":
+                if not health.get("initialized"):
+                    raise RuntimeError("Knowledge base failed to build; see server.log")
+                return time.perf_counter() - start
+        except (requests.RequestException, ValueError):
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("Server did not become ready")
+
+
+def _post(session, url: str, question: str) -> int:
+    """HTTP status of one /api/chat request, 0 if it failed outright"""
+    try:
+        return session.post(f"{url}/api/chat", json={"message": question}, timeout=120).status_code
+    except requests.RequestException:
+        return 0
+
+
+def _summary(latencies, statuses, elapsed: float) -> dict:
+    # 503 is admission control shedding load (RAG_MAX_PENDING), not a failure
+    return {
+        **percentiles(latencies),
+        "qps": statuses.count(200) / elapsed,
+        "errors": sum(status not in (200, 503) for status in statuses),
+        "rejected": statuses.count(503)
+    }
+
+
+def run_closed_loop(url: str, trace, clients: int, count: int) -> dict:
+    """clients send the trace's questions back to back, each taking the next one in order"""
+    latencies, statuses = [], []
+    lock = threading.Lock()
+    cursor = iter(range(count))
+
+    def client():
+        session = requests.Session()
+        while True:
+            with lock:
+                i = next(cursor, None)
+            if i is None:
+                return
+            start = time.perf_counter()
+            status = _post(session, url, trace[i % len(trace)]["question"])
+            elapsed = (time.perf_counter() - start) * 1000
+            with lock:
+                latencies.append(elapsed)
+                statuses.append(status)
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return _summary(latencies, statuses, time.perf_counter() - start)
+
+
+def run_open_loop(url: str, trace, speed: float, max_in_flight: int) -> dict:
+    """Each question sent at its recorded offset / speed, whether or not earlier ones have returned"""
+    latencies, statuses = [], []
+    lock = threading.Lock()
+    local = threading.local()
+    start = time.perf_counter()
+
+    def send(entry):
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+        scheduled = start + entry["at_ms"] / 1000 / speed
+        status = _post(local.session, url, entry["question"])
+        with lock:
+            latencies.append((time.perf_counter() - scheduled) * 1000)
+            statuses.append(status)
+
+    with ThreadPoolExecutor(max_workers=max_in_flight) as pool:
+        for entry in trace:
+            delay = start + entry["at_ms"] / 1000 / speed - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(send, entry)
+    return _summary(latencies, statuses, time.perf_counter() - start)
+
+
+def bench_chat(args, work: Path, metrics: dict, trace):
+    random.seed(0)  # the stub's latency jitter
+    stub = start_stub_server(config=StubConfig(latency_ms=args.llm_latency_ms, jitter_ms=args.llm_jitter_ms))
+    llm_url = f"http://127.0.0.1:{stub.server_address[1]}/generate"
+    if args.pages:
+        write_corpus(work / "data" / "synthetic", args.pages)
+    url = f"http://127.0.0.1:{args.port}"
+    server, log = start_server(args, work, llm_url)
+    try:
+        metrics["chat.build_s"] = wait_initialized(url, server, args.startup_timeout)
+        metrics["chat.idle_rss_mb"] = memory_mb(server.pid)[0]
+        print(f"chat       knowledge base built and ready in {metrics['chat.build_s']:.1f} s, "
+              f"server RSS {metrics['chat.idle_rss_mb']:.0f} MB, LLM stub {args.llm_latency_ms:.0f} ms")
+        run_closed_loop(url, trace, 4, 20)  # warm up
+        count = args.requests or len(trace)
+        runs = [(f"c{clients}", lambda clients=clients: run_closed_loop(url, trace, clients, count))
+                for clients in [int(c) for c in args.concurrency.split(",") if c.strip()]]
+        if args.replay_speed:
+            runs.append(("replay", lambda: run_open_loop(url, trace, args.replay_speed, args.max_in_flight)))
+        for name, run in runs:
+            r = run()
+            r["rss_mb"], r["peak_rss_mb"] = memory_mb(server.pid)
+            for key, value in r.items():
+                metrics[f"chat.{name}.{key}"] = value
+            print(f"chat       {name:<7} {r['qps']:>7.1f} req/s  p50 {r['p50_ms']:>8.1f} ms  "
+                  f"p95 {r['p95_ms']:>8.1f} ms  p99 {r['p99_ms']:>8.1f} ms  errors {r['errors']:>3}  "
+                  f"rejected {r['rejected']:>3}  RSS {r['rss_mb']:.0f} MB")
+    finally:
+        server.send_signal(signal.SIGTERM)
+        try:
+            server.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            server.kill()
+        log.close()
+        stub.shutdown()
+
+
+# --- results and baseline -----------------------------------------------------------------------------
+
+def direction(key: str) -> int:
+    """1 if higher is better, -1 if lower is better, 0 for metrics that are only reported"""
+    name = key.rsplit(".", 1)[-1]
+    if name.endswith("_per_s") or name in ("qps", "recall"):
+        return 1
+    if name.endswith(("_ms", "_s", "_mb")) or name in ("errors", "rejected"):
+        return -1
+    return 0
+
+
+def compare(metrics: dict, baseline: dict, default_threshold: float) -> int:
+    thresholds = baseline.get("thresholds", {})
+    regressions = 0
+    print(f"\n{'metric':<40} {'baseline':>12} {'current':>12} {'change':>8}")
+    for key, base in sorted(baseline.get("metrics", {}).items()):
+        sign = direction(key)
+        if key not in metrics or not sign:
+            continue
+        current = metrics[key]
+        threshold = next((t for pattern, t in thresholds.items() if fnmatch.fnmatch(key, pattern)), default_threshold)
+        if base:
+            change = (current - base) / abs(base)
+            regressed = -sign * change > threshold
+        else:
+            change = math.inf if current else 0.0
+            regressed = sign < 0 and current > 0
+        regressions += regressed
+        print(f"{key:<40} {base:>12.3f} {current:>12.3f} {change:>+8.1%}{'  REGRESSED' if regressed else ''}")
+    missing = sorted(set(baseline.get("metrics", {})) - set(metrics))
+    if missing:
+        print(f"(not measured in this run: {', '.join(missing)})")
+    print(f"{regressions} regression(s) beyond the threshold" if regressions else "No regressions")
+    return regressions
+
+
+def run_meta(args) -> dict:
+    def git(*command):
+        try:
+            return subprocess.run(["git", *command], cwd=BACKEND_DIR, capture_output=True, text=True,
+                                  timeout=30).stdout.strip()
+        except (OSError, subprocess.SubprocessError):
+            return ""
+
+    return {
+        "timestamp": datetime.now().isoformat(),
+        "commit": git("rev-parse", "HEAD"),
+        "dirty": bool(git("status", "--porcelain", "--untracked-files=no")),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "settings": {key: value for key, value in vars(args).items()
+                     if key not in ("output", "baseline", "save_baseline", "write_trace")},
+        "env": {key: value for key, value in sorted(os.environ.items()) if key.startswith("RAG_")}
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stages", default=",".join(STAGES))
+    parser.add_argument("--trace", default=str(TRACE_FILE))
+    parser.add_argument("--write-trace", action="store_true", help="Regenerate the trace file and exit")
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--baseline", help="Results file to compare against")
+    parser.add_argument("--save-baseline", help="Also write the results here, keeping its thresholds")
+    parser.add_argument("--threshold", type=float, default=0.15, help="Tolerated relative change (0.15 = 15%%)")
+    parser.add_argument("--chunk-mb", type=int, default=20)
+    parser.add_argument("--embed-docs", type=int, default=2000)
+    parser.add_argument("--sizes", default="10000,100000")
+    parser.add_argument("--retrievers", default="numpy,int8")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=8)
+    parser.add_argument("--pages", type=int, default=200, help="Synthetic pages added to the chat knowledge base")
+    parser.add_argument("--llm-latency-ms", type=float, default=200)
+    parser.add_argument("--llm-jitter-ms", type=float, default=50)
+    parser.add_argument("--concurrency", default="1,8,32")
+    parser.add_argument("--requests", type=int, default=0, help="Requests per concurrency level (0 = the trace)")
+    parser.add_argument("--replay-speed", type=float, default=1.0, help="Open-loop replay speed (0 = skip)")
+    parser.add_argument("--max-in-flight", type=int, default=256)
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--startup-timeout", type=float, default=1800)
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch directory")
+    args = parser.parse_args()
+
+    if args.write_trace:
+        write_trace(Path(args.trace))
+        return
+    os.environ.setdefault("HF_HUB_OFFLINE", "1")
+    os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+    stages = [s.strip() for s in args.stages.split(",") if s.strip()]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        sys.exit(f"Unknown stages: {', '.join(sorted(unknown))} (expected: {', '.join(STAGES)})")
+    trace = load_trace(Path(args.trace))
+
+    metrics, state = {}, {}
+    work = Path(tempfile.mkdtemp(prefix="manipal-suite-"))
+    try:
+        if "chunking" in stages:
+            bench_chunking(args, work, metrics, state)
+        if "embedding" in stages:
+            bench_embedding(args, work, metrics, state, trace)
+        state.clear()
+        if "retrieval" in stages:
+            bench_retrieval(args, work, metrics)
+        if "chat" in stages:
+            bench_chat(args, work, metrics, trace)
+    finally:
+        if args.keep:
+            print(f"Scratch directory kept at {work}")
+        else:
+            shutil.rmtree(work, ignore_errors=True)
+    metrics["suite.peak_rss_mb"] = memory_mb()[1]
+
+    results = {"meta": run_meta(args), "metrics": metrics}
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nWrote {len(metrics)} metrics to {args.output}")
+    if args.save_baseline:
+        thresholds = {}
+        if os.path.exists(args.save_baseline):
+            with open(args.save_baseline, "r", encoding="utf-8") as f:
+                thresholds = json.load(f).get("thresholds", {})
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump({**results, "thresholds": thresholds}, f, indent=2)
+        print(f"Saved as baseline to {args.save_baseline}")
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if compare(metrics, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
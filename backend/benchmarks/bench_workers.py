@@ -0,0 +1,149 @@
+"""
+Memory and throughput of serve.py at 1, 2, 4 and 8 workers
+
+Run from the backend directory (with a built knowledge base, or data/ to build it from):
+
+    python benchmarks/bench_workers.py --workers 1,2,4,8 --seconds 20
+
+For each worker count this starts serve.py, waits for every worker to report
+ready, drives /api/chat from --clients concurrent clients, and reads the
+memory of the server process tree from /proc (Linux). RSS counts shared
+pages once per process, so it overstates the total; PSS splits each shared
+page between the processes mapping it and is the number that should stay
+roughly flat per worker as workers are added. Answers are not cached
+(RAG_CACHE_TTL_SECONDS=0) and no API key is passed, so the LLM step is the
+rule-based generator and the measurement is retrieval-bound; point
+HF_API_URL at benchmarks/stub_llm_server.py to include a simulated LLM.
+"""
+import argparse
+import asyncio
+import os
+import signal
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+QUESTIONS = [
+    "What are the B.Tech courses available?",
+    "What are the hostel fees?",
+    "Tell me about the library",
+    "How do I apply through MET?",
+    "What sports facilities are there?",
+    "What is the fee for M.Tech?",
+]
+
+
+def process_tree(root: int):
+    pids = [root]
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/task/{pid}/children", "r") as f:
+                pids.extend(int(child) for child in f.read().split())
+        except OSError:
+            pass
+    return pids
+
+
+def memory_mb(pid: int):
+    """(RSS, PSS) of one process in MB"""
+    values = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup", "r") as f:
+            for line in f:
+                parts = line.split()
+                if parts[0] in ("Rss:", "Pss:"):
+                    values[parts[0]] = int(parts[1]) / 1024
+    except OSError:
+        return 0.0, 0.0
+    return values.get("Rss:", 0.0), values.get("Pss:", 0.0)
+
+
+async def wait_ready(url: str, workers: int, timeout: float):
+    """Until /health reports healthy on enough distinct connections to have reached every worker"""
+    deadline = time.monotonic() + timeout
+    healthy = 0
+    while time.monotonic() < deadline:
+        try:
+            async with httpx.AsyncClient() as client:
+                response = await client.get(f"{url}/health", timeout=2)
+            healthy = healthy + 1 if response.json().get("status") == "healthy" else 0
+            if healthy >= workers * 4:
+                return
+        except (httpx.HTTPError, ValueError):
+            healthy = 0
+        await asyncio.sleep(0.1)
+    raise RuntimeError("Server did not become ready")
+
+
+async def drive(url: str, clients: int, seconds: float):
+    done = 0
+    errors = 0
+    stop_at = time.monotonic() + seconds
+
+    async def client_loop(n: int):
+        nonlocal done, errors
+        async with httpx.AsyncClient(timeout=30) as client:
+            i = n
+            while time.monotonic() < stop_at:
+                question = f"{QUESTIONS[i % len(QUESTIONS)]} ({n}-{i})"
+                try:
+                    response = await client.post(f"{url}/api/chat", json={"message": question})
+                    if response.status_code == 200:
+                        done += 1
+                    else:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                i += 1
+
+    start = time.monotonic()
+    await asyncio.gather(*(client_loop(n) for n in range(clients)))
+    return done / (time.monotonic() - start), errors
+
+
+def run(workers: int, port: int, clients: int, seconds: float):
+    env = dict(os.environ, RAG_CACHE_TTL_SECONDS="0", HUGGINGFACE_API_KEY="")
+    server = subprocess.Popen(
+        [sys.executable, str(BACKEND_DIR / "serve.py"), "--workers", str(workers), "--port", str(port)],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    url = f"http://127.0.0.1:{port}"
+    try:
+        asyncio.run(wait_ready(url, workers, timeout=600))
+        idle = [memory_mb(pid) for pid in process_tree(server.pid)]
+        rate, errors = asyncio.run(drive(url, clients, seconds))
+        loaded = [memory_mb(pid) for pid in process_tree(server.pid)]
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=60)
+
+    total_rss = sum(rss for rss, _ in loaded)
+    total_pss = sum(pss for _, pss in loaded)
+    idle_pss = sum(pss for _, pss in idle)
+    print(f"{workers:>7} {rate:>9.1f} {errors:>6} {total_rss:>10.0f} {idle_pss:>10.0f} {total_pss:>10.0f} "
+          f"{total_pss / workers:>12.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", default="1,2,4,8")
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--seconds", type=float, default=20)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+    if not Path("/proc/self/smaps_rollup").exists():
+        sys.exit("Needs Linux /proc/<pid>/smaps_rollup")
+
+    print(f"{'workers':>7} {'req/s':>9} {'errors':>6} {'RSS MB':>10} {'PSS idle':>10} {'PSS MB':>10} "
+          f"{'PSS/worker':>12}")
+    for workers in [int(w) for w in args.workers.split(",")]:
+        run(workers, args.port, args.clients, args.seconds)
+
+
+if __name__ == "__main__":
+    main()
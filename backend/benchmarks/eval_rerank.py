@@ -0,0 +1,103 @@
+"""
+Reranker evaluation: answer-quality gain and added latency per latency budget
+
+Run from the backend directory (after the backend has collected data/):
+
+    python benchmarks/eval_rerank.py --budgets 20,40,80,160
+
+Uses the same corpus, embeddings and labeled questions as eval_retrieval.py.
+The baseline is the production retrieval order (hybrid RRF) cut to --top-k.
+For each budget the reranker picks its candidate depth, reranks and keeps
+--top-k. Quality is measured on what generation would see: R@1 and MRR of the
+first chunk containing the expected answer, and whether the answer survives
+into the prompt after dedup and token-budget packing. Latency is the time the
+rerank stage adds per question, with a cold score cache and then a warm one.
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bm25 import BM25Index
+from eval_retrieval import BENCH_DIR, load_corpus, percentile
+from prompt_builder import PromptBuilder
+from rag_system import EMBEDDING_MODEL_NAME, PROMPT_HEADER, PROMPT_INSTRUCTIONS
+from reranker import CrossEncoderReranker
+from retrievers import HybridRetriever, NumpyRetriever
+
+
+def quality(questions, ranked, builder: PromptBuilder):
+    """(R@1, MRR, answer-in-prompt rate) over ranked hit lists, one per question"""
+    first, reciprocal, in_prompt = 0, 0.0, 0
+    for q, hits in zip(questions, ranked):
+        ranks = [rank for rank, hit in enumerate(hits, 1) if q["answer"] in hit["text"]]
+        if ranks:
+            first += ranks[0] == 1
+            reciprocal += 1.0 / ranks[0]
+        packed, _, _, _ = builder.pack([hit["text"] for hit in hits])
+        in_prompt += any(q["answer"] in text for text in packed)
+    n = len(questions)
+    return first / n, reciprocal / n, in_prompt / n
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data-dir", default="data")
+    parser.add_argument("--questions", default=str(BENCH_DIR / "questions.json"))
+    parser.add_argument("--budgets", default="20,40,80,160", help="Comma-separated RAG_RERANK_BUDGET_MS values")
+    parser.add_argument("--top-k", type=int, default=8)
+    parser.add_argument("--skip-margin", type=float, default=None,
+                        help="Dense margin that skips reranking (default: RAG_RERANK_SKIP_MARGIN)")
+    args = parser.parse_args()
+
+    from sentence_transformers import SentenceTransformer
+
+    with open(args.questions, "r", encoding="utf-8") as f:
+        questions = json.load(f)
+    ids, texts, metadatas = load_corpus(Path(args.data_dir))
+    print(f"{len(ids)} chunks, {len(questions)} questions")
+
+    model = SentenceTransformer(EMBEDDING_MODEL_NAME)
+    retriever = HybridRetriever(NumpyRetriever(ids, texts, metadatas, model.encode(texts, batch_size=64)),
+                                BM25Index.build(ids, texts, metadatas))
+    query_vectors = np.asarray(model.encode([q["question"] for q in questions]), dtype=np.float32)
+    builder = PromptBuilder(PROMPT_HEADER, PROMPT_INSTRUCTIONS)
+
+    def search(i, k):
+        return retriever.search(query_vectors[i], k, query_text=questions[i]["question"])
+
+    baseline = quality(questions, [search(i, args.top_k) for i in range(len(questions))], builder)
+    print(f"\n{'mode':<14} {'depth':>6} {'R@1':>6} {'MRR':>6} {'prompt':>7} {'skip':>5} "
+          f"{'cold p50':>9} {'cold p95':>9} {'warm p50':>9}")
+    print(f"{'baseline':<14} {args.top_k:>6} {baseline[0]:>6.2f} {baseline[1]:>6.2f} {baseline[2]:>7.2f}")
+
+    for budget in [float(b) for b in args.budgets.split(",")]:
+        reranker = CrossEncoderReranker(budget_ms=budget, skip_margin=args.skip_margin)
+        reranker.load()
+        ranked, cold, warm = [], [], []
+        for i, q in enumerate(questions):
+            candidates = search(i, reranker.depth(args.top_k))
+            start = time.perf_counter()
+            ranked.append(reranker.rerank(q["question"], candidates, args.top_k))
+            cold.append((time.perf_counter() - start) * 1000)
+        for i, q in enumerate(questions):
+            candidates = search(i, reranker.depth(args.top_k))
+            start = time.perf_counter()
+            reranker.rerank(q["question"], candidates, args.top_k)
+            warm.append((time.perf_counter() - start) * 1000)
+
+        stats = reranker.stats()
+        r1, mrr, in_prompt = quality(questions, ranked, builder)
+        skipped = stats["skipped_decisive"] / stats["requests"]
+        print(f"{'rerank ' + str(int(budget)) + 'ms':<14} {stats['avg_depth']:>6.1f} {r1:>6.2f} {mrr:>6.2f} "
+              f"{in_prompt:>7.2f} {skipped:>5.2f} {percentile(cold, 50):>7.1f}ms {percentile(cold, 95):>7.1f}ms "
+              f"{percentile(warm, 50):>7.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Retrieval evaluation: recall@k and latency for dense-only, BM25-only and hybrid (RRF)
+
+Run from the backend directory (after the backend has collected data/):
+
+    python benchmarks/eval_retrieval.py --k 1,3,5,8
+
+Chunks every source under data/ with the production chunker, embeds them with
+the production model, and runs the labeled questions in
+benchmarks/questions.json against each retriever. A question counts as
+recalled at k when one of the top-k chunks contains its expected answer.
+Latency is per question, excluding the query embedding (the same for the
+dense and hybrid modes).
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bm25 import BM25Index
+from chunker import JsonChunker
+from ingest import chunk_id, discover_sources, source_key, source_name
+from rag_system import EMBEDDING_MODEL_NAME
+from retrievers import HybridRetriever, NumpyRetriever
+
+BENCH_DIR = Path(__file__).resolve().parent
+
+
+def load_corpus(data_dir: Path):
+    chunker = JsonChunker()
+    ids, texts, metadatas = [], [], []
+    for path in discover_sources(data_dir):
+        source = source_name(source_key(data_dir, path))
+        for doc in chunker.chunk_file(path, source):
+            ids.append(chunk_id(source, doc["text"]))
+            texts.append(doc["text"])
+            metadatas.append(doc["metadata"])
+    return ids, texts, metadatas
+
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) if values else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data-dir", default="data")
+    parser.add_argument("--questions", default=str(BENCH_DIR / "questions.json"))
+    parser.add_argument("--k", default="1,3,5,8")
+    parser.add_argument("--repeat", type=int, default=20, help="Timed passes over the question set")
+    args = parser.parse_args()
+
+    from sentence_transformers import SentenceTransformer
+
+    ks = [int(k) for k in args.k.split(",")]
+    with open(args.questions, "r", encoding="utf-8") as f:
+        questions = json.load(f)
+    ids, texts, metadatas = load_corpus(Path(args.data_dir))
+    print(f"{len(ids)} chunks, {len(questions)} questions")
+
+    model = SentenceTransformer(EMBEDDING_MODEL_NAME)
+    dense = NumpyRetriever(ids, texts, metadatas, model.encode(texts, batch_size=64))
+    start = time.perf_counter()
+    lexical = BM25Index.build(ids, texts, metadatas)
+    print(f"BM25 index built in {(time.perf_counter() - start) * 1000:.1f} ms "
+          f"({len(lexical.vocab)} terms, {len(lexical.post_docs)} postings)")
+    hybrid = HybridRetriever(dense, lexical)
+    query_vectors = np.asarray(model.encode([q["question"] for q in questions]), dtype=np.float32)
+
+    modes = {
+        "dense": lambda i, k: dense.search(query_vectors[i], k),
+        "bm25": lambda i, k: lexical.search(questions[i]["question"], k),
+        "hybrid": lambda i, k: hybrid.search(query_vectors[i], k, query_text=questions[i]["question"])
+    }
+
+    header = " ".join(f"{'R@' + str(k):>6}" for k in ks)
+    print(f"\n{'mode':<8} {header} {'p50 us':>9} {'p95 us':>9}")
+    for name, search in modes.items():
+        recalls = []
+        for k in ks:
+            hits = sum(
+                any(q["answer"] in hit["text"] for hit in search(i, k))
+                for i, q in enumerate(questions)
+            )
+            recalls.append(hits / len(questions))
+
+        latencies = []
+        for _ in range(args.repeat):
+            for i in range(len(questions)):
+                start = time.perf_counter()
+                search(i, max(ks))
+                latencies.append((time.perf_counter() - start) * 1e6)
+        print(f"{name:<8} " + " ".join(f"{r:>6.2f}" for r in recalls) +
+              f" {percentile(latencies, 50):>9.0f} {percentile(latencies, 95):>9.0f}")
+
+    misses = [q["question"] for i, q in enumerate(questions)
+              if not any(q["answer"] in hit["text"] for hit in modes["hybrid"](i, max(ks)))]
+    if misses:
+        print(f"\nHybrid misses at k={max(ks)}:")
+        for question in misses:
+            print(f"  {question}")
+
+
+if __name__ == "__main__":
+    main()
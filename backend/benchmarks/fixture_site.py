@@ -0,0 +1,147 @@
+"""
+Local HTTP fixture site for exercising the crawler offline
+
+Serves a generated tree of department pages with robots.txt (a disallowed
+/private/ section and an optional Crawl-delay), ETag and Last-Modified
+validators that answer conditional GETs with 304, and optional latency:
+
+    python benchmarks/fixture_site.py --port 8200 --pages 200 --latency-ms 50
+    python crawler.py http://127.0.0.1:8200/ --data-dir /tmp/crawl-data
+"""
+import argparse
+import hashlib
+import threading
+import time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEPARTMENTS = ["Computer Science", "Mechanical", "Civil", "Electronics", "Chemical", "Biotechnology"]
+
+
+class FixtureSite:
+    def __init__(self, pages: int = 100, fanout: int = 4, latency_ms: float = 0.0, crawl_delay: float = None):
+        self.pages = pages
+        self.fanout = fanout
+        self.latency_ms = latency_ms
+        self.crawl_delay = crawl_delay
+        self.revisions = {}  # page number -> revision, bumped by touch()
+        self.modified_at = time.time()
+        self.lock = threading.Lock()
+        self.counts = {"requests": 0, "200": 0, "304": 0, "404": 0, "robots": 0}
+
+    def touch(self, page: int):
+        """Change a page's content (and validators)"""
+        with self.lock:
+            self.revisions[page] = self.revisions.get(page, 0) + 1
+
+    def count(self, key: str):
+        with self.lock:
+            self.counts[key] += 1
+
+    def robots(self) -> str:
+        lines = ["User-agent: *", "Disallow: /private/"]
+        if self.crawl_delay:
+            lines.append(f"Crawl-delay: {self.crawl_delay}")
+        return "\n".join(lines) + "\n"
+
+    def page(self, number: int) -> str:
+        department = DEPARTMENTS[number % len(DEPARTMENTS)]
+        revision = self.revisions.get(number, 0)
+        children = [c for c in range(number * self.fanout + 1, number * self.fanout + self.fanout + 1) if c < self.pages]
+        links = "".join(f'<li><a href="/dept/page-{c}.html">Page {c}</a></li>' for c in children)
+        return (
+            f"<html><head><title>{department} page {number}</title><script>var t = {time.time()};</script></head>"
+            f"<body><nav><a href=\"/\">Home</a> <a href=\"/private/admin.html\">Admin</a></nav>"
+            f"<h1>{department} department</h1><p>Page {number} revision {revision}.</p>"
+            f"<h2>Laboratories</h2><ul><li>Lab {number}-A with {20 + number % 30} workstations</li>"
+            f"<li>Lab {number}-B for research projects</li></ul>"
+            f"<h2>Contact</h2><p>Office {number}, block {number % 7}.</p>"
+            f"<h2>See also</h2><ul>{links}</ul><a href=\"/brochure.pdf\">Brochure</a></body></html>"
+        )
+
+
+def make_handler(site: FixtureSite):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            site.count("requests")
+            if site.latency_ms:
+                time.sleep(site.latency_ms / 1000.0)
+
+            if self.path == "/robots.txt":
+                site.count("robots")
+                return self._send(200, site.robots().encode("utf-8"), "text/plain")
+
+            number = None
+            if self.path in ("/", "/index.html"):
+                number = 0
+            elif self.path.startswith("/dept/page-") and self.path.endswith(".html"):
+                try:
+                    number = int(self.path[len("/dept/page-"):-len(".html")])
+                except ValueError:
+                    number = None
+            if number is None or number >= site.pages:
+                site.count("404")
+                return self._send(404, b"not found", "text/plain")
+
+            # Validators depend only on the page's revision, not on the volatile script
+            revision = site.revisions.get(number, 0)
+            etag = '"' + hashlib.sha1(f"{number}:{revision}".encode("utf-8")).hexdigest()[:16] + '"'
+            last_modified = formatdate(site.modified_at + revision, usegmt=True)
+            if self.headers.get("If-None-Match") == etag:
+                site.count("304")
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            site.count("200")
+            self._send(200, site.page(number).encode("utf-8"), "text/html; charset=utf-8",
+                       {"ETag": etag, "Last-Modified": last_modified})
+
+        def _send(self, status: int, body: bytes, content_type: str, headers: dict = None):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+    return Handler
+
+
+def start_fixture_site(host: str = "127.0.0.1", port: int = 0, site: FixtureSite = None) -> ThreadingHTTPServer:
+    """Serve the site in a background thread; the bound port is server.server_address[1]"""
+    server = ThreadingHTTPServer((host, port), make_handler(site or FixtureSite()))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8200)
+    parser.add_argument("--pages", type=int, default=100)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--crawl-delay", type=float, default=None)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(
+        (args.host, args.port),
+        make_handler(FixtureSite(args.pages, latency_ms=args.latency_ms, crawl_delay=args.crawl_delay))
+    )
+    print(f"Fixture site on http://{args.host}:{args.port}/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Local stand-in for the Hugging Face text-generation endpoint
+
+Speaks the same request/response shapes as the Inference API (plain JSON and
+stream=true server-sent events) and can inject latency and errors, so the
+inference client can be exercised offline:
+
+    python benchmarks/stub_llm_server.py --port 8100 --latency-ms 800 --error-rate 0.2
+    HF_API_URL=http://127.0.0.1:8100/generate HUGGINGFACE_API_KEY=stub python main.py
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ANSWER = ("ANSWER: MIT Manipal offers B.Tech programs in Computer Science, Information "
+          "Technology, Electronics and Communication, Mechanical, Civil and several other "
+          "branches. Admission is through MET or JEE Main.")
+
+
+class StubConfig:
+    def __init__(self, latency_ms: float = 0.0, jitter_ms: float = 0.0, token_latency_ms: float = 0.0,
+                 error_rate: float = 0.0, error_status: int = 503, fail_first: int = 0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.token_latency_ms = token_latency_ms
+        self.error_rate = error_rate
+        self.error_status = error_status
+        # Fail this many requests outright before behaving normally
+        self.fail_first = fail_first
+        self.requests = 0
+        self.lock = threading.Lock()
+
+
+def make_handler(config: StubConfig):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            payload = json.loads(body or b"{}")
+
+            with config.lock:
+                config.requests += 1
+                fail = config.requests <= config.fail_first or random.random() < config.error_rate
+
+            delay = config.latency_ms + random.uniform(0, config.jitter_ms)
+            time.sleep(delay / 1000.0)
+
+            if fail:
+                self._send_json(config.error_status, {"error": "Model is currently loading"},
+                                {"Retry-After": "0"} if config.error_status == 429 else None)
+                return
+
+            if payload.get("stream"):
+                self._stream()
+            else:
+                self._send_json(200, [{"generated_text": ANSWER}])
+
+        def _send_json(self, status: int, data, headers=None):
+            raw = json.dumps(data).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(raw)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(raw)
+
+        def _stream(self):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            words = ANSWER.split(" ")
+            for i, word in enumerate(words):
+                text = word if i == 0 else " " + word
+                event = {"token": {"id": i, "text": text, "special": False},
+                         "generated_text": ANSWER if i == len(words) - 1 else None}
+                self._chunk(f"data:{json.dumps(event)}\n\n".encode("utf-8"))
+                if config.token_latency_ms:
+                    time.sleep(config.token_latency_ms / 1000.0)
+            self._chunk(b"")
+
+        def _chunk(self, data: bytes):
+            self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+            self.wfile.flush()
+
+    return Handler
+
+
+def start_stub_server(host: str = "127.0.0.1", port: int = 0, config: StubConfig = None) -> ThreadingHTTPServer:
+    """Start the stub in a background thread; the bound port is server.server_address[1]"""
+    server = ThreadingHTTPServer((host, port), make_handler(config or StubConfig()))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Delay before the first byte")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Extra random delay on top of --latency-ms")
+    parser.add_argument("--token-latency-ms", type=float, default=0.0, help="Delay between streamed tokens")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests that fail")
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--fail-first", type=int, default=0, help="Fail the first N requests")
+    args = parser.parse_args()
+
+    config = StubConfig(args.latency_ms, args.jitter_ms, args.token_latency_ms,
+                        args.error_rate, args.error_status, args.fail_first)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(config))
+    print(f"Stub LLM server on http://{args.host}:{args.port}/generate")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+"""
+Compact in-memory BM25 index for exact-term lookups ("MET", "GATE percentile", "Block B")
+
+Documents are tokenized once into a forward index (term IDs and counts per
+document, as flat NumPy arrays). From it the inverted postings are laid out
+term-major in three flat arrays with the BM25 weight of every posting
+precomputed, so a query is a few slices, one concatenate and one bincount,
+with no per-document Python work. Indexes are immutable: with_changes()
+returns a new index for the next collection version, reusing the token
+arrays of unchanged documents instead of re-tokenizing them.
+"""
+import json
+import os
+import re
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+_WORD_RE = re.compile(r"[^\W_]+")
+STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from has have how i in is it its me my of on or "
+    "the their there this to was what when where which who will with you your".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in _WORD_RE.findall(text.lower()) if token not in STOPWORDS]
+
+
+class BM25Index:
+    def __init__(self, ids: List[str], texts: List[str], metadatas: List[Dict], vocab: Dict[str, int],
+                 doc_offsets, doc_terms, doc_counts, k1: float = 1.2, b: float = 0.75):
+        self.ids = list(ids)
+        self.texts = list(texts)
+        self.metadatas = list(metadatas)
+        self.vocab = vocab
+        self.k1 = k1
+        self.b = b
+        # Forward index: document d's terms are doc_terms[doc_offsets[d]:doc_offsets[d + 1]]
+        self.doc_offsets = np.asarray(doc_offsets, dtype=np.int64)
+        self.doc_terms = np.asarray(doc_terms, dtype=np.int32)
+        self.doc_counts = np.asarray(doc_counts, dtype=np.uint16)
+
+        sources = {}
+        self.doc_sources = np.asarray(
+            [sources.setdefault((metadata or {}).get("source"), len(sources)) for metadata in self.metadatas],
+            dtype=np.int32
+        )
+        self._source_codes = sources
+        self._build_postings()
+
+    @classmethod
+    def build(cls, ids: List[str], texts: List[str], metadatas: List[Dict], **kwargs) -> "BM25Index":
+        return cls.empty(**kwargs).with_changes(add_ids=ids, add_texts=texts, add_metadatas=metadatas)
+
+    @classmethod
+    def empty(cls, **kwargs) -> "BM25Index":
+        return cls([], [], [], {}, [0], [], [], **kwargs)
+
+    @classmethod
+    def from_collection(cls, collection, batch_size: int = 5000) -> "BM25Index":
+        """Tokenize every document of a Chroma collection"""
+        ids, texts, metadatas = [], [], []
+        for offset in range(0, collection.count(), batch_size):
+            batch = collection.get(include=["documents", "metadatas"], limit=batch_size, offset=offset)
+            ids.extend(batch["ids"])
+            texts.extend(batch["documents"])
+            metadatas.extend(batch["metadatas"])
+        return cls.build(ids, texts, metadatas)
+
+    def _build_postings(self):
+        n_docs = len(self.ids)
+        doc_of_posting = np.repeat(np.arange(n_docs, dtype=np.int32), np.diff(self.doc_offsets))
+        doc_lengths = np.bincount(doc_of_posting, weights=self.doc_counts, minlength=n_docs).astype(np.float32)
+        avg_length = float(doc_lengths.mean()) if n_docs else 0.0
+
+        # Postings sorted by term: term t's postings are [term_offsets[t], term_offsets[t + 1])
+        order = np.argsort(self.doc_terms, kind="stable")
+        self.post_docs = doc_of_posting[order]
+        terms = self.doc_terms[order]
+        tfs = self.doc_counts[order].astype(np.float32)
+
+        df = np.bincount(terms, minlength=len(self.vocab))
+        self.term_offsets = np.zeros(len(self.vocab) + 1, dtype=np.int64)
+        np.cumsum(df, out=self.term_offsets[1:])
+        idf = np.log1p((n_docs - df + 0.5) / (df + 0.5)).astype(np.float32)
+
+        norm = self.k1 * (1 - self.b + self.b * doc_lengths[self.post_docs] / avg_length) if avg_length else self.k1
+        self.post_weights = (idf[terms] * tfs * (self.k1 + 1) / (tfs + norm)).astype(np.float32)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def with_changes(self, remove_ids: Iterable[str] = (), add_ids: List[str] = (), add_texts: List[str] = (),
+                     add_metadatas: List[Dict] = ()) -> "BM25Index":
+        """A new index without remove_ids and with the given documents added (or replaced)"""
+        drop = set(remove_ids) | set(add_ids)
+        keep = [row for row, chunk_id in enumerate(self.ids) if chunk_id not in drop]
+
+        vocab = dict(self.vocab)
+        lengths = np.diff(self.doc_offsets)
+        term_parts, count_parts, new_lengths = [], [], []
+        if keep:
+            keep_rows = np.asarray(keep, dtype=np.int64)
+            mask = np.repeat(np.isin(np.arange(len(self.ids)), keep_rows), lengths)
+            term_parts.append(self.doc_terms[mask])
+            count_parts.append(self.doc_counts[mask])
+            new_lengths.append(lengths[keep_rows])
+
+        for text in add_texts:
+            counts = {}
+            for token in tokenize(text):
+                term = vocab.setdefault(token, len(vocab))
+                counts[term] = counts.get(term, 0) + 1
+            term_parts.append(np.fromiter(counts.keys(), dtype=np.int32, count=len(counts)))
+            count_parts.append(np.fromiter((min(c, 65535) for c in counts.values()), dtype=np.uint16, count=len(counts)))
+            new_lengths.append(np.asarray([len(counts)], dtype=np.int64))
+
+        doc_offsets = np.zeros(len(keep) + len(add_ids) + 1, dtype=np.int64)
+        if new_lengths:
+            np.cumsum(np.concatenate(new_lengths), out=doc_offsets[1:])
+        return BM25Index(
+            [self.ids[row] for row in keep] + list(add_ids),
+            [self.texts[row] for row in keep] + list(add_texts),
+            [self.metadatas[row] for row in keep] + list(add_metadatas),
+            vocab,
+            doc_offsets,
+            np.concatenate(term_parts) if term_parts else np.zeros(0, dtype=np.int32),
+            np.concatenate(count_parts) if count_parts else np.zeros(0, dtype=np.uint16),
+            k1=self.k1,
+            b=self.b
+        )
+
+    def search(self, query: str, top_k: int, source: Optional[str] = None) -> List[Dict]:
+        """Top-k hits by BM25 score, best first, as retriever-style hit dicts"""
+        terms = {self.vocab[token] for token in tokenize(query) if token in self.vocab}
+        if not terms or top_k <= 0:
+            return []
+        slices = [slice(self.term_offsets[t], self.term_offsets[t + 1]) for t in terms]
+        docs = np.concatenate([self.post_docs[s] for s in slices])
+        weights = np.concatenate([self.post_weights[s] for s in slices])
+        if source is not None:
+            code = self._source_codes.get(source)
+            if code is None:
+                return []
+            in_source = self.doc_sources[docs] == code
+            docs, weights = docs[in_source], weights[in_source]
+            if len(docs) == 0:
+                return []
+
+        candidates, inverse = np.unique(docs, return_inverse=True)
+        scores = np.bincount(inverse, weights=weights)
+        k = min(top_k, len(candidates))
+        top = np.argpartition(-scores, k - 1)[:k] if k < len(candidates) else np.arange(len(candidates))
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [
+            {
+                "id": self.ids[row],
+                "text": self.texts[row],
+                "metadata": self.metadatas[row],
+                "score": float(scores[i])
+            }
+            for i, row in ((i, int(candidates[i])) for i in top)
+        ]
+
+    def save(self, path):
+        """Write the index as <path>.npz (arrays) plus <path>.json (ids, texts, metadata, vocabulary)
+
+        Each file is replaced atomically, but not the pair: both carry the same random
+        save ID, and load() rejects a pair whose IDs differ.
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        save_id = os.urandom(8).hex()
+        tmp = path.with_name(path.name + ".tmp.npz")
+        np.savez(tmp, doc_offsets=self.doc_offsets, doc_terms=self.doc_terms, doc_counts=self.doc_counts,
+                 save_id=np.array(save_id))
+        os.replace(tmp, path.with_name(path.name + ".npz"))
+        tmp = path.with_name(path.name + ".tmp.json")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"ids": self.ids, "texts": self.texts, "metadatas": self.metadatas, "vocab": self.vocab,
+                       "k1": self.k1, "b": self.b, "save_id": save_id}, f, ensure_ascii=False)
+        os.replace(tmp, path.with_name(path.name + ".json"))
+
+    @classmethod
+    def load(cls, path) -> Optional["BM25Index"]:
+        path = Path(path)
+        if not path.with_name(path.name + ".json").exists():
+            return None
+        try:
+            with open(path.with_name(path.name + ".json"), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            arrays = np.load(path.with_name(path.name + ".npz"))
+            save_id = str(arrays["save_id"]) if "save_id" in arrays.files else None
+        except (OSError, ValueError) as e:
+            print(f"Could not load lexical index {path}: {e}")
+            return None
+        if save_id is None or save_id != meta.get("save_id"):
+            # A crash between the two replaces in save() (or files from before save IDs)
+            print(f"Lexical index files {path}.npz and {path}.json are not from the same save, ignoring them")
+            return None
+        return cls(meta["ids"], meta["texts"], meta["metadatas"], meta["vocab"], arrays["doc_offsets"],
+                   arrays["doc_terms"], arrays["doc_counts"], k1=meta["k1"], b=meta["b"])
+
+    @staticmethod
+    def remove_files(path):
+        path = Path(path)
+        for suffix in (".npz", ".json"):
+            try:
+                path.with_name(path.name + suffix).unlink()
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,347 @@
+"""
+Structure-aware streaming chunker for JSON knowledge files (and documents)
+
+The JSON tree is walked once as a stream of (key path, value) leaves. Leaves
+are packed greedily into chunks of at most max_tokens; when a chunk would
+overflow it is cut at the shallowest key-path boundary inside the pending
+window, so chunks follow subtree boundaries instead of character counts.
+Chunks never cross a change in the first boundary_depth keys (e.g. "fees"
+and "hostel_fees" never share a chunk). Only the pending window is held in
+memory, so multi-hundred-MB inputs chunk in flat memory when read through
+iter_json_file (which streams with ijson when it is installed).
+
+Markdown and HTML pages go through the same packing: their heading outline is
+the key path and each paragraph, list item or table cell is a leaf.
+"""
+import json
+import os
+import re
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Tuple
+
+try:
+    import ijson
+except ImportError:  # Optional: without it, .json files are parsed whole
+    ijson = None
+
+Leaf = Tuple[tuple, object]
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+_MD_HEADING_RE = re.compile(r"^(#{1,6})\s+(.*?)\s*#*\s*$")
+_MD_LIST_RE = re.compile(r"^\s*(?:[-*+]|\d+[.)])\s+")
+
+HTML_BLOCK_TAGS = {"p", "li", "dt", "dd", "tr", "pre", "blockquote", "figcaption", "caption"}
+HTML_SKIP_TAGS = {"script", "style", "noscript", "nav", "footer", "template", "svg"}
+DOCUMENT_SUFFIXES = {".md", ".markdown", ".html", ".htm"}
+
+
+class Heading(str):
+    """A path key taken from a document heading: rendered as written, not title-cased"""
+
+
+def approximate_token_count(text: str) -> int:
+    """Word and punctuation count; close to WordPiece counts for English text"""
+    return len(_TOKEN_RE.findall(text))
+
+
+def make_token_counter(tokenizer=None) -> Callable[[str], int]:
+    """Token counter backed by a Hugging Face tokenizer, or the approximation"""
+    if tokenizer is None:
+        return approximate_token_count
+    return lambda text: len(tokenizer.encode(text, add_special_tokens=False))
+
+
+def iter_json_leaves(obj, path: tuple = ()) -> Iterator[Leaf]:
+    """Yield (key path, scalar) for every leaf of an already parsed JSON value"""
+    if isinstance(obj, dict):
+        for key, value in obj.items():
+            yield from iter_json_leaves(value, path + (key,))
+    elif isinstance(obj, list):
+        for index, value in enumerate(obj):
+            yield from iter_json_leaves(value, path + (index,))
+    else:
+        yield path, obj
+
+
+def _iter_ijson_leaves(f) -> Iterator[Leaf]:
+    # Track the path ourselves: ijson's dotted prefixes are ambiguous for
+    # keys that contain dots, like "B.Tech Programs"
+    path = []
+    containers = []
+    for _, event, value in ijson.parse(f):
+        if event == "map_key":
+            path[-1] = value
+            continue
+        if event in ("end_map", "end_array"):
+            containers.pop()
+            path.pop()
+            continue
+        if containers and containers[-1] == "array":
+            path[-1] += 1
+        if event == "start_map":
+            containers.append("map")
+            path.append(None)
+        elif event == "start_array":
+            containers.append("array")
+            path.append(-1)
+        else:
+            yield tuple(path), value
+
+
+def iter_json_file(file_path) -> Iterator[Leaf]:
+    """Stream the leaves of a .json or .jsonl file"""
+    file_path = Path(file_path)
+    if file_path.suffix == ".jsonl":
+        with open(file_path, "r", encoding="utf-8") as f:
+            for line_number, line in enumerate(f):
+                if line.strip():
+                    yield from iter_json_leaves(json.loads(line), (line_number,))
+        return
+    if ijson is not None:
+        with open(file_path, "rb") as f:
+            yield from _iter_ijson_leaves(f)
+        return
+    with open(file_path, "r", encoding="utf-8") as f:
+        yield from iter_json_leaves(json.load(f))
+
+
+def iter_markdown_leaves(text: str) -> Iterator[Leaf]:
+    """Yield (heading path + block index, block text) for each paragraph, list item or code block"""
+    headings = []  # (level, Heading)
+    block = []
+    index = 0
+    in_fence = False
+
+    def flush():
+        nonlocal index
+        if block:
+            content = " ".join(line.strip() for line in block) if not in_fence else "\n".join(block)
+            if content.strip():
+                yield tuple(h for _, h in headings) + (index,), content.strip()
+                index += 1
+            block.clear()
+
+    for line in text.splitlines():
+        if line.lstrip().startswith(("```", "~~~")):
+            yield from flush()
+            in_fence = not in_fence
+            continue
+        if in_fence:
+            block.append(line)
+            continue
+        match = _MD_HEADING_RE.match(line)
+        if match:
+            yield from flush()
+            level = len(match.group(1))
+            while headings and headings[-1][0] >= level:
+                headings.pop()
+            headings.append((level, Heading(match.group(2))))
+            index = 0
+        elif not line.strip():
+            yield from flush()
+        elif _MD_LIST_RE.match(line):
+            # Each list item is its own leaf so packing can cut between items
+            yield from flush()
+            block.append(_MD_LIST_RE.sub("", line, count=1))
+        else:
+            block.append(line)
+    yield from flush()
+
+
+def iter_html_leaves(html) -> Iterator[Leaf]:
+    """Yield (heading path + block index, text) for the innermost text blocks of an HTML page.
+
+    html is the page source or an already parsed lxml tree.
+    """
+    import lxml.html
+
+    root = html if hasattr(html, "iter") else lxml.html.fromstring(html)
+    headings = []  # (level, Heading)
+    index = 0
+    title = root.findtext(".//title")
+    if title and title.strip():
+        headings.append((0, Heading(" ".join(title.split()))))
+
+    for element in root.iter():
+        tag = element.tag if isinstance(element.tag, str) else ""
+        if tag in HTML_SKIP_TAGS or any(a.tag in HTML_SKIP_TAGS for a in element.iterancestors()):
+            continue
+        if len(tag) == 2 and tag[0] == "h" and tag[1] in "123456":
+            level = int(tag[1])
+            text = " ".join(" ".join(element.itertext()).split())
+            if text:
+                while headings and headings[-1][0] >= level:
+                    headings.pop()
+                headings.append((level, Heading(text)))
+                index = 0
+        elif tag in HTML_BLOCK_TAGS:
+            # Only innermost blocks, so a <li><p>..</p></li> isn't emitted twice
+            if any(isinstance(d.tag, str) and d.tag in HTML_BLOCK_TAGS for d in element.iterdescendants()):
+                continue
+            text = " ".join(" ".join(element.itertext()).split())
+            if text:
+                yield tuple(h for _, h in headings) + (index,), text
+                index += 1
+
+
+def iter_file_leaves(file_path) -> Iterator[Leaf]:
+    """Stream the leaves of any supported source file, picking the reader by suffix"""
+    file_path = Path(file_path)
+    suffix = file_path.suffix.lower()
+    if suffix in (".md", ".markdown"):
+        with open(file_path, "r", encoding="utf-8") as f:
+            yield from iter_markdown_leaves(f.read())
+    elif suffix in (".html", ".htm"):
+        with open(file_path, "rb") as f:
+            yield from iter_html_leaves(f.read())
+    else:
+        yield from iter_json_file(file_path)
+
+
+def _common_depth(a: tuple, b: tuple) -> int:
+    depth = 0
+    for x, y in zip(a, b):
+        if x != y:
+            break
+        depth += 1
+    return depth
+
+
+class JsonChunker:
+    VERSION = 2
+
+    def __init__(self, max_tokens: int = None, overlap_tokens: int = None, boundary_depth: int = None,
+                 token_counter: Callable[[str], int] = None):
+        self.max_tokens = max_tokens or int(os.getenv("RAG_CHUNK_MAX_TOKENS", "128"))
+        if overlap_tokens is None:
+            overlap_tokens = int(os.getenv("RAG_CHUNK_OVERLAP_TOKENS", "16"))
+        self.overlap_tokens = min(overlap_tokens, self.max_tokens // 2)
+        if boundary_depth is None:
+            boundary_depth = int(os.getenv("RAG_CHUNK_BOUNDARY_DEPTH", "1"))
+        self.boundary_depth = boundary_depth
+        self.count_tokens = token_counter or approximate_token_count
+
+    @property
+    def signature(self) -> str:
+        """Changes whenever the same input could chunk differently"""
+        return f"{self.VERSION}-{self.max_tokens}-{self.overlap_tokens}-{self.boundary_depth}"
+
+    @staticmethod
+    def render(path: tuple, value) -> str:
+        """One readable line per leaf, e.g. 'Tuition Fees B.Tech Per Year: ₹4,00,000'"""
+        keys = [
+            key if isinstance(key, Heading) else str(key).replace("_", " ").title()
+            for key in path if not isinstance(key, int)
+        ]
+        if not keys:
+            return str(value)
+        return f"{' '.join(keys)}: {value}"
+
+    def chunk_file(self, file_path, source: str) -> Iterator[Dict]:
+        doc_type = "document" if Path(file_path).suffix.lower() in DOCUMENT_SUFFIXES else "structured_data"
+        return self.chunks(iter_file_leaves(file_path), source, doc_type)
+
+    def chunk_data(self, data, source: str) -> Iterator[Dict]:
+        return self.chunks(iter_json_leaves(data), source)
+
+    def chunks(self, leaves: Iterator[Leaf], source: str, doc_type: str = "structured_data") -> Iterator[Dict]:
+        """Pack a leaf stream into chunks of at most max_tokens"""
+        pending = []  # (path, text, tokens)
+        pending_tokens = 0
+        # A document path always ends in a block index, which is never a hard boundary
+        trailing = 1 if doc_type == "document" else 0
+
+        def boundary(path):
+            return path[:min(self.boundary_depth, len(path) - trailing)]
+
+        for path, value in leaves:
+            text = self.render(path, value)
+            tokens = self.count_tokens(text)
+
+            if pending and boundary(path) != boundary(pending[0][0]):
+                yield self._make_chunk(pending, source, doc_type)
+                pending, pending_tokens = [], 0
+
+            if tokens > self.max_tokens:
+                # A single leaf that can't fit anywhere: flush, then window it
+                if pending:
+                    yield self._make_chunk(pending, source, doc_type)
+                    pending, pending_tokens = [], 0
+                yield from self._split_long_leaf(path, text, tokens, source, doc_type)
+                continue
+
+            pending.append((path, text, tokens))
+            pending_tokens += tokens
+            while pending_tokens > self.max_tokens:
+                cut = self._best_cut(pending)
+                yield self._make_chunk(pending[:cut], source, doc_type)
+                carry = self._overlap(pending, cut)
+                pending = carry + pending[cut:]
+                pending_tokens = sum(item[2] for item in pending)
+                if carry and pending_tokens > self.max_tokens:
+                    # Overlap alone would keep us over budget; drop it
+                    pending = pending[len(carry):]
+                    pending_tokens = sum(item[2] for item in pending)
+
+        if pending:
+            yield self._make_chunk(pending, source, doc_type)
+
+    def _best_cut(self, pending: List) -> int:
+        """Index to cut before: the shallowest path boundary that leaves a non-empty head within budget"""
+        best_cut = None
+        best_depth = None
+        head_tokens = 0
+        for i in range(1, len(pending)):
+            head_tokens += pending[i - 1][2]
+            if head_tokens > self.max_tokens:
+                break
+            depth = _common_depth(pending[i - 1][0], pending[i][0])
+            # Prefer shallower boundaries; among equals, the fuller chunk
+            if best_depth is None or depth <= best_depth:
+                best_cut, best_depth = i, depth
+        return best_cut or 1
+
+    def _overlap(self, pending: List, cut: int) -> List:
+        """Trailing leaves of the emitted chunk to repeat, when the cut splits siblings"""
+        if not self.overlap_tokens or cut >= len(pending):
+            return []
+        left, right = pending[cut - 1][0], pending[cut][0]
+        if left[:-1] != right[:-1]:
+            return []
+        carry = []
+        tokens = 0
+        for item in reversed(pending[:cut]):
+            if tokens + item[2] > self.overlap_tokens:
+                break
+            carry.insert(0, item)
+            tokens += item[2]
+        return carry
+
+    def _split_long_leaf(self, path: tuple, text: str, tokens: int, source: str, doc_type: str) -> Iterator[Dict]:
+        words = text.split()
+        # Windows are sized in words, scaled by this leaf's tokens-per-word ratio
+        ratio = max(tokens / max(len(words), 1), 1.0)
+        window = max(int(self.max_tokens / ratio), 1)
+        step = max(window - int(self.overlap_tokens / ratio), 1)
+        for start in range(0, len(words), step):
+            piece = " ".join(words[start:start + window])
+            yield self._make_chunk([(path, piece, self.count_tokens(piece))], source, doc_type)
+            if start + window >= len(words):
+                break
+
+    @staticmethod
+    def _make_chunk(items: List, source: str, doc_type: str = "structured_data") -> Dict:
+        paths = [item[0] for item in items]
+        common = paths[0]
+        for path in paths[1:]:
+            common = common[:_common_depth(common, path)]
+        text = ". ".join(item[1].rstrip(".") for item in items) + "."
+        return {
+            "text": text,
+            "metadata": {
+                "source": source,
+                "type": doc_type,
+                "path": "/".join(str(key) for key in common),
+                "tokens": sum(item[2] for item in items)
+            }
+        }
@@ -0,0 +1,316 @@
+"""
+Bounded per-conversation state, for answering follow-up questions
+
+Each conversation keeps its last RAG_CONVERSATION_TURNS turns in a fixed-size
+ring. Conversations are held in LRU order under one global memory cap
+(RAG_CONVERSATION_MAX_MB, estimated from the stored objects); past it the
+least recently used are evicted, into RAG_CONVERSATION_DB (a SQLite file in
+WAL mode) when that is set, otherwise dropped. However many sessions are
+active, memory stays under the cap, and a spilled conversation is read back
+on its next message. Only the latest turn keeps its retrieved chunk IDs,
+since only that turn's chunks are ever reused.
+
+Follow-ups ("and for girls?", "what about its timings?") are recognized from
+their words alone: a continuation opener, a pronoun pointing back, or almost
+no topic terms of their own, unless the question clearly names a different
+topic (another intent). They are rewritten by prefixing the question that
+started the topic, and when the previous turn's chunks already contain every
+topic term of the follow-up, those chunks are answered from again instead of
+embedding and searching. With serve.py every worker keeps its own store.
+"""
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional
+
+from bm25 import tokenize
+
+_WORD_RE = re.compile(r"[^\W_]+")
+
+# Openers that only make sense as a continuation of the previous question
+OPENERS = frozenset(["and", "also", "then", "but", "what about", "how about", "what of", "same for"])
+# Words that point back at the previous topic
+REFERENCES = frozenset("it its they them their this that these those there same".split())
+# Words that say nothing about the topic
+FILLER = frozenset("about also else more other please tell explain details detail info information".split())
+
+
+class Turn:
+    """One question of a conversation; topic is the standalone question its thread started with"""
+    __slots__ = ("question", "topic", "intent", "chunk_ids")
+
+    def __init__(self, question: str, topic: str, intent: Optional[str] = None, chunk_ids=()):
+        self.question = question
+        self.topic = topic
+        self.intent = intent
+        self.chunk_ids = tuple(chunk_ids)
+
+    def to_list(self) -> List:
+        return [self.question, self.topic, self.intent, list(self.chunk_ids)]
+
+
+_TURN_BYTES = sys.getsizeof(Turn("", ""))
+
+
+def _turn_size(turn: Turn) -> int:
+    size = _TURN_BYTES + sys.getsizeof(turn.question)
+    if turn.topic is not turn.question:
+        size += sys.getsizeof(turn.topic)
+    return size + _ids_size(turn.chunk_ids)
+
+
+def _ids_size(chunk_ids) -> int:
+    if not chunk_ids:
+        return 0
+    return sys.getsizeof(chunk_ids) + sum(sys.getsizeof(chunk_id) for chunk_id in chunk_ids)
+
+
+def topic_terms(question: str) -> List[str]:
+    return [term for term in tokenize(question) if term not in FILLER]
+
+
+def is_follow_up(question: str, intent: Optional[str], previous: Turn) -> bool:
+    """Whether question continues the previous turn's topic rather than starting its own"""
+    words = _WORD_RE.findall(question.lower())
+    if not words or (intent is not None and intent != previous.intent):
+        return False
+    if words[0] in OPENERS or " ".join(words[:2]) in OPENERS:
+        return True
+    return len(topic_terms(question)) <= 1 or (len(words) <= 12 and not REFERENCES.isdisjoint(words))
+
+
+def covers(question: str, texts: Iterable[str]) -> bool:
+    """Whether every topic term of question occurs in texts"""
+    missing = set(topic_terms(question))
+    for text in texts:
+        if not missing:
+            break
+        missing.difference_update(tokenize(text))
+    return not missing
+
+
+class _Conversation:
+    __slots__ = ("turns", "count", "updated", "size")
+
+    def __init__(self, max_turns: int):
+        self.turns = [None] * max_turns
+        self.count = 0
+        self.updated = time.time()
+        self.size = 0
+
+    def last(self) -> Optional[Turn]:
+        return self.turns[(self.count - 1) % len(self.turns)] if self.count else None
+
+    def ordered(self) -> List[Turn]:
+        n = len(self.turns)
+        return [self.turns[i % n] for i in range(max(0, self.count - n), self.count)]
+
+    def append(self, turn: Turn) -> int:
+        """Add turn over the oldest one; returns the change in estimated size"""
+        delta = 0
+        previous = self.last()
+        if previous is not None and previous.chunk_ids:
+            delta -= _ids_size(previous.chunk_ids)
+            previous.chunk_ids = ()
+        slot = self.count % len(self.turns)
+        if self.turns[slot] is not None:
+            delta -= _turn_size(self.turns[slot])
+        self.turns[slot] = turn
+        self.count += 1
+        return delta + _turn_size(turn)
+
+
+class _SpillFile:
+    """Evicted conversations, keyed by conversation ID; each lives either here or in memory"""
+
+    def __init__(self, path: str, ttl: float):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+        self._writes = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        # Opened per process: serve.py forks workers after the store is created
+        if self._conn is None or self._pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS conversations "
+                "(id TEXT PRIMARY KEY, updated REAL NOT NULL, turns TEXT NOT NULL)"
+            )
+            self._conn = conn
+            self._pid = os.getpid()
+        return self._conn
+
+    def put_many(self, rows: List[tuple]):
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.executemany("INSERT OR REPLACE INTO conversations (id, updated, turns) VALUES (?, ?, ?)", rows)
+            except:
+                # All or nothing, and the caller sees the original error
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+            self._writes += len(rows)
+            if self._writes >= 1000:
+                self._writes = 0
+                conn.execute("DELETE FROM conversations WHERE updated < ?", (time.time() - self.ttl,))
+
+    def take(self, key: str) -> Optional[tuple]:
+        """(updated, turns JSON) of a spilled conversation, removed from the file"""
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute("SELECT updated, turns FROM conversations WHERE id = ?", (key,)).fetchone()
+                if row is not None:
+                    conn.execute("DELETE FROM conversations WHERE id = ?", (key,))
+            except:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+            return row
+
+
+class ConversationStore:
+    def __init__(self, max_turns: int = None, max_bytes: int = None, db_path: str = None,
+                 ttl_seconds: float = None):
+        self.max_turns = max_turns or int(os.getenv("RAG_CONVERSATION_TURNS", "6"))
+        self.max_bytes = max_bytes or int(float(os.getenv("RAG_CONVERSATION_MAX_MB", "64")) * 1024 * 1024)
+        # Eviction goes a little below the cap, so spills are written in batches rather than one per request
+        self._evict_to = self.max_bytes * 0.95
+        self.ttl = ttl_seconds if ttl_seconds is not None else float(
+            os.getenv("RAG_CONVERSATION_TTL_SECONDS", "86400")
+        )
+        db_path = db_path if db_path is not None else os.getenv("RAG_CONVERSATION_DB", "")
+        self._spill = _SpillFile(db_path, self.ttl) if db_path else None
+
+        self._lock = threading.Lock()
+        self._conversations = OrderedDict()
+        self.bytes = 0
+        # Per conversation: the object, its ring of turn slots and an OrderedDict entry
+        self._conversation_bytes = (
+            sys.getsizeof(_Conversation(1)) + sys.getsizeof([None] * self.max_turns) + 100
+        )
+        self._counters = {"evicted": 0, "spilled": 0, "restored": 0, "expired": 0}
+
+    @staticmethod
+    def _key(conversation_id: str) -> str:
+        # Client-chosen IDs are stored as given unless long enough to matter
+        if len(conversation_id) <= 64:
+            return conversation_id
+        return hashlib.sha1(conversation_id.encode("utf-8")).hexdigest()
+
+    def last(self, conversation_id: str) -> Optional[Turn]:
+        """The latest turn of a conversation, or None for a new (or expired) one"""
+        key = self._key(conversation_id)
+        with self._lock:
+            conversation = self._conversations.get(key)
+            if conversation is not None:
+                if conversation.updated < time.time() - self.ttl:
+                    self._remove(key)
+                    self._counters["expired"] += 1
+                    return None
+                self._conversations.move_to_end(key)
+                return conversation.last()
+        if self._spill is None:
+            return None
+        conversation = self._restore(key)
+        return conversation.last() if conversation is not None else None
+
+    def append(self, conversation_id: str, turn: Turn):
+        key = self._key(conversation_id)
+        with self._lock:
+            conversation = self._conversations.get(key)
+            if conversation is None:
+                conversation = self._insert(key, _Conversation(self.max_turns))
+            else:
+                self._conversations.move_to_end(key)
+            delta = conversation.append(turn)
+            conversation.size += delta
+            conversation.updated = time.time()
+            self.bytes += delta
+            evicted = self._evict()
+        self._spill_out(evicted)
+
+    def _insert(self, key: str, conversation: _Conversation) -> _Conversation:
+        conversation.size += self._conversation_bytes + sys.getsizeof(key)
+        self.bytes += conversation.size
+        self._conversations[key] = conversation
+        return conversation
+
+    def _remove(self, key: str):
+        self.bytes -= self._conversations.pop(key).size
+
+    def _evict(self) -> List[tuple]:
+        """Drop least recently used conversations once over the cap; returns them for spilling"""
+        evicted = []
+        if self.bytes <= self.max_bytes:
+            return evicted
+        while self.bytes > self._evict_to and len(self._conversations) > 1:
+            key, conversation = self._conversations.popitem(last=False)
+            self.bytes -= conversation.size
+            evicted.append((key, conversation))
+        self._counters["evicted"] += len(evicted)
+        return evicted
+
+    def _spill_out(self, evicted: List[tuple]):
+        if not evicted or self._spill is None:
+            return
+        rows = [
+            (key, conversation.updated, json.dumps([turn.to_list() for turn in conversation.ordered()]))
+            for key, conversation in evicted
+        ]
+        try:
+            self._spill.put_many(rows)
+        except sqlite3.Error as e:
+            print(f"Error spilling conversations to {self._spill.path}: {e}")
+            return
+        with self._lock:
+            self._counters["spilled"] += len(rows)
+
+    def _restore(self, key: str) -> Optional[_Conversation]:
+        try:
+            row = self._spill.take(key)
+        except sqlite3.Error as e:
+            print(f"Error reading conversation from {self._spill.path}: {e}")
+            return None
+        if row is None or row[0] < time.time() - self.ttl:
+            return None
+        conversation = _Conversation(self.max_turns)
+        for question, topic, intent, chunk_ids in json.loads(row[1]):
+            topic = question if topic == question else topic
+            conversation.size += conversation.append(Turn(question, topic, intent, chunk_ids))
+        conversation.updated = row[0]
+        with self._lock:
+            # Another request for the same conversation may have got here first
+            existing = self._conversations.get(key)
+            if existing is not None:
+                return existing
+            self._insert(key, conversation)
+            self._counters["restored"] += 1
+            evicted = self._evict()
+        self._spill_out(evicted)
+        return conversation
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "conversations": len(self._conversations),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "max_turns": self.max_turns,
+                "spill": self._spill.path if self._spill else None,
+                **self._counters
+            }
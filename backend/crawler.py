@@ -0,0 +1,348 @@
+"""
+Concurrent, polite web crawler that feeds the knowledge base
+
+Pages are fetched with an async HTTP client (httpx) under a global and a
+per-host concurrency limit, a per-host request interval, and robots.txt
+(including Crawl-delay). Every response is kept in an on-disk cache with its
+ETag/Last-Modified, and recrawls send conditional GETs, so unchanged pages
+come back as 304 without a body. Pages are parsed with lxml in a process pool
+and written under data/crawl/<host>/ as Markdown, which the ingestion pipeline
+picks up like any other source. A page file is only rewritten when its text
+changed, so incremental rebuilds skip everything else.
+
+    python crawler.py https://manipal.edu/mit.html --max-pages 500
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urldefrag, urlsplit
+from urllib.robotparser import RobotFileParser
+
+from chunker import iter_html_leaves
+
+USER_AGENT = "ManipalGPT-Crawler/1.0 (+https://manipal.edu/mit)"
+SKIP_EXTENSIONS = {
+    ".pdf", ".jpg", ".jpeg", ".png", ".gif", ".svg", ".webp", ".ico", ".css", ".js", ".zip",
+    ".doc", ".docx", ".xls", ".xlsx", ".ppt", ".pptx", ".mp3", ".mp4", ".avi", ".woff", ".woff2"
+}
+
+
+def normalize_url(url: str) -> str:
+    url, _ = urldefrag(url.strip())
+    parts = urlsplit(url)
+    path = parts.path or "/"
+    query = f"?{parts.query}" if parts.query else ""
+    return f"{parts.scheme.lower()}://{parts.netloc.lower()}{path}{query}"
+
+
+def parse_page(url: str, body: bytes) -> Tuple[str, List[str]]:
+    """Worker task: return the page as Markdown and the absolute URLs it links to"""
+    import lxml.html
+
+    root = lxml.html.fromstring(body, base_url=url)
+    root.make_links_absolute(url, resolve_base_href=True)
+    links = [link for element, attribute, link, _ in root.iterlinks() if element.tag == "a" and attribute == "href"]
+
+    lines = []
+    headings = ()
+    for path, text in iter_html_leaves(root):
+        outline = path[:-1]
+        if outline != headings:
+            # Emit only the headings that differ from the previous block's outline
+            common = 0
+            while common < min(len(outline), len(headings)) and outline[common] == headings[common]:
+                common += 1
+            for depth in range(common, len(outline)):
+                lines.append(f"{'#' * min(depth + 1, 6)} {outline[depth]}")
+            headings = outline
+        lines.append(text)
+    # One block per paragraph, so each list item or table row stays its own leaf
+    return "\n\n".join(lines) + "\n", links
+
+
+class ResponseCache:
+    """On-disk store of the last response per URL: metadata (validators) plus body"""
+
+    def __init__(self, cache_dir: Path):
+        self.dir = Path(cache_dir)
+        self.dir.mkdir(parents=True, exist_ok=True)
+
+    def _paths(self, url: str) -> Tuple[Path, Path]:
+        key = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        return self.dir / f"{key}.json", self.dir / f"{key}.body"
+
+    def get(self, url: str) -> Tuple[Optional[Dict], Optional[bytes]]:
+        meta_path, body_path = self._paths(url)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            return meta, body_path.read_bytes()
+        except (OSError, ValueError):
+            return None, None
+
+    def put(self, url: str, meta: Dict, body: bytes):
+        meta_path, body_path = self._paths(url)
+        # Body first: a meta file always describes a complete body
+        tmp = body_path.with_suffix(".tmp")
+        tmp.write_bytes(body)
+        os.replace(tmp, body_path)
+        tmp = meta_path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp, meta_path)
+
+    def delete(self, url: str):
+        for path in self._paths(url):
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+
+
+class _Host:
+    """Per-host politeness state"""
+
+    def __init__(self, concurrency: int, delay: float):
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.delay = delay
+        self.next_request_at = 0.0
+        self.lock = asyncio.Lock()
+        self.robots = None
+
+    async def wait_turn(self):
+        # Space request starts at least `delay` apart, across all of this host's workers
+        async with self.lock:
+            now = time.monotonic()
+            wait = self.next_request_at - now
+            self.next_request_at = max(now, self.next_request_at) + self.delay
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+class Crawler:
+    def __init__(self, start_urls: List[str], data_dir: str = "data", cache_dir: str = None,
+                 max_pages: int = None, max_depth: int = None, allowed_hosts: List[str] = None,
+                 concurrency: int = None, per_host_concurrency: int = None, delay: float = None,
+                 parse_workers: int = None, user_agent: str = USER_AGENT):
+        self.start_urls = [normalize_url(url) for url in start_urls]
+        self.output_dir = Path(data_dir) / "crawl"
+        self.cache = ResponseCache(cache_dir or os.getenv("RAG_CRAWL_CACHE_DIR", "crawl_cache"))
+        self.max_pages = max_pages or int(os.getenv("RAG_CRAWL_MAX_PAGES", "1000"))
+        self.max_depth = max_depth if max_depth is not None else int(os.getenv("RAG_CRAWL_MAX_DEPTH", "3"))
+        self.allowed_hosts = set(allowed_hosts or [urlsplit(url).netloc for url in self.start_urls])
+        self.concurrency = concurrency or int(os.getenv("RAG_CRAWL_CONCURRENCY", "16"))
+        self.per_host_concurrency = per_host_concurrency or int(os.getenv("RAG_CRAWL_PER_HOST", "2"))
+        self.delay = delay if delay is not None else float(os.getenv("RAG_CRAWL_DELAY_SECONDS", "0.5"))
+        if parse_workers is None:
+            parse_workers = int(os.getenv("RAG_CRAWL_PARSE_WORKERS", str(min(os.cpu_count() or 1, 4))))
+        self.parse_workers = parse_workers
+        self.user_agent = user_agent
+
+        self._hosts = {}
+        self._seen = set()
+        self._queued = 0
+        self.stats = {
+            "fetched": 0, "not_modified": 0, "written": 0, "unchanged": 0,
+            "removed": 0, "disallowed": 0, "skipped": 0, "failed": 0
+        }
+
+    def crawl(self) -> Dict:
+        """Run the crawl to completion (from synchronous code) and return its stats"""
+        return asyncio.run(self.run())
+
+    async def run(self) -> Dict:
+        import httpx
+
+        start = time.perf_counter()
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        queue = asyncio.Queue()
+        for url in self.start_urls:
+            self._enqueue(queue, url, 0)
+
+        pool = None
+        if self.parse_workers > 1:
+            pool = ProcessPoolExecutor(max_workers=self.parse_workers, mp_context=multiprocessing.get_context("spawn"))
+        limits = httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency)
+        try:
+            async with httpx.AsyncClient(
+                headers={"User-Agent": self.user_agent},
+                timeout=httpx.Timeout(15.0, connect=5.0),
+                limits=limits,
+                follow_redirects=True
+            ) as client:
+                workers = [asyncio.create_task(self._worker(client, queue, pool)) for _ in range(self.concurrency)]
+                await queue.join()
+                for worker in workers:
+                    worker.cancel()
+                await asyncio.gather(*workers, return_exceptions=True)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+        self.stats["seconds"] = round(time.perf_counter() - start, 2)
+        print("Crawl complete: " + ", ".join(f"{key} {value}" for key, value in self.stats.items()))
+        return self.stats
+
+    def _enqueue(self, queue: asyncio.Queue, url: str, depth: int):
+        url = normalize_url(url)
+        parts = urlsplit(url)
+        if url in self._seen or parts.scheme not in ("http", "https") or parts.netloc not in self.allowed_hosts:
+            return
+        if os.path.splitext(parts.path)[1].lower() in SKIP_EXTENSIONS:
+            return
+        if self._queued >= self.max_pages:
+            return
+        self._seen.add(url)
+        self._queued += 1
+        queue.put_nowait((url, depth))
+
+    async def _worker(self, client, queue: asyncio.Queue, pool):
+        while True:
+            url, depth = await queue.get()
+            try:
+                links = await self._process(client, url, pool)
+                if depth < self.max_depth:
+                    for link in links:
+                        self._enqueue(queue, link, depth + 1)
+            except Exception as e:
+                self.stats["failed"] += 1
+                print(f"Crawl error for {url}: {e}")
+            finally:
+                queue.task_done()
+
+    async def _host(self, client, url: str) -> _Host:
+        parts = urlsplit(url)
+        host = self._hosts.get(parts.netloc)
+        if host is None:
+            host = _Host(self.per_host_concurrency, self.delay)
+            self._hosts[parts.netloc] = host
+            host.robots = await self._fetch_robots(client, f"{parts.scheme}://{parts.netloc}/robots.txt")
+            crawl_delay = host.robots.crawl_delay(self.user_agent)
+            if crawl_delay:
+                host.delay = max(host.delay, float(crawl_delay))
+        # Workers that raced to create the host wait here until robots.txt is in
+        while host.robots is None:
+            await asyncio.sleep(0.01)
+        return host
+
+    async def _fetch_robots(self, client, robots_url: str) -> RobotFileParser:
+        robots = RobotFileParser(robots_url)
+        try:
+            response = await client.get(robots_url)
+        except Exception:
+            response = None
+        if response is None or response.status_code >= 500:
+            robots.parse([])  # unreachable: allow, like most crawlers
+        elif response.status_code in (401, 403):
+            robots.disallow_all = True
+        elif response.status_code >= 400:
+            robots.allow_all = True
+        else:
+            robots.parse(response.text.splitlines())
+        return robots
+
+    async def _process(self, client, url: str, pool) -> List[str]:
+        host = await self._host(client, url)
+        if not host.robots.can_fetch(self.user_agent, url):
+            self.stats["disallowed"] += 1
+            return []
+
+        meta, cached_body = self.cache.get(url)
+        headers = {}
+        if meta and cached_body is not None:
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+
+        async with host.semaphore:
+            await host.wait_turn()
+            response = await client.get(url, headers=headers)
+
+        output_path = self._output_path(url)
+        if response.status_code == 304 and cached_body is not None:
+            self.stats["not_modified"] += 1
+            body, base_url = cached_body, meta.get("final_url", url)
+            if output_path.exists() and meta.get("links") is not None:
+                # Nothing to parse or write: reuse the links recorded last time
+                self.stats["unchanged"] += 1
+                return meta["links"]
+        elif response.status_code in (404, 410):
+            self.cache.delete(url)
+            if output_path.exists():
+                output_path.unlink()
+                self.stats["removed"] += 1
+            return []
+        elif response.status_code == 200:
+            self.stats["fetched"] += 1
+            if "html" not in response.headers.get("content-type", "text/html"):
+                self.stats["skipped"] += 1
+                return []
+            body, base_url = response.content, str(response.url)
+            meta = {
+                "url": url,
+                "final_url": base_url,
+                "etag": response.headers.get("etag"),
+                "last_modified": response.headers.get("last-modified"),
+                "fetched_at": time.time()
+            }
+        else:
+            self.stats["failed"] += 1
+            return []
+
+        if pool is not None:
+            markdown, links = await asyncio.get_running_loop().run_in_executor(pool, parse_page, base_url, body)
+        else:
+            markdown, links = parse_page(base_url, body)
+
+        meta["links"] = links
+        self.cache.put(url, meta, body)
+        self._write_page(output_path, url, markdown)
+        return links
+
+    def _write_page(self, output_path: Path, url: str, markdown: str):
+        content = markdown
+        try:
+            if output_path.read_text(encoding="utf-8") == content:
+                self.stats["unchanged"] += 1
+                return
+        except OSError:
+            pass
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = output_path.with_suffix(".tmp")
+        tmp.write_text(content, encoding="utf-8")
+        os.replace(tmp, output_path)
+        self.stats["written"] += 1
+
+    def _output_path(self, url: str) -> Path:
+        """data/crawl/<host>/<path>.md, with a hash suffix for query strings"""
+        parts = urlsplit(url)
+        path = parts.path.strip("/") or "index"
+        path = re.sub(r"\.(html?|php|aspx?|jsp)$", "", path)
+        path = re.sub(r"[^A-Za-z0-9._/-]+", "_", path)
+        if parts.query:
+            path += "_" + hashlib.sha1(parts.query.encode("utf-8")).hexdigest()[:8]
+        host = re.sub(r"[^A-Za-z0-9.-]+", "_", parts.netloc)
+        return self.output_dir / host / f"{path}.md"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Crawl pages into data/crawl for the knowledge base")
+    parser.add_argument("start_urls", nargs="+")
+    parser.add_argument("--data-dir", default="data")
+    parser.add_argument("--max-pages", type=int)
+    parser.add_argument("--max-depth", type=int)
+    args = parser.parse_args()
+    Crawler(args.start_urls, data_dir=args.data_dir, max_pages=args.max_pages, max_depth=args.max_depth).crawl()
+
+
+if __name__ == "__main__":
+    main()
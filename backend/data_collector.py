@@ -26,7 +26,22 @@ class DataCollector:
         self.collect_facilities_info()
         self.collect_admission_info()
         
+        # Live pages, when start URLs are configured
+        self.crawl_pages()
+        
         print("Data collection complete!")
+    
+    def crawl_pages(self, start_urls: List[str] = None) -> Dict:
+        """Crawl pages into data/crawl; recrawls only download pages that changed"""
+        if start_urls is None:
+            start_urls = [url.strip() for url in os.getenv("RAG_CRAWL_START_URLS", "").split(",") if url.strip()]
+        if not start_urls:
+            return {}
+        
+        from crawler import Crawler
+        
+        print(f"Crawling {', '.join(start_urls)}...")
+        return Crawler(start_urls, data_dir=str(self.data_dir)).crawl()
         
     def collect_manipal_official_data(self):
         """Collect data from official Manipal websites"""
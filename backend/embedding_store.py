@@ -0,0 +1,158 @@
+"""
+Persistent on-disk embedding cache keyed by (model, text hash)
+
+Vectors live in an append-only float32 file that is memory-mapped for reads,
+next to an append-only file of 20-byte SHA-1 text digests (row i of one is
+row i of the other). Appends take an exclusive file lock and write vectors
+before digests, so the digest file is the commit record: a crash mid-append
+leaves at most some trailing vector bytes and a partial digest, which the
+next writer truncates.
+Several worker processes on one host can share the same directory.
+
+Each model gets its own subdirectory, so changing the model name or version
+starts from an empty cache instead of returning stale vectors.
+"""
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+from typing import List
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process use only
+    fcntl = None
+
+DIGEST_SIZE = 20
+FORMAT_VERSION = 1
+
+
+class FileLock:
+    def __init__(self, path: Path, exclusive: bool):
+        self.path = path
+        self.exclusive = exclusive
+        self._file = None
+
+    def __enter__(self):
+        self._file = open(self.path, "a+b")
+        if fcntl:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_EX if self.exclusive else fcntl.LOCK_SH)
+        return self
+
+    def __exit__(self, *exc):
+        if fcntl:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        self._file.close()
+
+
+class EmbeddingStore:
+    def __init__(self, model_id: str, dim: int, cache_dir: str = None):
+        self.model_id = model_id
+        self.dim = dim
+        self.row_bytes = dim * 4
+        root = Path(cache_dir or os.getenv("RAG_EMBEDDING_CACHE_DIR", "embedding_cache"))
+        slug = hashlib.sha1(f"{model_id}|{dim}|{FORMAT_VERSION}".encode("utf-8")).hexdigest()[:16]
+        self.dir = root / slug
+        self.dir.mkdir(parents=True, exist_ok=True)
+
+        self.vectors_path = self.dir / "vectors.f32"
+        self.index_path = self.dir / "index.bin"
+        self.lock_path = self.dir / "lock"
+        meta_path = self.dir / "meta.json"
+        if not meta_path.exists():
+            with open(meta_path, "w", encoding="utf-8") as f:
+                json.dump({"model": model_id, "dim": dim, "format": FORMAT_VERSION}, f)
+
+        self._lock = threading.Lock()
+        self._rows = {}  # digest -> row
+        self._index_offset = 0
+        self._matrix = None
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def digest(text: str) -> bytes:
+        return hashlib.sha1(text.encode("utf-8")).digest()
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._refresh()
+            return len(self._rows)
+
+    def encode(self, texts: List[str], model, batch_size: int = 64, show_progress_bar: bool = False) -> np.ndarray:
+        """Return embeddings for texts, encoding and storing only the ones not cached yet"""
+        digests = [self.digest(text) for text in texts]
+        result = np.empty((len(texts), self.dim), dtype=np.float32)
+
+        with self._lock:
+            self._refresh()
+            missing = []
+            for i, digest in enumerate(digests):
+                row = self._rows.get(digest)
+                if row is None:
+                    missing.append(i)
+                else:
+                    result[i] = self._matrix[row]
+            self.hits += len(texts) - len(missing)
+            self.misses += len(missing)
+
+        if missing:
+            # Encode each distinct missing text once
+            unique = {}
+            for i in missing:
+                unique.setdefault(digests[i], texts[i])
+            vectors = np.asarray(
+                model.encode(list(unique.values()), batch_size=batch_size, show_progress_bar=show_progress_bar),
+                dtype=np.float32
+            )
+            by_digest = dict(zip(unique.keys(), vectors))
+            for i in missing:
+                result[i] = by_digest[digests[i]]
+            self.put(list(by_digest.keys()), vectors)
+
+        return result
+
+    def put(self, digests: List[bytes], vectors: np.ndarray):
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        with self._lock, FileLock(self.lock_path, exclusive=True):
+            self._refresh()
+            fresh = [i for i, digest in enumerate(digests) if digest not in self._rows]
+            if not fresh:
+                return
+            # Anything past the committed rows, in either file, is debris from an interrupted append
+            committed = self._index_offset // DIGEST_SIZE
+            with open(self.vectors_path, "ab") as f:
+                f.truncate(committed * self.row_bytes)
+                f.write(vectors[fresh].tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            with open(self.index_path, "ab") as f:
+                f.truncate(committed * DIGEST_SIZE)
+                f.write(b"".join(digests[i] for i in fresh))
+                f.flush()
+                os.fsync(f.fileno())
+            self._refresh()
+
+    def _refresh(self):
+        """Pick up rows appended by this or another process since the last look"""
+        if not self.index_path.exists():
+            return
+        index_size = self.index_path.stat().st_size
+        committed = index_size // DIGEST_SIZE
+        if committed * DIGEST_SIZE > self._index_offset:
+            with open(self.index_path, "rb") as f:
+                f.seek(self._index_offset)
+                data = f.read(committed * DIGEST_SIZE - self._index_offset)
+            start = self._index_offset // DIGEST_SIZE
+            for j in range(len(data) // DIGEST_SIZE):
+                self._rows[data[j * DIGEST_SIZE:(j + 1) * DIGEST_SIZE]] = start + j
+            self._index_offset = committed * DIGEST_SIZE
+
+        if committed and (self._matrix is None or self._matrix.shape[0] < committed):
+            self._matrix = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(committed, self.dim))
+
+    def stats(self) -> dict:
+        return {"rows": len(self), "hits": self.hits, "misses": self.misses, "path": str(self.dir)}
@@ -0,0 +1,231 @@
+"""
+Sentence encoder backends for the embedding model
+
+- "torch": the sentence-transformers model as is.
+- "onnx": the same model (transformer, pooling and normalization) exported
+  once to ONNX and run under ONNX Runtime, with RAG_ONNX_INTRA_OP_THREADS /
+  RAG_ONNX_INTER_OP_THREADS threads.
+- "onnx-int8": the ONNX export with its weights dynamically quantized to int8.
+
+Exports are written under RAG_ONNX_DIR, one directory per model, together
+with the tokenizer and the PyTorch embeddings of a few reference sentences.
+Exporting needs torch; loading an existing export only needs onnxruntime and
+transformers. Every load encodes the reference sentences again and refuses
+the export if any of them is further from the PyTorch embedding than the
+backend's tolerance (cosine similarity RAG_ONNX_MIN_COSINE, default 0.9999
+for fp32 and 0.99 for int8), so RAGSystem falls back to torch instead of
+serving drifted vectors.
+
+Texts are sorted by length before batching, and each batch is padded to a
+multiple of RAG_ONNX_SEQ_BUCKET tokens rather than to the longest text of the
+whole call: short questions never pay for a long document's padding, and the
+runtime sees a handful of shapes instead of one per batch.
+"""
+import inspect
+import json
+import math
+import os
+import threading
+from pathlib import Path
+from typing import List
+
+import numpy as np
+
+from embedding_store import FileLock
+
+ENCODERS = ("torch", "onnx", "onnx-int8")
+
+MIN_COSINE = {"onnx": 0.9999, "onnx-int8": 0.99}
+
+# Encoded with PyTorch at export time and again on every load
+REFERENCE_SENTENCES = [
+    "What are the hostel fees?",
+    "and for girls?",
+    "Which B.Tech branches does MIT Manipal offer, and what is the annual tuition fee for each of them?",
+    "Library timings",
+    "The central library is open from 8 AM to midnight on all working days and has over 100,000 volumes, "
+    "e-journal subscriptions and separate reading halls for postgraduate students.",
+    "Placement statistics: 92% of eligible students were placed, with a median package of 12 LPA.",
+    "Anti-ragging committee contact",
+    "Hostel blocks 1 to 20 are for men; blocks 8, 10 and 13 are for women, with AC and non-AC rooms.",
+]
+
+
+class OnnxEncoder:
+    """A sentence-transformers model under ONNX Runtime, with the same encode() interface"""
+
+    def __init__(self, model_name: str, quantize: bool = False, model_dir: str = None,
+                 intra_op_threads: int = None, inter_op_threads: int = None, bucket: int = None,
+                 min_cosine: float = None):
+        self.model_name = model_name
+        self.quantize = quantize
+        self.name = "onnx-int8" if quantize else "onnx"
+        root = Path(model_dir or os.getenv("RAG_ONNX_DIR", "onnx_models"))
+        self.dir = root / model_name.replace("/", "__")
+        self.intra_op_threads = intra_op_threads if intra_op_threads is not None else int(
+            os.getenv("RAG_ONNX_INTRA_OP_THREADS", "0")
+        )
+        self.inter_op_threads = inter_op_threads if inter_op_threads is not None else int(
+            os.getenv("RAG_ONNX_INTER_OP_THREADS", "1")
+        )
+        self.bucket = bucket or int(os.getenv("RAG_ONNX_SEQ_BUCKET", "16"))
+        self.min_cosine = min_cosine or float(os.getenv("RAG_ONNX_MIN_COSINE") or MIN_COSINE[self.name])
+        self.version = None
+        self.parity = None
+        self._tokenizer = None
+        self._tokenizer_lock = threading.Lock()
+        self._input_names = None
+        self._session = None
+        self._session_pid = None
+        self._session_lock = threading.Lock()
+
+    @property
+    def path(self) -> Path:
+        return self.dir / ("model-int8.onnx" if self.quantize else "model.onnx")
+
+    def load(self):
+        import onnxruntime
+        from transformers import AutoTokenizer
+
+        self.dir.mkdir(parents=True, exist_ok=True)
+        with FileLock(self.dir / "export.lock", exclusive=True):
+            if not (self.dir / "encoder.json").exists():
+                self._export()
+            if self.quantize and not self.path.exists():
+                from onnxruntime.quantization import QuantType, quantize_dynamic
+
+                print(f"Quantizing {self.dir / 'model.onnx'} to int8...")
+                tmp = self.dir / "model-int8.onnx.tmp"
+                quantize_dynamic(str(self.dir / "model.onnx"), str(tmp), weight_type=QuantType.QInt8)
+                os.replace(tmp, self.path)
+
+        with open(self.dir / "encoder.json", "r", encoding="utf-8") as f:
+            config = json.load(f)
+        self.max_seq_length = config["max_seq_length"]
+        # Padding to a bucket must never go past the truncation length
+        self.bucket = math.gcd(self.bucket, self.max_seq_length)
+        self.dim = config["dim"]
+        self.version = f"{self.name}-{config['source']}-onnxruntime-{onnxruntime.__version__}"
+        self._tokenizer = AutoTokenizer.from_pretrained(str(self.dir))
+
+        # The check runs on a throwaway session: serve.py forks workers after loading the
+        # model, and runtime thread pools don't survive a fork
+        session = self._new_session()
+        self._input_names = [i.name for i in session.get_inputs()]
+        vectors = self._encode(session, REFERENCE_SENTENCES, len(REFERENCE_SENTENCES))
+        reference = np.load(self.dir / "reference.npy")
+        self.parity = float(np.min(np.sum(vectors * reference, axis=1)
+                                   / np.linalg.norm(vectors, axis=1) / np.linalg.norm(reference, axis=1)))
+        if self.parity < self.min_cosine:
+            raise ValueError(f"{self.path} differs from the PyTorch model: cosine similarity {self.parity:.5f} "
+                             f"< {self.min_cosine}")
+        print(f"Loaded {self.name} encoder from {self.path} (cosine similarity to PyTorch >= {self.parity:.5f})")
+        return self
+
+    def _export(self):
+        """Export transformer, pooling and normalization as one graph, and record reference embeddings"""
+        import sentence_transformers
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        print(f"Exporting {self.model_name} to ONNX in {self.dir}...")
+        model = SentenceTransformer(self.model_name, device="cpu")
+        model.eval()
+        sample = model.tokenize(["an example sentence to trace the model with"])
+        input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+
+        class Pooled(torch.nn.Module):
+            def __init__(self):
+                super().__init__()
+                self.model = model
+
+            def forward(self, *inputs):
+                return self.model(dict(zip(input_names, inputs)))["sentence_embedding"]
+
+        tmp = self.dir / "model.onnx.tmp"
+        kwargs = {}
+        if "dynamo" in inspect.signature(torch.onnx.export).parameters:
+            kwargs["dynamo"] = False
+        with torch.no_grad():
+            torch.onnx.export(
+                Pooled(), tuple(sample[name] for name in input_names), str(tmp),
+                input_names=input_names, output_names=["sentence_embedding"],
+                dynamic_axes={**{name: {0: "batch", 1: "sequence"} for name in input_names},
+                              "sentence_embedding": {0: "batch"}},
+                opset_version=14, **kwargs
+            )
+        os.replace(tmp, self.dir / "model.onnx")
+        model.tokenizer.save_pretrained(str(self.dir))
+        reference = model.encode(REFERENCE_SENTENCES, batch_size=len(REFERENCE_SENTENCES), convert_to_numpy=True)
+        np.save(self.dir / "reference.npy", reference.astype(np.float32))
+        # Written last: its presence means the export is complete
+        with open(self.dir / "encoder.json", "w", encoding="utf-8") as f:
+            json.dump({
+                "model": self.model_name,
+                "source": f"sentence-transformers-{sentence_transformers.__version__}",
+                "max_seq_length": model.max_seq_length,
+                "dim": model.get_sentence_embedding_dimension()
+            }, f, indent=2)
+
+    def _new_session(self):
+        import onnxruntime
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = self.intra_op_threads
+        options.inter_op_num_threads = self.inter_op_threads
+        return onnxruntime.InferenceSession(str(self.path), options, providers=["CPUExecutionProvider"])
+
+    def _get_session(self):
+        if self._session is None or self._session_pid != os.getpid():
+            with self._session_lock:
+                if self._session is None or self._session_pid != os.getpid():
+                    self._session = self._new_session()
+                    self._session_pid = os.getpid()
+        return self._session
+
+    def _encode(self, session, texts: List[str], batch_size: int) -> np.ndarray:
+        out = np.empty((len(texts), self.dim), dtype=np.float32)
+        # Longest first, so each batch holds texts of similar length
+        order = sorted(range(len(texts)), key=lambda i: -len(texts[i]))
+        for start in range(0, len(order), batch_size):
+            rows = order[start:start + batch_size]
+            with self._tokenizer_lock:
+                features = self._tokenizer(
+                    [texts[i] for i in rows], padding=True, truncation=True, max_length=self.max_seq_length,
+                    pad_to_multiple_of=self.bucket, return_tensors="np"
+                )
+            feeds = {name: features[name].astype(np.int64) for name in self._input_names}
+            out[rows] = session.run(None, feeds)[0]
+        return out
+
+    def encode(self, sentences, batch_size: int = 32, show_progress_bar: bool = False, **kwargs) -> np.ndarray:
+        if isinstance(sentences, str):
+            return self.encode([sentences], batch_size=batch_size)[0]
+        if not len(sentences):
+            return np.empty((0, self.dim), dtype=np.float32)
+        return self._encode(self._get_session(), list(sentences), max(1, batch_size))
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dim
+
+
+def make_encoder(kind: str, model_name: str):
+    """The loaded encoder; anything with SentenceTransformer's encode() and dimension"""
+    if kind == "torch":
+        from sentence_transformers import SentenceTransformer
+
+        return SentenceTransformer(model_name)
+    if kind in ("onnx", "onnx-int8"):
+        return OnnxEncoder(model_name, quantize=kind == "onnx-int8").load()
+    raise ValueError(f"Unknown encoder '{kind}' (expected one of: {', '.join(ENCODERS)})")
+
+
+def encoder_version(encoder) -> str:
+    """Identifies the backend and library versions, for keying cached embeddings"""
+    version = getattr(encoder, "version", None)
+    if isinstance(version, str):
+        return version
+    import sentence_transformers
+
+    return f"sentence-transformers-{sentence_transformers.__version__}"
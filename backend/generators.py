@@ -0,0 +1,268 @@
+"""
+Local CPU answer generators, as an alternative to the remote Inference API
+
+Each backend keeps one model instance per process, served by a single worker
+thread: concurrent requests queue up in front of it and are taken a batch at
+a time, so the model is never loaded twice or called from several threads.
+
+- "extractive": a distilled extractive QA model (transformers) that picks the
+  answer span out of the retrieved contexts; requests are truly batched.
+- "llama-cpp": a quantized GGUF instruct model via llama-cpp-python. Sequences
+  run one at a time, but every prompt starts with the prompt builder's fixed
+  prefix, which is evaluated once at load time; llama.cpp reuses those KV-cache entries for
+  each request and only evaluates the per-question part.
+"""
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, Iterator, List
+
+
+def _default_threads() -> int:
+    return int(os.getenv("RAG_LOCAL_THREADS", str(os.cpu_count() or 1)))
+
+
+class Generator:
+    """Answers a question from retrieved context chunks"""
+    name = "base"
+
+    def load(self):
+        """Load the model ahead of the first request"""
+
+    def generate(self, question: str, contexts: List[str]) -> str:
+        raise NotImplementedError
+
+    def stream(self, question: str, contexts: List[str]) -> Iterator[str]:
+        yield self.generate(question, contexts)
+
+    def stats(self) -> Dict:
+        return {"name": self.name}
+
+
+class _SharedModelWorker:
+    """Runs batches of requests against one shared model on a single thread"""
+
+    def __init__(self, name: str, run_batch: Callable[[List], List], max_batch_size: int = 1,
+                 max_wait_ms: float = 0.0):
+        self.name = name
+        self.run_batch = run_batch
+        self.max_batch_size = max(max_batch_size, 1)
+        self.max_wait = max(max_wait_ms, 0.0) / 1000.0
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._items = 0
+
+    def submit(self, payload) -> Future:
+        future = Future()
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                    self._thread.start()
+        self._queue.put((payload, future))
+        return future
+
+    def _collect_batch(self) -> List:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get_nowait() if remaining <= 0 else self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            try:
+                results = self.run_batch([payload for payload, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            with self._stats_lock:
+                self._batches += 1
+                self._items += len(batch)
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+
+    def stats(self) -> Dict:
+        with self._stats_lock:
+            return {
+                "batches": self._batches,
+                "items": self._items,
+                "avg_batch_size": round(self._items / self._batches, 2) if self._batches else 0.0,
+                "queued": self._queue.qsize()
+            }
+
+
+class ExtractiveQAGenerator(Generator):
+    name = "extractive"
+
+    def __init__(self, model_name: str = None, threads: int = None, max_batch_size: int = None,
+                 max_wait_ms: float = None, min_score: float = None, max_contexts: int = 3):
+        self.model_name = model_name or os.getenv("RAG_EXTRACTIVE_MODEL", "distilbert-base-cased-distilled-squad")
+        self.threads = threads or _default_threads()
+        self.min_score = min_score if min_score is not None else float(os.getenv("RAG_EXTRACTIVE_MIN_SCORE", "0.1"))
+        self.max_contexts = max_contexts
+        self._pipeline = None
+        self._load_lock = threading.Lock()
+        self._worker = _SharedModelWorker(
+            "extractive-qa",
+            self._run_batch,
+            max_batch_size=max_batch_size or int(os.getenv("RAG_GENERATOR_BATCH_SIZE", "8")),
+            max_wait_ms=max_wait_ms if max_wait_ms is not None else float(os.getenv("RAG_GENERATOR_BATCH_WAIT_MS", "5"))
+        )
+
+    def load(self):
+        with self._load_lock:
+            if self._pipeline is None:
+                import torch
+                from transformers import pipeline
+
+                torch.set_num_threads(self.threads)
+                self._pipeline = pipeline("question-answering", model=self.model_name, device=-1)
+
+    def generate(self, question: str, contexts: List[str]) -> str:
+        """The sentence around the best answer span, or "" when the model isn't confident"""
+        return self._worker.submit((question, "\n".join(contexts[:self.max_contexts]))).result()
+
+    def _run_batch(self, payloads: List) -> List[str]:
+        self.load()
+        results = self._pipeline(
+            [{"question": question, "context": context} for question, context in payloads],
+            batch_size=len(payloads)
+        )
+        if isinstance(results, dict):
+            results = [results]
+        answers = []
+        for (_, context), result in zip(payloads, results):
+            if not result or result["score"] < self.min_score:
+                answers.append("")
+            else:
+                answers.append(self._enclosing_sentence(context, result["start"], result["end"]))
+        return answers
+
+    @staticmethod
+    def _enclosing_sentence(context: str, start: int, end: int) -> str:
+        # Chunk text is "Key Path: value. Key Path: value." lines, so widen the span to its leaf
+        left = max(context.rfind(". ", 0, start), context.rfind("\n", 0, start))
+        right_candidates = [i for i in (context.find(". ", end), context.find("\n", end)) if i != -1]
+        right = min(right_candidates) if right_candidates else len(context)
+        return context[left + 1:right].strip().rstrip(".") + "."
+
+    def stats(self) -> Dict:
+        return {"name": self.name, "model": self.model_name, "threads": self.threads, **self._worker.stats()}
+
+
+class LlamaCppGenerator(Generator):
+    name = "llama-cpp"
+
+    def __init__(self, prompt_builder, model_path: str = None, threads: int = None,
+                 max_new_tokens: int = None, context_size: int = None):
+        self.prompt_builder = prompt_builder
+        self.model_path = model_path or os.getenv("RAG_LOCAL_MODEL_PATH", "")
+        self.threads = threads or _default_threads()
+        self.max_new_tokens = max_new_tokens or int(os.getenv("RAG_LOCAL_MAX_NEW_TOKENS", "256"))
+        self.context_size = context_size or int(os.getenv("RAG_LOCAL_CONTEXT", "2048"))
+        self.temperature = float(os.getenv("RAG_LOCAL_TEMPERATURE", "0.7"))
+        self._llm = None
+        self._load_lock = threading.Lock()
+        self._worker = _SharedModelWorker("llama-cpp", self._run_batch)
+        self._tokens = 0
+        self._seconds = 0.0
+
+    def load(self):
+        with self._load_lock:
+            if self._llm is not None:
+                return
+            if not self.model_path:
+                raise RuntimeError("RAG_LOCAL_MODEL_PATH is not set")
+            from llama_cpp import Llama
+
+            llm = Llama(
+                model_path=self.model_path,
+                n_ctx=self.context_size,
+                n_threads=self.threads,
+                verbose=False
+            )
+            # Evaluate the fixed prefix once; each later prompt that starts with
+            # it matches these KV-cache entries and skips straight past them
+            llm.eval(llm.tokenize(self.prompt_builder.prefix.encode("utf-8")))
+            self._llm = llm
+
+    def count_tokens(self, text: str) -> int:
+        """Token count under this model's own tokenizer (load() first)"""
+        return len(self._llm.tokenize(text.encode("utf-8"), add_bos=False))
+
+    def generate(self, question: str, contexts: List[str]) -> str:
+        return "".join(self.stream(question, contexts)).strip()
+
+    def stream(self, question: str, contexts: List[str]) -> Iterator[str]:
+        tokens = queue.Queue()
+        cancelled = threading.Event()
+        future = self._worker.submit((self.prompt_builder.render(question, contexts), tokens, cancelled))
+        try:
+            while True:
+                text = tokens.get()
+                if text is None:
+                    break
+                yield text
+            future.result()
+        finally:
+            # The consumer went away (client disconnected): stop generating for it
+            cancelled.set()
+
+    def _run_batch(self, payloads: List) -> List:
+        self.load()
+        for prompt, tokens, cancelled in payloads:
+            start = time.perf_counter()
+            count = 0
+            try:
+                for part in self._llm.create_completion(
+                    prompt,
+                    max_tokens=self.max_new_tokens,
+                    temperature=self.temperature,
+                    top_p=0.9,
+                    stop=["USER QUESTION:"],
+                    stream=True
+                ):
+                    if cancelled.is_set():
+                        break
+                    count += 1
+                    tokens.put(part["choices"][0]["text"])
+            finally:
+                tokens.put(None)
+                self._tokens += count
+                self._seconds += time.perf_counter() - start
+        return [None] * len(payloads)
+
+    def stats(self) -> Dict:
+        return {
+            "name": self.name,
+            "model": os.path.basename(self.model_path),
+            "threads": self.threads,
+            "tokens_per_second": round(self._tokens / self._seconds, 1) if self._seconds else None,
+            **self._worker.stats()
+        }
+
+
+GENERATORS = ("hf", "extractive", "llama-cpp")
+
+
+def make_generator(kind: str, prompt_builder):
+    """The configured local generator, or None for the remote Inference API ("hf")"""
+    if kind == "hf":
+        return None
+    if kind == "extractive":
+        return ExtractiveQAGenerator()
+    if kind == "llama-cpp":
+        return LlamaCppGenerator(prompt_builder)
+    raise ValueError(f"Unknown generator '{kind}' (expected one of: {', '.join(GENERATORS)})")
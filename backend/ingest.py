@@ -0,0 +1,297 @@
+"""
+Streaming ingestion pipeline: chunk -> embed -> write, joined by bounded queues
+
+Source files are chunked in a process pool, chunks are grouped into fixed-size
+batches and embedded on one thread, and the embedded batches are written to
+the vector store on another, so encoding overlaps with writes. Every hand-off
+is bounded (at most a few files in flight per chunking worker, a few batches
+per queue), so a slow stage blocks the one before it instead of letting chunks
+pile up: peak memory depends on the batch and queue sizes, not on the corpus.
+"""
+import hashlib
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Set, Tuple
+
+SOURCE_SUFFIXES = {".json", ".jsonl", ".md", ".markdown", ".html", ".htm"}
+# Files this big are chunked as a stream on the dispatcher thread, so their
+# chunks never have to be materialised as one list in a worker
+STREAM_FILE_BYTES = 32 * 1024 * 1024
+PROGRESS_INTERVAL_SECONDS = 10.0
+
+
+def discover_sources(data_dir) -> List[Path]:
+    """Every supported source file under data_dir, in a stable order (dot-files skipped)"""
+    data_dir = Path(data_dir)
+    if not data_dir.exists():
+        return []
+    return sorted(
+        path for path in data_dir.rglob("*")
+        if path.is_file()
+        and path.suffix.lower() in SOURCE_SUFFIXES
+        and not any(part.startswith(".") for part in path.relative_to(data_dir).parts)
+    )
+
+
+def source_key(data_dir, path) -> str:
+    """Manifest key for a source file: its path relative to the data directory"""
+    return Path(path).relative_to(data_dir).as_posix()
+
+
+def source_name(key: str) -> str:
+    """Source label stored with each chunk: 'fees.json' -> 'fees', 'cse/labs.html' -> 'cse/labs'"""
+    return key.rsplit(".", 1)[0]
+
+
+def chunk_id(source: str, text: str) -> str:
+    """Stable chunk ID derived from its content"""
+    return f"{source}_{hashlib.sha1(text.encode('utf-8')).hexdigest()[:20]}"
+
+
+def _chunk_source(chunker, path, source: str) -> Tuple[List[Tuple[str, str, Dict]], float]:
+    """Process-pool task: chunk one file and return (id, text, metadata) triples and the time taken"""
+    start = time.perf_counter()
+    chunks = [(chunk_id(source, doc["text"]), doc["text"], doc["metadata"]) for doc in chunker.chunk_file(path, source)]
+    return chunks, time.perf_counter() - start
+
+
+class _Aborted(Exception):
+    pass
+
+
+class StageStats:
+    def __init__(self, name: str):
+        self.name = name
+        self.items = 0
+        self.busy = 0.0
+        self.started = None
+        self.finished = None
+
+    def add(self, items: int, seconds: float):
+        now = time.perf_counter()
+        if self.started is None:
+            self.started = now - seconds
+        self.finished = now
+        self.items += items
+        self.busy += seconds
+
+    def as_dict(self) -> Dict:
+        wall = (self.finished - self.started) if self.started is not None else 0.0
+        return {
+            "items": self.items,
+            "busy_seconds": round(self.busy, 3),
+            "wall_seconds": round(wall, 3),
+            # Throughput while the stage was actually working: the lowest one is the bottleneck
+            "items_per_second": round(self.items / self.busy, 1) if self.busy else None
+        }
+
+
+class IngestionPipeline:
+    def __init__(self, chunker, encode: Callable[[List[str]], object], workers: int = None,
+                 batch_size: int = None, queue_batches: int = None):
+        self.chunker = chunker
+        self.encode = encode
+        if workers is None:
+            workers = int(os.getenv("RAG_INGEST_WORKERS", str(min(os.cpu_count() or 1, 8))))
+        self.workers = max(workers, 0)
+        self.batch_size = batch_size or int(os.getenv("RAG_INGEST_BATCH_SIZE", "256"))
+        self.queue_batches = queue_batches or int(os.getenv("RAG_INGEST_QUEUE_BATCHES", "4"))
+
+    def run(self, files: List[Tuple[str, Path, str]], reused: Dict[str, List[str]], existing_ids: Set[str],
+            skip_ids: Set[str], source_collection, target) -> Tuple[Dict[str, List[str]], Dict]:
+        """Fill target with the chunks of every file.
+
+        files are (manifest key, path, source name) to chunk; reused maps keys of
+        unchanged files to chunk IDs whose vectors are copied from
+        source_collection (every such ID must be in existing_ids). New chunks that
+        are already in existing_ids are copied too; only the rest are embedded.
+        IDs in skip_ids are already in target (a resumed build) and are skipped.
+
+        Returns the chunk IDs of each file and per-stage stats.
+        """
+        stats = {name: StageStats(name) for name in ("chunk", "embed", "write")}
+        embed_queue = queue.Queue(maxsize=self.queue_batches)
+        write_queue = queue.Queue(maxsize=self.queue_batches)
+        abort = threading.Event()
+        errors = []
+
+        def put(q, item) -> float:
+            """Blocking put that gives up on abort; returns the time spent waiting for room"""
+            start = time.perf_counter()
+            while True:
+                if abort.is_set():
+                    raise _Aborted()
+                try:
+                    q.put(item, timeout=0.1)
+                    return time.perf_counter() - start
+                except queue.Full:
+                    continue
+
+        def get(q):
+            while True:
+                if abort.is_set():
+                    raise _Aborted()
+                try:
+                    return q.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+
+        def guarded(body):
+            def wrapper():
+                try:
+                    body()
+                except _Aborted:
+                    pass
+                except Exception as e:
+                    errors.append(e)
+                    abort.set()
+            return wrapper
+
+        def embed_stage():
+            while True:
+                item = get(embed_queue)
+                if item is None:
+                    put(write_queue, None)
+                    return
+                kind, batch = item
+                start = time.perf_counter()
+                if kind == "copy":
+                    existing = source_collection.get(ids=batch, include=["embeddings", "documents", "metadatas"])
+                    ids, embeddings = existing["ids"], existing["embeddings"]
+                    documents, metadatas = existing["documents"], existing["metadatas"]
+                else:
+                    ids = [chunk[0] for chunk in batch]
+                    documents = [chunk[1] for chunk in batch]
+                    metadatas = [chunk[2] for chunk in batch]
+                    embeddings = self.encode(documents)
+                stats["embed"].add(len(ids), time.perf_counter() - start)
+                put(write_queue, (ids, embeddings, documents, metadatas))
+
+        def write_stage():
+            last_report = time.perf_counter()
+            while True:
+                item = get(write_queue)
+                if item is None:
+                    return
+                ids, embeddings, documents, metadatas = item
+                start = time.perf_counter()
+                # chromadb 0.4 only takes nested lists; converting one write batch at a
+                # time bounds the Python floats alive to that batch
+                target.add(
+                    ids=list(ids),
+                    embeddings=embeddings.tolist() if hasattr(embeddings, "tolist") else embeddings,
+                    documents=list(documents),
+                    metadatas=list(metadatas)
+                )
+                stats["write"].add(len(ids), time.perf_counter() - start)
+                if time.perf_counter() - last_report >= PROGRESS_INTERVAL_SECONDS:
+                    last_report = time.perf_counter()
+                    print(f"Ingest: {stats['chunk'].items} files chunked, {stats['embed'].items} chunks embedded, "
+                          f"{stats['write'].items} written")
+
+        threads = [
+            threading.Thread(target=guarded(embed_stage), name="ingest-embed", daemon=True),
+            threading.Thread(target=guarded(write_stage), name="ingest-write", daemon=True)
+        ]
+        for thread in threads:
+            thread.start()
+
+        chunk_ids = {}
+        seen = set(skip_ids)
+        copy_batch, new_batch = [], []
+        blocked = 0.0  # dispatcher time spent waiting on a full embed queue
+
+        def dispatch(cid: str, text: str = None, metadata: Dict = None):
+            nonlocal copy_batch, new_batch, blocked
+            if cid in seen:
+                return
+            seen.add(cid)
+            if cid in existing_ids:
+                copy_batch.append(cid)
+                if len(copy_batch) >= self.batch_size:
+                    blocked += put(embed_queue, ("copy", copy_batch))
+                    copy_batch = []
+            else:
+                new_batch.append((cid, text, metadata))
+                if len(new_batch) >= self.batch_size:
+                    blocked += put(embed_queue, ("new", new_batch))
+                    new_batch = []
+
+        def consume(key: str, chunks: Iterable, seconds: float = None):
+            nonlocal blocked
+            start = time.perf_counter()
+            blocked = 0.0
+            ids = []
+            for cid, text, metadata in chunks:
+                ids.append(cid)
+                dispatch(cid, text, metadata)
+            chunk_ids[key] = ids
+            if seconds is None:
+                seconds = time.perf_counter() - start - blocked
+            stats["chunk"].add(1, seconds)
+
+        pool = None
+        try:
+            for key, ids in reused.items():
+                chunk_ids[key] = list(ids)
+                for cid in ids:
+                    dispatch(cid)
+
+            if self.workers > 1 and len(files) > 1:
+                # spawn, not fork: the parent has model and client threads running
+                pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+
+            in_flight = deque()
+            for key, path, source in files:
+                if pool is None or path.stat().st_size >= STREAM_FILE_BYTES:
+                    streamed = ((chunk_id(source, doc["text"]), doc["text"], doc["metadata"])
+                                for doc in self.chunker.chunk_file(path, source))
+                    in_flight.append((key, None, streamed))
+                else:
+                    in_flight.append((key, pool.submit(_chunk_source, self.chunker, path, source), None))
+                # Bounded look-ahead: results are consumed in order, a few per worker at most
+                while len(in_flight) > max(self.workers, 1) * 2 or (in_flight and in_flight[0][1] is None):
+                    self._consume_next(in_flight, consume)
+            while in_flight:
+                self._consume_next(in_flight, consume)
+
+            if copy_batch:
+                put(embed_queue, ("copy", copy_batch))
+            if new_batch:
+                put(embed_queue, ("new", new_batch))
+            put(embed_queue, None)
+        except _Aborted:
+            pass
+        except Exception as e:
+            errors.append(e)
+            abort.set()
+        finally:
+            if pool is not None:
+                pool.shutdown(wait=not errors, cancel_futures=bool(errors))
+
+        for thread in threads:
+            thread.join()
+        if errors:
+            raise errors[0]
+
+        report = {name: stage.as_dict() for name, stage in stats.items()}
+        print("Ingest stages: " + ", ".join(
+            f"{name} {stage['items']} in {stage['busy_seconds']}s ({stage['items_per_second'] or 0}/s)"
+            for name, stage in report.items()
+        ))
+        return chunk_ids, report
+
+    @staticmethod
+    def _consume_next(in_flight: deque, consume: Callable):
+        key, future, streamed = in_flight.popleft()
+        if future is None:
+            consume(key, streamed)
+        else:
+            chunks, seconds = future.result()
+            consume(key, chunks, seconds)
@@ -0,0 +1,124 @@
+"""
+Rule-based answers for when no generator is available (LLM outage, no API key)
+
+Intents and their canned answers live in intents.json. At startup the
+keywords are compiled into a token -> intent index (plural forms included,
+multi-word keywords as token sequences) and every answer is joined once, so
+matching a question is one tokenization plus a dictionary lookup per token;
+the earliest intent in the file wins, as before. The extractive answer over
+retrieved contexts scores sentences against a token set computed once per
+chunk text and memoized, instead of re-splitting every context per request.
+"""
+import json
+import re
+from collections import OrderedDict
+from pathlib import Path
+from threading import Lock
+from typing import Dict, List, Optional, Tuple
+
+from bm25 import tokenize
+
+INTENTS_FILE = Path(__file__).resolve().parent / "intents.json"
+
+_WORD_RE = re.compile(r"[^\W_]+")
+
+CLOSING = " If you need more specific information, feel free to ask or contact the admissions office."
+
+
+def _words(text: str) -> List[str]:
+    """Every word, stopwords included ("how to" is a keyword)"""
+    return _WORD_RE.findall(text.lower())
+
+
+def _forms(word: str) -> List[str]:
+    forms = [word, word + "s", word + "es"]
+    if word.endswith("y"):
+        forms.append(word[:-1] + "ies")
+    return forms
+
+
+class IntentEngine:
+    def __init__(self, intents: List[Dict], default_answer: str, chunk_cache_size: int = 10000):
+        self.intents = intents
+        self.default_answer = default_answer
+        # First word of a keyword -> [(remaining words, intent position)]
+        self._index: Dict[str, List[Tuple[Tuple[str, ...], int]]] = {}
+        for position, intent in enumerate(intents):
+            for keyword in intent["keywords"]:
+                words = _words(keyword)
+                if not words:
+                    continue
+                last_forms = _forms(words[-1])
+                for last in last_forms:
+                    phrase = tuple(words[:-1]) + (last,)
+                    self._index.setdefault(phrase[0], []).append((phrase[1:], position))
+        self._chunk_cache = OrderedDict()
+        self._chunk_cache_size = chunk_cache_size
+        self._chunk_lock = Lock()
+
+    @classmethod
+    def load(cls, path=INTENTS_FILE) -> "IntentEngine":
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        intents = [
+            {"name": intent["name"], "keywords": intent["keywords"], "answer": "\n".join(intent["answer"])}
+            for intent in data["intents"]
+        ]
+        return cls(intents, "\n".join(data["default"]["answer"]))
+
+    def match(self, question: str) -> Optional[Dict]:
+        """The first intent (in file order) with a keyword in the question"""
+        words = _words(question)
+        best = None
+        for i, word in enumerate(words):
+            for rest, position in self._index.get(word, ()):
+                if (best is None or position < best) and tuple(words[i + 1:i + 1 + len(rest)]) == rest:
+                    best = position
+        return self.intents[best] if best is not None else None
+
+    def answer(self, question: str) -> str:
+        intent = self.match(question)
+        return intent["answer"] if intent is not None else self.default_answer
+
+    def _sentences(self, context: str) -> Tuple[Tuple[str, frozenset], ...]:
+        """(sentence, token set) for each sentence of a chunk, computed once per chunk text"""
+        with self._chunk_lock:
+            sentences = self._chunk_cache.get(context)
+            if sentences is not None:
+                self._chunk_cache.move_to_end(context)
+                return sentences
+        sentences = tuple(
+            (sentence, frozenset(tokenize(sentence)))
+            for sentence in (part.strip() for part in context.split(". "))
+            if sentence
+        )
+        with self._chunk_lock:
+            self._chunk_cache[context] = sentences
+            if len(self._chunk_cache) > self._chunk_cache_size:
+                self._chunk_cache.popitem(last=False)
+        return sentences
+
+    def relevant_sentences(self, question: str, contexts: List[str]) -> List[str]:
+        """Context sentences sharing a term with the question, deduplicated, in context order"""
+        question_tokens = frozenset(tokenize(question))
+        seen = set()
+        relevant = []
+        for context in contexts:
+            for sentence, tokens in self._sentences(context):
+                if sentence not in seen and not question_tokens.isdisjoint(tokens):
+                    seen.add(sentence)
+                    relevant.append(sentence)
+        return relevant
+
+    def context_answer(self, question: str, contexts: List[str]) -> str:
+        """The most relevant context sentence plus up to five supporting ones, or the intent answer"""
+        sections = self.relevant_sentences(question, contexts)
+        if not sections:
+            return self.answer(question)
+        answer_parts = [sections[0]] + [section for section in sections[1:6] if len(section) > 20]
+        answer = ". ".join(answer_parts)
+        if not answer.endswith((".", "!", "?")):
+            answer += "."
+        if len(answer_parts) > 1:
+            answer += CLOSING
+        return answer
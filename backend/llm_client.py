@@ -0,0 +1,208 @@
+"""
+Pooled HTTP client for LLM inference calls with deadlines, retries and a circuit breaker
+"""
+import json
+import os
+import random
+import threading
+import time
+from typing import Dict, Iterator
+
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_API_URL = "https://api-inference.huggingface.co/models/mistralai/Mistral-7B-Instruct-v0.2"
+RETRY_STATUSES = {429, 503}
+
+
+class InferenceError(Exception):
+    """The inference endpoint failed or returned something unusable"""
+
+
+class CircuitOpenError(InferenceError):
+    """The endpoint has been failing; calls are refused without touching the network"""
+
+
+class CircuitBreaker:
+    """Closed -> open after consecutive failures -> half-open single probe after a cool-down"""
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == "open" and time.monotonic() - self._opened_at >= self.reset_timeout:
+                return "half_open"
+            return self._state
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._state == "closed":
+                return True
+            if self._state == "open":
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    return False
+                self._state = "half_open"
+                self._probe_in_flight = False
+            # Half-open: let exactly one request through to test the endpoint
+            if self._probe_in_flight:
+                return False
+            self._probe_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._state = "closed"
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == "half_open" or self._failures >= self.failure_threshold:
+                self._state = "open"
+                self._opened_at = time.monotonic()
+                self._probe_in_flight = False
+
+
+class InferenceClient:
+    def __init__(self, api_url: str = None, api_key: str = None):
+        self.api_url = api_url or os.getenv("HF_API_URL", DEFAULT_API_URL)
+        self.api_key = api_key if api_key is not None else os.getenv("HUGGINGFACE_API_KEY", "")
+        # Total time budget per call, retries and back-off included
+        self.deadline = float(os.getenv("LLM_TIMEOUT_SECONDS", "15"))
+        self.connect_timeout = float(os.getenv("LLM_CONNECT_TIMEOUT_SECONDS", "3"))
+        self.max_retries = int(os.getenv("LLM_MAX_RETRIES", "2"))
+        self.backoff_base = float(os.getenv("LLM_BACKOFF_BASE_SECONDS", "0.25"))
+
+        self.breaker = CircuitBreaker(
+            failure_threshold=int(os.getenv("LLM_BREAKER_FAILURES", "5")),
+            reset_timeout=float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30"))
+        )
+
+        # One keep-alive pool shared by every query worker thread
+        pool_size = int(os.getenv("LLM_POOL_SIZE", os.getenv("RAG_WORKER_THREADS", "8")))
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        if self.api_key:
+            self.session.headers["Authorization"] = f"Bearer {self.api_key}"
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.api_key)
+
+    def generate(self, prompt: str, parameters: Dict) -> str:
+        """Return the generated text for a prompt"""
+        response = self._post({"inputs": prompt, "parameters": parameters}, stream=False)
+        # A 200 with a body we can't use is as much a failure as a 5xx
+        try:
+            result = response.json()
+        except (requests.RequestException, ValueError) as e:
+            self.breaker.record_failure()
+            raise InferenceError(f"Unreadable response: {e}") from e
+        finally:
+            response.close()
+        if isinstance(result, list) and result and isinstance(result[0], dict) and "generated_text" in result[0]:
+            self.breaker.record_success()
+            return result[0]["generated_text"]
+        self.breaker.record_failure()
+        raise InferenceError(f"Unexpected response shape: {str(result)[:200]}")
+
+    def stream(self, prompt: str, parameters: Dict) -> Iterator[str]:
+        """Yield generated token texts as the server emits them, within the same deadline as generate()"""
+        deadline = time.monotonic() + self.deadline
+        response = self._post({"inputs": prompt, "parameters": parameters, "stream": True}, stream=True,
+                              deadline=deadline)
+        # The endpoint's health is only known once the body has been read
+        with response:
+            try:
+                for line in response.iter_lines(decode_unicode=True):
+                    if time.monotonic() >= deadline:
+                        raise InferenceError("Deadline exceeded while streaming")
+                    if not line or not line.startswith("data:"):
+                        continue
+                    event = json.loads(line[len("data:"):])
+                    token = event.get("token") or {}
+                    if token.get("special"):
+                        continue
+                    yield token.get("text", "")
+            except GeneratorExit:
+                # The reader stopped early; the endpoint was streaming fine until then
+                self.breaker.record_success()
+                raise
+            except InferenceError:
+                self.breaker.record_failure()
+                raise
+            except (requests.RequestException, ValueError) as e:
+                self.breaker.record_failure()
+                raise InferenceError(f"Stream failed: {e}") from e
+            self.breaker.record_success()
+
+    def _post(self, payload: Dict, stream: bool, deadline: float = None) -> requests.Response:
+        """A 200 response; the caller records the outcome with the breaker once it has read the body"""
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"Circuit open for {self.api_url}")
+
+        if deadline is None:
+            deadline = time.monotonic() + self.deadline
+        attempt = 0
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self.breaker.record_failure()
+                raise InferenceError("Deadline exceeded")
+
+            retry_after = None
+            try:
+                response = self.session.post(
+                    self.api_url,
+                    json=payload,
+                    stream=stream,
+                    timeout=(min(self.connect_timeout, remaining), remaining)
+                )
+            except requests.RequestException as e:
+                error = InferenceError(f"Request failed: {e}")
+            else:
+                if response.status_code == 200:
+                    return response
+                error = InferenceError(f"Endpoint returned status {response.status_code}")
+                status = response.status_code
+                retry_after = response.headers.get("Retry-After")
+                response.close()
+                if status not in RETRY_STATUSES and status < 500:
+                    # Client-side problem (bad key, bad payload): retrying won't help
+                    # and it says nothing about the endpoint's health
+                    self.breaker.record_success()
+                    raise error
+
+            if attempt >= self.max_retries:
+                self.breaker.record_failure()
+                raise error
+
+            delay = self._backoff(attempt, retry_after)
+            if time.monotonic() + delay >= deadline:
+                self.breaker.record_failure()
+                raise error
+            time.sleep(delay)
+            attempt += 1
+
+    def _backoff(self, attempt: int, retry_after: str = None) -> float:
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+        # Full jitter: spread retries from many workers instead of synchronising them
+        return random.uniform(0, self.backoff_base * (2 ** attempt))
+
+    def stats(self) -> Dict:
+        return {"api_url": self.api_url, "circuit": self.breaker.state}
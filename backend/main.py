@@ -1,40 +1,98 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import Callable, Iterator, Optional, List
 from contextlib import asynccontextmanager
+import asyncio
+import json
 import os
+import threading
+import time
 from dotenv import load_dotenv
 import uvicorn
 
-from rag_system import RAGSystem
+from rag_system import RAGSystem, SHARED_INDEX
 from data_collector import DataCollector
+from query_executor import QueryExecutor, ExecutorSaturated
+from rebuild_jobs import RebuildJobs
+from tracing import METRICS, server_timing, start_profiler_from_env, start_trace
 
 load_dotenv()
 
 # Initialize RAG system
 rag_system = RAGSystem()
 
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    """Initialize the RAG system on startup"""
+# Bounded pool that runs the blocking query path (embedding, retrieval, LLM call)
+query_executor = QueryExecutor()
+
+def _rebuild_knowledge_base():
+    collector = DataCollector()
+    collector.collect_all_data()
+    if not rag_system.initialize():
+        raise RuntimeError("Knowledge base build failed; the previous version is still serving")
+    return rag_system.last_build
+
+rebuild_jobs = RebuildJobs(_rebuild_knowledge_base)
+
+# Set once the background startup has finished (successfully or not)
+startup_complete = threading.Event()
+
+# When enabled, chat endpoints answer 503 until startup completes instead of
+# serving rule-based fallback answers
+READINESS_GATE = os.getenv("RAG_READINESS_GATE", "0").lower() in ("1", "true", "yes")
+
+# Send per-stage timings of /api/chat in a Server-Timing response header
+SERVER_TIMING = os.getenv("RAG_SERVER_TIMING", "1").lower() in ("1", "true", "yes")
+
+# Most questions accepted by one /api/chat/batch request
+BATCH_MAX_QUESTIONS = int(os.getenv("RAG_BATCH_MAX_QUESTIONS", "10000"))
+
+# How often a shared-index worker checks whether another process published a new version
+SHARED_INDEX_POLL_SECONDS = float(os.getenv("RAG_SHARED_INDEX_POLL_SECONDS", "2"))
+
+def _startup():
+    """Load the model and knowledge base; runs in the background so the port binds right away"""
     print("Initializing RAG system...")
     try:
-        if not rag_system.is_initialized():
+        rag_system.load()
+        if rag_system.initialized or rag_system.load_shared_index():
+            # Preloaded before the fork (serve.py), or attached to a version another worker built
+            pass
+        elif not rag_system.is_initialized():
             print("Knowledge base not found. Collecting data...")
             collector = DataCollector()
             collector.collect_all_data()
             rag_system.initialize()
         else:
             # Just load the existing collection
-            rag_system.collection = rag_system.client.get_or_create_collection("manipal_knowledge")
-            rag_system.initialized = True
+            rag_system.load_active_collection()
         print("RAG system ready!")
     except Exception as e:
         print(f"Warning: Could not initialize RAG system: {e}")
         print("System will use fallback responses. You can rebuild the knowledge base later.")
+    finally:
+        startup_complete.set()
+
+def _watch_shared_index():
+    """Pick up knowledge-base versions built by other worker processes"""
+    while True:
+        time.sleep(SHARED_INDEX_POLL_SECONDS)
+        try:
+            rag_system.load_shared_index()
+        except Exception as e:
+            print(f"Error loading shared index: {e}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start initializing the RAG system without holding up the server"""
+    threading.Thread(target=_startup, name="rag-startup", daemon=True).start()
+    start_profiler_from_env()
+    if SHARED_INDEX:
+        threading.Thread(target=_watch_shared_index, name="shared-index-watch", daemon=True).start()
     yield
-    # Cleanup code can go here if needed
+    query_executor.shutdown(wait=False)
+    rebuild_jobs.shutdown()
 
 app = FastAPI(
     title="Manipal AI Chat API", 
@@ -55,10 +113,14 @@ class ChatRequest(BaseModel):
     message: str
     conversation_id: Optional[str] = None
 
+class BatchRequest(BaseModel):
+    questions: List[str]
+
 class ChatResponse(BaseModel):
     response: str
     sources: Optional[List[str]] = []
     timestamp: str
+    conversation_id: Optional[str] = None
 
 @app.get("/")
 async def root():
@@ -66,36 +128,231 @@ async def root():
 
 @app.get("/health")
 async def health():
-    return {"status": "healthy", "initialized": rag_system.is_initialized()}
+    return {
+        "status": "healthy" if startup_complete.is_set() else "initializing",
+        "initialized": rag_system.initialized,
+        "encoder": rag_system.encoder_kind,
+        "executor": query_executor.stats(),
+        "llm": rag_system.llm_client.stats(),
+        "generator": rag_system.generator.stats() if rag_system.generator else {"name": "hf"},
+        "prompt": rag_system.prompt_builder.stats(),
+        "reranker": rag_system.reranker.stats() if rag_system.reranker else None,
+        "conversations": rag_system.conversations.stats()
+    }
+
+def _check_ready():
+    if READINESS_GATE and not startup_complete.is_set():
+        raise HTTPException(status_code=503, detail="Knowledge base is still loading", headers={"Retry-After": "5"})
 
 @app.post("/api/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest):
+async def chat(request: ChatRequest, response: Response):
+    trace = start_trace()
+    status = 200
     try:
         if not request.message or not request.message.strip():
             raise HTTPException(status_code=400, detail="Message cannot be empty")
+        _check_ready()
         
-        # Get response from RAG system
-        result = rag_system.query(request.message.strip())
+        # Get response from RAG system without blocking the event loop
+        result = await query_executor.run(
+            rag_system.query, request.message.strip(), conversation_id=request.conversation_id
+        )
         
+        if SERVER_TIMING:
+            response.headers["Server-Timing"] = server_timing(trace)
         return ChatResponse(
             response=result["answer"],
             sources=result.get("sources", []),
-            timestamp=result.get("timestamp", "")
+            timestamp=result.get("timestamp", ""),
+            conversation_id=request.conversation_id
         )
+    except HTTPException as e:
+        status = e.status_code
+        raise
+    except ExecutorSaturated as e:
+        status = 503
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
     except Exception as e:
+        status = 500
         print(f"Error processing chat: {str(e)}")
+        METRICS.count_error("chat")
         raise HTTPException(status_code=500, detail=f"Error processing request: {str(e)}")
+    finally:
+        METRICS.finish(trace, "chat", status)
 
-@app.post("/api/rebuild-knowledge-base")
-async def rebuild_knowledge_base():
-    """Rebuild the knowledge base from collected data"""
+def _iterate_in_pool(items: Callable[[], Iterator], trace, endpoint: str):
+    """Run a blocking iterator on the query pool and return an async iterator over its items.
+
+    The whole iteration holds one pool slot and is admitted before any bytes are
+    sent. A failure arrives as an Exception item. When the consumer goes away,
+    the producer stops at its next item. The request is recorded in METRICS once,
+    when iteration ends or, if it never started, when the producer finishes.
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    cancelled = threading.Event()
+    # Only touched on the event loop: by iterate() and the producer's done-callback
+    started = False
+    finished = False
+    
+    def finish():
+        nonlocal finished
+        if not finished:
+            finished = True
+            METRICS.finish(trace, endpoint)
+    
+    def produce():
+        try:
+            for item in items():
+                if cancelled.is_set():
+                    break
+                loop.call_soon_threadsafe(queue.put_nowait, item)
+        except Exception as e:
+            print(f"Error in {endpoint}: {str(e)}")
+            METRICS.count_error(endpoint)
+            loop.call_soon_threadsafe(queue.put_nowait, e)
+        finally:
+            loop.call_soon_threadsafe(queue.put_nowait, None)
+    
+    def produced(future: asyncio.Future):
+        # Anything produce() let through its own handler, e.g. from the loop closing under it
+        if not future.cancelled() and future.exception() is not None:
+            print(f"Error in {endpoint} producer: {future.exception()}")
+            METRICS.count_error(endpoint)
+        if not started:
+            # The client went away before the response was read, or hasn't read it yet
+            finish()
+    
     try:
-        collector = DataCollector()
-        collector.collect_all_data()
-        rag_system.initialize()
-        return {"message": "Knowledge base rebuilt successfully"}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error rebuilding knowledge base: {str(e)}")
+        future = query_executor.submit(produce)
+    except ExecutorSaturated as e:
+        METRICS.finish(trace, endpoint, 503)
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    future.add_done_callback(produced)
+    
+    async def iterate():
+        nonlocal started
+        started = True
+        try:
+            while True:
+                item = await queue.get()
+                if item is None:
+                    break
+                yield item
+        finally:
+            cancelled.set()
+            finish()
+    
+    return iterate()
+
+@app.post("/api/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """Stream the answer as Server-Sent Events: sources, then tokens, then done"""
+    if not request.message or not request.message.strip():
+        raise HTTPException(status_code=400, detail="Message cannot be empty")
+    _check_ready()
+    
+    # Carried into the producer thread by the executor; stage timings are only
+    # known once the stream ends, so they go to /metrics but not to a header
+    trace = start_trace()
+    events = _iterate_in_pool(
+        lambda: rag_system.query_stream(request.message.strip(), conversation_id=request.conversation_id),
+        trace, "chat_stream"
+    )
+    
+    async def event_stream():
+        async for event in events:
+            if isinstance(event, Exception):
+                event = {"event": "error", "detail": str(event)}
+            name = event.pop("event")
+            yield f"event: {name}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/api/chat/batch")
+async def chat_batch(request: BatchRequest):
+    """Answer many questions in one request, streamed back as NDJSON lines in completion order"""
+    questions = [question.strip() for question in request.questions]
+    if not questions or not all(questions):
+        raise HTTPException(status_code=400, detail="Questions must be a non-empty list of non-empty strings")
+    if len(questions) > BATCH_MAX_QUESTIONS:
+        raise HTTPException(status_code=413, detail=f"At most {BATCH_MAX_QUESTIONS} questions per batch")
+    _check_ready()
+    
+    trace = start_trace()
+    results = _iterate_in_pool(lambda: rag_system.query_many(questions), trace, "chat_batch")
+    
+    async def lines():
+        async for item in results:
+            if isinstance(item, Exception):
+                line = {"error": str(item)}
+            else:
+                index, result = item
+                line = {
+                    "index": index,
+                    "response": result["answer"],
+                    "sources": result.get("sources", []),
+                    "timestamp": result.get("timestamp", "")
+                }
+            yield json.dumps(line, ensure_ascii=False) + "\n"
+    
+    return StreamingResponse(lines(), media_type="application/x-ndjson", headers={"X-Accel-Buffering": "no"})
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Request and per-stage latency histograms, answer paths and errors, in Prometheus text format"""
+    executor = query_executor.stats()
+    cache = rag_system.answer_cache.stats()
+    conversations = rag_system.conversations.stats()
+    prompt = rag_system.prompt_builder.stats()
+    gauges = {
+        "rag_executor_in_flight": executor["in_flight"],
+        "rag_knowledge_base_ready": int(rag_system.initialized),
+        "rag_conversations_in_memory": conversations["conversations"],
+        "rag_conversations_bytes": conversations["bytes"],
+        "rag_prompt_context_budget_tokens": prompt["context_budget"],
+        "rag_prompt_max_tokens": prompt["max_total_tokens"]
+    }
+    counters = {
+        "rag_executor_rejected": executor["rejected"],
+        "rag_answer_cache_exact_hits": cache["exact_hits"],
+        "rag_answer_cache_semantic_hits": cache["semantic_hits"],
+        "rag_answer_cache_misses": cache["misses"],
+        "rag_prompts_built": prompt["requests"],
+        # Tokens in the prefix, context and question parts, and rag_prompt_tokens for whole prompts
+        **{"rag_prompt_tokens" if part == "total" else f"rag_prompt_{part}_tokens": count
+           for part, count in prompt["total_tokens"].items()},
+        "rag_prompt_duplicate_lines_removed": prompt["duplicate_lines_removed"],
+        "rag_prompt_contexts_dropped": prompt["contexts_dropped"]
+    }
+    return PlainTextResponse(METRICS.render(gauges, counters), media_type="text/plain; version=0.0.4")
+
+@app.get("/api/cache/stats")
+async def cache_stats():
+    """Hit/miss counters and sizes of the answer cache"""
+    return rag_system.answer_cache.stats()
+
+@app.post("/api/rebuild-knowledge-base", status_code=202)
+async def rebuild_knowledge_base():
+    """Start a background rebuild; queries keep using the current collection until it completes"""
+    job = rebuild_jobs.submit()
+    return {
+        "message": "Knowledge base rebuild started",
+        "job_id": job["job_id"],
+        "status": job["status"]
+    }
+
+@app.get("/api/rebuild-knowledge-base/{job_id}")
+async def rebuild_status(job_id: str):
+    """Status of a rebuild job"""
+    job = rebuild_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown rebuild job")
+    return job
 
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,128 @@
+"""
+Prompt assembly with a static, cacheable prefix and a context token budget
+
+The system header and instructions never change, so they are rendered and
+token-counted once and always sent first: backends with prefix caching
+(llama.cpp's KV cache, TGI's prefix cache) only process the per-request part.
+Retrieved contexts are deduplicated (overlapping chunks repeat leaf lines) and
+packed greedily, in rank order, into RAG_PROMPT_CONTEXT_TOKENS as counted by
+the generation model's tokenizer when one is available.
+"""
+import os
+import threading
+from typing import Callable, Dict, List
+
+from chunker import approximate_token_count, make_token_counter
+
+
+class Prompt:
+    def __init__(self, text: str, prefix: str, contexts: List[str], tokens: Dict, duplicates: int, dropped: int):
+        self.text = text
+        # Identical for every request; the rest of text follows it
+        self.prefix = prefix
+        self.contexts = contexts
+        self.tokens = tokens
+        self.duplicates = duplicates
+        self.dropped = dropped
+
+
+def _split_lines(context: str) -> List[str]:
+    """Chunks are 'Key Path: value' lines joined with '. '"""
+    return [line.strip().rstrip(".") for line in context.split(". ") if line.strip().rstrip(".")]
+
+
+class PromptBuilder:
+    def __init__(self, header: str, instructions: str, context_budget: int = None,
+                 token_counter: Callable[[str], int] = None):
+        self.prefix = f"{header}\n{instructions}"
+        self.context_budget = context_budget or int(os.getenv("RAG_PROMPT_CONTEXT_TOKENS", "1024"))
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._totals = {"prefix": 0, "context": 0, "question": 0, "total": 0}
+        self._max_total = 0
+        self._duplicates = 0
+        self._dropped = 0
+        self.set_token_counter(token_counter or approximate_token_count, "approximate")
+
+    def set_token_counter(self, token_counter: Callable[[str], int], name: str):
+        self.count_tokens = token_counter
+        self.tokenizer_name = name
+        self.prefix_tokens = token_counter(self.prefix)
+        # The labels around the context and question
+        self.template_tokens = token_counter(self.render("", [])) - self.prefix_tokens
+
+    def render(self, question: str, contexts: List[str]) -> str:
+        context_text = "\n\n".join(contexts)
+        return f"{self.prefix}\nCONTEXT INFORMATION:\n{context_text}\n\nUSER QUESTION: {question}\n\nANSWER:"
+
+    def pack(self, contexts: List[str]):
+        """Deduplicate lines across contexts and keep, in rank order, what fits the budget.
+
+        Returns (packed contexts, their token count, duplicate lines removed, contexts dropped).
+        """
+        seen = set()
+        packed = []
+        used = 0
+        duplicates = 0
+        dropped = 0
+        for context in contexts:
+            lines = []
+            for line in _split_lines(context):
+                if line in seen:
+                    duplicates += 1
+                else:
+                    lines.append(line)
+            if not lines:
+                continue
+            text = ". ".join(lines) + "."
+            tokens = self.count_tokens(text)
+            if used + tokens > self.context_budget:
+                # Greedy: a later, shorter context may still fit
+                dropped += 1
+                continue
+            seen.update(lines)
+            packed.append(text)
+            used += tokens
+        return packed, used, duplicates, dropped
+
+    def build(self, question: str, contexts: List[str]) -> Prompt:
+        packed, context_tokens, duplicates, dropped = self.pack(contexts)
+        question_tokens = self.count_tokens(question)
+        # Parts are counted separately, so the total can be off by a token at each seam
+        tokens = {
+            "prefix": self.prefix_tokens,
+            "context": context_tokens,
+            "question": question_tokens,
+            "total": self.prefix_tokens + self.template_tokens + context_tokens + question_tokens
+        }
+        with self._lock:
+            self._requests += 1
+            for key, value in tokens.items():
+                self._totals[key] += value
+            self._max_total = max(self._max_total, tokens["total"])
+            self._duplicates += duplicates
+            self._dropped += dropped
+        return Prompt(self.render(question, packed), self.prefix, packed, tokens, duplicates, dropped)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            requests = self._requests
+            return {
+                "tokenizer": self.tokenizer_name,
+                "context_budget": self.context_budget,
+                "prefix_tokens": self.prefix_tokens,
+                "requests": requests,
+                "avg_tokens": {key: round(value / requests, 1) for key, value in self._totals.items()} if requests else {},
+                "total_tokens": dict(self._totals),
+                "max_total_tokens": self._max_total,
+                "duplicate_lines_removed": self._duplicates,
+                "contexts_dropped": self._dropped
+            }
+
+
+def load_hf_token_counter(name: str) -> Callable[[str], int]:
+    """Token counter for a Hugging Face model's tokenizer (no model weights are downloaded)"""
+    from transformers import AutoTokenizer
+
+    tokenizer = AutoTokenizer.from_pretrained(name, token=os.getenv("HUGGINGFACE_API_KEY") or None)
+    return make_token_counter(tokenizer)
@@ -0,0 +1,76 @@
+"""
+Bounded worker pool for running blocking RAG work off the event loop
+"""
+import asyncio
+import contextvars
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+
+class ExecutorSaturated(Exception):
+    """Raised when the pool already holds the maximum number of admitted jobs"""
+
+
+class QueryExecutor:
+    def __init__(self, max_workers: int = None, max_pending: int = None):
+        self.max_workers = max_workers or int(os.getenv("RAG_WORKER_THREADS", "8"))
+        # Jobs admitted at once (running + queued); anything beyond is rejected
+        if max_pending is None:
+            max_pending = int(os.getenv("RAG_MAX_PENDING", str(self.max_workers * 4)))
+        self.max_pending = max(max_pending, self.max_workers)
+
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers,
+            thread_name_prefix="rag-query"
+        )
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._completed = 0
+        self._rejected = 0
+
+    def _admit(self):
+        with self._lock:
+            if self._in_flight >= self.max_pending:
+                self._rejected += 1
+                raise ExecutorSaturated(
+                    f"Query pool saturated ({self._in_flight}/{self.max_pending} jobs in flight)"
+                )
+            self._in_flight += 1
+
+    def _release(self, _future=None):
+        with self._lock:
+            self._in_flight -= 1
+            self._completed += 1
+
+    async def run(self, func: Callable, *args: Any, **kwargs: Any) -> Any:
+        """Run a blocking callable on the pool, raising ExecutorSaturated when full"""
+        return await self.submit(func, *args, **kwargs)
+
+    def submit(self, func: Callable, *args: Any, **kwargs: Any) -> "asyncio.Future":
+        """Admit a job right away (or raise ExecutorSaturated) and return an awaitable for it"""
+        self._admit()
+        try:
+            # Run in a copy of the caller's context, so the request trace follows the job
+            future = self._executor.submit(contextvars.copy_context().run, func, *args, **kwargs)
+        except Exception:
+            self._release()
+            raise
+        # Release the slot when the job really finishes, not when the caller
+        # stops waiting, so cancelled requests can't push us over the limit
+        future.add_done_callback(self._release)
+        return asyncio.wrap_future(future)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "max_pending": self.max_pending,
+                "in_flight": self._in_flight,
+                "completed": self._completed,
+                "rejected": self._rejected
+            }
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
@@ -1,494 +1,971 @@
 import os
 import json
+import contextvars
+import hashlib
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Dict, Optional
-import chromadb
-from chromadb.config import Settings
-from sentence_transformers import SentenceTransformer
+from typing import List, Dict, Optional, Iterator, Tuple
 from datetime import datetime
-import requests
 import re
 
+import numpy as np
+
+from embedding_batcher import EmbeddingBatcher
+from embedding_store import EmbeddingStore, FileLock
+from encoders import encoder_version, make_encoder
+from answer_cache import AnswerCache
+from llm_client import InferenceClient, CircuitOpenError
+from retrievers import HybridRetriever, make_retriever
+from shared_index import SharedIndex
+from tracing import current, record_error, record_stage, set_path, stage, start_trace
+from bm25 import BM25Index
+from generators import make_generator
+from reranker import CrossEncoderReranker
+from intents import IntentEngine
+from conversations import ConversationStore, Turn, covers, is_follow_up
+from prompt_builder import PromptBuilder, load_hf_token_counter
+from chunker import JsonChunker
+from ingest import IngestionPipeline, discover_sources, source_key, source_name
+
+EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
+# Embedding model backend: "torch" (sentence-transformers), or ONNX Runtime "onnx" / "onnx-int8"
+ENCODER_KIND = os.getenv("RAG_ENCODER", "torch").lower()
+COLLECTION_NAME = "manipal_knowledge"
+MANIFEST_FILE = "manifest.json"
+# Names the shadow collection of a build in progress, so a crashed build can resume
+BUILD_STATE_FILE = "build_state.json"
+# "chroma" queries the collection directly; "numpy" keeps an in-memory copy for brute-force search
+RETRIEVER_KIND = os.getenv("RAG_RETRIEVER", "chroma").lower()
+# Search compressed "int8" or "binary" codes and rescore the best candidates exactly,
+# in place of RAG_RETRIEVER's dense search; "none" = full float32 vectors
+QUANTIZATION = os.getenv("RAG_QUANTIZATION", "none").lower()
+QUANTIZATION = None if QUANTIZATION in ("", "none") else QUANTIZATION
+# Fuse dense results with a BM25 index (reciprocal rank fusion) for exact-term questions
+HYBRID_SEARCH = os.getenv("RAG_HYBRID_SEARCH", "1").lower() in ("1", "true", "yes")
+# Rerank retrieved candidates with a cross-encoder before generation
+RERANK = os.getenv("RAG_RERANK", "0").lower() in ("1", "true", "yes")
+# BM25 index files per collection version, under chroma_dir
+LEXICAL_DIR = "lexical"
+# Serve from a read-only, memory-mapped export of the active collection that
+# several worker processes share (see serve.py); builds publish new versions to it
+SHARED_INDEX = os.getenv("RAG_SHARED_INDEX", "0").lower() in ("1", "true", "yes")
+SHARED_INDEX_DIR = "shared_index"
+# Held by whichever process is building, so concurrent workers never build at once
+BUILD_LOCK_FILE = "build.lock"
+# Batch questions (query_many): questions per encode/search step, and answers generated at once
+BATCH_CHUNK_SIZE = int(os.getenv("RAG_BATCH_CHUNK_SIZE", "256"))
+BATCH_CONCURRENCY = int(os.getenv("RAG_BATCH_CONCURRENCY", "4"))
+# Old collection versions stay readable this long after a swap
+COLLECTION_GC_GRACE_SECONDS = float(os.getenv("RAG_COLLECTION_GC_GRACE_SECONDS", "60"))
+
+PROMPT_HEADER = """You are a friendly and knowledgeable AI assistant for Manipal Institute of Technology (MIT), Manipal. 
+You provide detailed, accurate, and helpful answers about the college.
+"""
+
+PROMPT_INSTRUCTIONS = """INSTRUCTIONS:
+1. Answer the question naturally and conversationally, like ChatGPT
+2. Use the context information provided below to give accurate, detailed answers
+3. If the context contains relevant information, use it to provide comprehensive answers
+4. Structure your answer clearly with proper paragraphs
+5. If the context doesn't fully answer the question, provide the best answer you can based on the context and mention that for more details, they can contact the college
+6. Be friendly, professional, and helpful
+7. Format numbers, fees, and important details clearly
+8. If asked about something not in the context, politely say you don't have that specific information but offer to help with related topics
+"""
+
+# "hf" calls the remote Inference API; "extractive" and "llama-cpp" answer on local CPU
+GENERATOR_KIND = os.getenv("RAG_GENERATOR", "hf").lower()
+# Tokenizer used to count prompt tokens for the Inference API model
+PROMPT_TOKENIZER = os.getenv("RAG_PROMPT_TOKENIZER", "mistralai/Mistral-7B-Instruct-v0.2")
+
+HF_GENERATION_PARAMETERS = {
+    "max_new_tokens": 512,
+    "temperature": 0.7,
+    "top_p": 0.9,
+    "do_sample": True,
+    "return_full_text": False
+}
+
 class RAGSystem:
-    def __init__(self):
-        self.data_dir = Path("data")
-        self.chroma_dir = Path("chroma_db")
-        self.chroma_dir.mkdir(exist_ok=True)
-        
-        # Initialize ChromaDB
-        self.client = chromadb.PersistentClient(
-            path=str(self.chroma_dir),
-            settings=Settings(anonymized_telemetry=False)
-        )
+    def __init__(self, data_dir: str = "data", chroma_dir: str = "chroma_db"):
+        self.data_dir = Path(data_dir)
+        self.chroma_dir = Path(chroma_dir)
         
-        # Initialize embedding model
-        try:
-            self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
-        except Exception as e:
-            print(f"Error loading embedding model: {e}")
-            self.embedding_model = None
+        # The Chroma client and embedding model (and the chromadb/torch imports
+        # behind them) are created on first use, so importing this module and
+        # constructing RAGSystem stay cheap; call load() to warm them up
+        self._client = None
+        self._embedding_model = None
+        self._model_loaded = False
+        # The backend actually serving embeddings, once loaded
+        self.encoder_kind = None
+        self._query_embedder = None
+        self._embedding_store = None
+        self._load_lock = threading.RLock()
             
+        self.chunker = JsonChunker()
+        self.answer_cache = AnswerCache()
+        self.intents = IntentEngine.load()
+        self.conversations = ConversationStore()
+        self.llm_client = InferenceClient()
+        self.prompt_builder = PromptBuilder(PROMPT_HEADER, PROMPT_INSTRUCTIONS)
+        self.generator = make_generator(GENERATOR_KIND, self.prompt_builder)
+        self.reranker = CrossEncoderReranker() if RERANK else None
         self.collection = None
+        self.retriever = None
+        self.lexical_index = None
+        self.shared_index = SharedIndex(self.chroma_dir / SHARED_INDEX_DIR) if SHARED_INDEX else None
+        self._shared_version = None
         self.initialized = False
+        self.last_build = {}
+        self._build_lock = threading.Lock()
+    
+    def load(self):
+        """Load the embedding model and open the vector store (and the local generator, if any)"""
+        if self.shared_index is None:
+            # Shared-index workers only open Chroma if they end up building
+            self.client
+        self.embedding_model
+        if self.generator is not None:
+            try:
+                self.generator.load()
+            except Exception as e:
+                print(f"Error loading {self.generator.name} generator, using the rule-based answers instead: {e}")
+                self.generator = None
+        if self.reranker is not None:
+            try:
+                self.reranker.load()
+            except Exception as e:
+                print(f"Error loading reranker, serving retrieval order as is: {e}")
+                self.reranker = None
+        self._load_prompt_tokenizer()
+    
+    def _load_prompt_tokenizer(self):
+        """Count prompt tokens with the generation model's tokenizer; the approximation stays on failure"""
+        if self.generator is not None:
+            if hasattr(self.generator, "count_tokens"):
+                self.prompt_builder.set_token_counter(self.generator.count_tokens, self.generator.name)
+            return
+        try:
+            self.prompt_builder.set_token_counter(load_hf_token_counter(PROMPT_TOKENIZER), PROMPT_TOKENIZER)
+        except Exception as e:
+            print(f"Could not load the {PROMPT_TOKENIZER} tokenizer, approximating prompt token counts: {e}")
+    
+    @property
+    def client(self):
+        if self._client is None:
+            with self._load_lock:
+                if self._client is None:
+                    import chromadb
+                    from chromadb.config import Settings
+                    
+                    self.chroma_dir.mkdir(exist_ok=True)
+                    self._client = chromadb.PersistentClient(
+                        path=str(self.chroma_dir),
+                        settings=Settings(anonymized_telemetry=False)
+                    )
+        return self._client
+    
+    @property
+    def embedding_model(self):
+        if not self._model_loaded:
+            with self._load_lock:
+                if not self._model_loaded:
+                    self._load_embedding_model()
+        return self._embedding_model
+    
+    @property
+    def query_embedder(self) -> Optional[EmbeddingBatcher]:
+        self.embedding_model
+        return self._query_embedder
+    
+    @property
+    def embedding_store(self) -> Optional[EmbeddingStore]:
+        self.embedding_model
+        return self._embedding_store
+    
+    @property
+    def embedding_key(self) -> Optional[str]:
+        """Model name plus encoder backend and library versions; vectors are only comparable under one key"""
+        store = self.embedding_store
+        return store.model_id if store is not None else None
+    
+    def _load_embedding_model(self):
+        model = None
+        # An ONNX backend that can't be exported, loaded or verified falls back to PyTorch
+        for kind in dict.fromkeys([ENCODER_KIND, "torch"]):
+            try:
+                model = make_encoder(kind, EMBEDDING_MODEL_NAME)
+                self.encoder_kind = kind
+                break
+            except Exception as e:
+                print(f"Error loading {kind} embedding model: {e}")
+        if model is None:
+            self._model_loaded = True
+            return
+        
+        # Concurrent questions share one encode call instead of one call each
+        self._query_embedder = EmbeddingBatcher(model)
+        # Document embeddings survive restarts, so cold-start builds only encode new text
+        self._embedding_store = EmbeddingStore(
+            f"{EMBEDDING_MODEL_NAME}@{encoder_version(model)}",
+            model.get_sentence_embedding_dimension()
+        )
+        self._embedding_model = model
+        self._model_loaded = True
         
     def is_initialized(self) -> bool:
         """Check if the knowledge base is initialized"""
         if self.chroma_dir.exists() and any(self.chroma_dir.iterdir()):
             try:
-                collection = self.client.get_or_create_collection("manipal_knowledge")
+                name = self._load_manifest().get("collection", COLLECTION_NAME)
+                collection = self.client.get_or_create_collection(name)
                 return collection.count() > 0
             except:
                 return False
         return False
+    
+    def load_active_collection(self) -> bool:
+        """Point queries at the collection recorded as active in the manifest.
+        
+        A collection embedded under another model, encoder backend or library
+        version is rebuilt first: its vectors can't be compared with new queries.
+        """
+        manifest = self._load_manifest()
+        if self.embedding_model is not None and manifest.get("model") != self.embedding_key:
+            print(f"Knowledge base was embedded with {manifest.get('model')}, not {self.embedding_key}; rebuilding...")
+            return self.initialize()
+        name = manifest.get("collection", COLLECTION_NAME)
+        self._activate(self.client.get_or_create_collection(name))
+        self.initialized = self.collection.count() > 0
+        return self.initialized
+    
+    def _activate(self, collection, lexical: BM25Index = None):
+        """Build the retriever for a collection and switch queries over to it"""
+        if HYBRID_SEARCH and lexical is None:
+            lexical = self._load_lexical(collection)
+        if self.shared_index is not None:
+            # Publish this version to the other workers and serve the same mapped export
+            self.shared_index.export(collection)
+            dense = self.shared_index.open(collection.name, QUANTIZATION)
+            retriever = HybridRetriever(dense, lexical) if lexical is not None else dense
+            self._shared_version = collection.name
+        else:
+            retriever = make_retriever(RETRIEVER_KIND, collection, lexical, QUANTIZATION)
+        # Single reference assignments: in-flight queries finish on whatever they already read
+        self.retriever = retriever
+        self.lexical_index = lexical
+        self.collection = collection
+    
+    def load_shared_index(self) -> bool:
+        """Serve the version named by the shared index, if it isn't already being served.
+        
+        Lets a worker attach to a knowledge base another process built without
+        opening Chroma. Returns whether a version was newly loaded.
+        """
+        if self.shared_index is None:
+            return False
+        name = self.shared_index.current()
+        if name is None or name == self._shared_version or not self.shared_index.exists(name):
+            return False
+        dense = self.shared_index.open(name, QUANTIZATION)
+        lexical = BM25Index.load(self._lexical_path(name)) if HYBRID_SEARCH else None
+        self.retriever = HybridRetriever(dense, lexical) if lexical is not None else dense
+        self.lexical_index = lexical
+        self._shared_version = name
+        self.initialized = dense.count() > 0
+        # Cached answers were built from the previous version
+        self.answer_cache.invalidate()
+        print(f"Serving shared index {name} ({dense.count()} chunks)")
+        return True
+    
+    def _lexical_path(self, collection_name: str) -> Path:
+        return self.chroma_dir / LEXICAL_DIR / collection_name
+    
+    def _load_lexical(self, collection) -> BM25Index:
+        """The saved BM25 index of a collection, or one built from its documents"""
+        lexical = BM25Index.load(self._lexical_path(collection.name))
+        if lexical is None or len(lexical) != collection.count():
+            lexical = BM25Index.from_collection(collection)
+            lexical.save(self._lexical_path(collection.name))
+        return lexical
+    
+    def _update_lexical(self, active, shadow, wanted_ids: set) -> BM25Index:
+        """BM25 index for the shadow: the active one minus removed chunks, plus the new ones"""
+        base = self.lexical_index
+        if base is None or self.collection is None or self.collection.name != active.name:
+            base = self._load_lexical(active)
+        base_ids = set(base.ids)
+        added = [chunk_id for chunk_id in wanted_ids if chunk_id not in base_ids]
+        lexical = base.with_changes(remove_ids=base_ids - wanted_ids)
+        for i in range(0, len(added), 1000):
+            batch = shadow.get(ids=added[i:i+1000], include=["documents", "metadatas"])
+            lexical = lexical.with_changes(add_ids=batch["ids"], add_texts=batch["documents"],
+                                           add_metadatas=batch["metadatas"])
+        lexical.save(self._lexical_path(shadow.name))
+        return lexical
         
     def initialize(self):
-        """Initialize the RAG system by loading data into vector database"""
+        """Initialize the RAG system by syncing the data files into the vector database.
+        
+        Chunk IDs are content hashes, so only new or changed chunks are embedded.
+        Changes are built into a new versioned shadow collection (unchanged vectors
+        are copied over, not re-embedded) which becomes active only once complete,
+        so queries keep reading the previous version until the swap.
+        """
         if not self.embedding_model:
             print("Embedding model not available. Using fallback...")
             self.initialized = False
             return False
-            
+        
+        self.chroma_dir.mkdir(exist_ok=True)
+        with self._build_lock, FileLock(self.chroma_dir / BUILD_LOCK_FILE, exclusive=True):
+            # Another process may have built while we waited: _build then finds nothing to do
+            return self._build()
+    
+    def _build(self) -> bool:
         print("Initializing RAG system...")
         
         try:
-            # Get or create collection
-            self.collection = self.client.get_or_create_collection(
-                name="manipal_knowledge",
+            manifest = self._load_manifest()
+            active_name = manifest.get("collection", COLLECTION_NAME)
+            active = self.client.get_or_create_collection(
+                name=active_name,
                 metadata={"description": "Manipal Institute of Technology Knowledge Base"}
             )
             
-            # Clear existing data if rebuilding
-            if self.collection.count() > 0:
-                print("Clearing existing data for fresh build...")
-                try:
-                    self.client.delete_collection("manipal_knowledge")
-                except:
-                    pass
-                self.collection = self.client.create_collection(
-                    name="manipal_knowledge",
-                    metadata={"description": "Manipal Institute of Technology Knowledge Base"}
-                )
-            
-            # Load and process all data files
-            data_files = [
-                "official_info.json",
-                "courses.json",
-                "hostels.json",
-                "fees.json",
-                "facilities.json",
-                "admissions.json"
-            ]
+            existing_ids = set()
+            embedding_key = self.embedding_key
+            if manifest.get("model") != embedding_key:
+                # Vectors from another model, backend or library version can't be mixed with new ones:
+                # rebuild everything
+                if active.count() > 0:
+                    print(f"Embedding model changed to {embedding_key}, building a fresh collection...")
+                manifest = {"model": embedding_key, "version": manifest.get("version", 0), "files": {}}
+            else:
+                for entry in manifest["files"].values():
+                    existing_ids.update(entry["chunks"])
+                if len(existing_ids) != active.count():
+                    # Manifest and collection disagree (crash mid-build, manual edits): trust the collection
+                    existing_ids = set(active.get(include=[])["ids"])
             
-            documents = []
-            metadatas = []
-            ids = []
+            # Hash every source; files unchanged since the last build reuse their
+            # chunk IDs (and stored vectors) without being read again
+            sources = discover_sources(self.data_dir)
+            file_hashes = {}
+            files_to_chunk = []
+            reused = {}
+            for file_path in sources:
+                key = source_key(self.data_dir, file_path)
+                file_hash = self._file_hash(file_path)
+                file_hashes[key] = file_hash
+                previous = manifest["files"].get(key)
+                if (previous and previous["sha256"] == file_hash
+                        and previous.get("chunker") == self.chunker.signature
+                        and all(chunk_id in existing_ids for chunk_id in previous["chunks"])):
+                    reused[key] = previous["chunks"]
+                else:
+                    files_to_chunk.append((key, file_path, source_name(key)))
             
-            for file_name in data_files:
-                file_path = self.data_dir / file_name
-                if file_path.exists():
-                    with open(file_path, "r", encoding="utf-8") as f:
-                        data = json.load(f)
-                        processed = self._process_json_data(data, file_name.replace(".json", ""))
-                        for i, doc in enumerate(processed):
-                            documents.append(doc["text"])
-                            metadatas.append(doc["metadata"])
-                            ids.append(f"{file_name}_{i}")
+            if not files_to_chunk and set(reused) == set(manifest["files"]):
+                wanted_ids = set()
+                for chunk_ids in reused.values():
+                    wanted_ids.update(chunk_ids)
+                if active.count() == len(wanted_ids):
+                    print("Knowledge base already up to date")
+                    if self.collection is None or self.collection.name != active_name:
+                        self._activate(active)
+                    self.last_build = {"collection": active_name, "added": 0, "removed": 0,
+                                       "unchanged": len(wanted_ids)}
+                    self.initialized = bool(wanted_ids)
+                    return self.initialized
             
-            if documents:
-                # Generate embeddings
-                print(f"Generating embeddings for {len(documents)} documents...")
-                embeddings = self.embedding_model.encode(documents, show_progress_bar=True).tolist()
-                
-                # Add to ChromaDB in batches to avoid memory issues
-                batch_size = 100
-                for i in range(0, len(documents), batch_size):
-                    batch_docs = documents[i:i+batch_size]
-                    batch_embeddings = embeddings[i:i+batch_size]
-                    batch_metas = metadatas[i:i+batch_size]
-                    batch_ids = ids[i:i+batch_size]
-                    
-                    self.collection.add(
-                        embeddings=batch_embeddings,
-                        documents=batch_docs,
-                        metadatas=batch_metas,
-                        ids=batch_ids
-                    )
-                
-                print(f"Added {len(documents)} documents to knowledge base")
-                self.initialized = True
-                return True
-            else:
+            if not file_hashes:
                 print("No documents to add to knowledge base")
-                self.initialized = False
+                self.initialized = self.collection is not None and self.collection.count() > 0
                 return False
+            
+            version = manifest.get("version", 0) + 1
+            shadow_name = f"{COLLECTION_NAME}_v{version}"
+            shadow, written_ids = self._open_shadow(shadow_name, embedding_key)
+            
+            print(f"Ingesting {len(files_to_chunk)} new or changed files ({len(reused)} unchanged) into {shadow_name}...")
+            pipeline = IngestionPipeline(
+                self.chunker,
+                lambda texts: self.embedding_store.encode(texts, self.embedding_model)
+            )
+            file_chunks, stages = pipeline.run(files_to_chunk, reused, existing_ids, written_ids, active, shadow)
+            
+            new_files = {
+                key: {"sha256": file_hashes[key], "chunker": self.chunker.signature, "chunks": file_chunks[key]}
+                for key in file_hashes
+            }
+            wanted_ids = set()
+            for entry in new_files.values():
+                wanted_ids.update(entry["chunks"])
+            # A resumed shadow may hold chunks of files that changed again since the crash
+            stale = [chunk_id for chunk_id in written_ids if chunk_id not in wanted_ids]
+            for i in range(0, len(stale), 1000):
+                shadow.delete(ids=stale[i:i+1000])
+            added = sum(1 for chunk_id in wanted_ids if chunk_id not in existing_ids)
+            removed = len(existing_ids - wanted_ids)
+            unchanged = len(wanted_ids) - added
+            
+            if shadow.count() != len(wanted_ids):
+                self.client.delete_collection(shadow_name)
+                raise RuntimeError(f"Shadow collection has {shadow.count()} documents, expected {len(wanted_ids)}")
+            
+            lexical = self._update_lexical(active, shadow, wanted_ids) if HYBRID_SEARCH else None
+            
+            # Persist the pointer first, then swap the reference queries read from
+            self._save_manifest({
+                "model": embedding_key,
+                "collection": shadow_name,
+                "version": version,
+                "files": new_files
+            })
+            self._clear_build_state()
+            self._activate(shadow, lexical)
+            self.initialized = True
+            # Cached answers were built from the old knowledge base
+            self.answer_cache.invalidate()
+            
+            self._schedule_collection_gc(active_name)
+            self.last_build = {"collection": shadow_name, "added": added, "removed": removed,
+                               "unchanged": unchanged, "stages": stages}
+            print(f"Knowledge base updated to {shadow_name}: {added} added, {removed} removed, "
+                  f"{unchanged} unchanged")
+            return True
         except Exception as e:
             print(f"Error initializing RAG system: {e}")
-            self.initialized = False
+            # A failed build leaves the previous collection serving
+            self.initialized = self.collection is not None
             return False
+    
+    def _schedule_collection_gc(self, retired_name: str):
+        """Drop the retired collection after a grace period, and any older leftovers now"""
+        active_name = self.collection.name
+        for collection in self.client.list_collections():
+            name = collection.name
+            if name.startswith(COLLECTION_NAME) and name not in (active_name, retired_name):
+                self._drop_collection(name)
+        
+        # In-flight queries may still hold the old collection; give them time to finish
+        timer = threading.Timer(COLLECTION_GC_GRACE_SECONDS, self._drop_collection, args=(retired_name,))
+        timer.daemon = True
+        timer.start()
+    
+    def _drop_collection(self, name: str):
+        if self.collection is not None and self.collection.name == name:
+            return
+        BM25Index.remove_files(self._lexical_path(name))
+        if self.shared_index is not None:
+            self.shared_index.remove(name)
+        try:
+            self.client.delete_collection(name)
+            print(f"Dropped old collection {name}")
+        except Exception:
+            pass
+    
+    @staticmethod
+    def _file_hash(file_path: Path) -> str:
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        return digest.hexdigest()
+    
+    def _open_shadow(self, shadow_name: str, embedding_key: str):
+        """Create the collection a build writes into, or pick up the one an interrupted build left.
+        
+        Returns the collection and the chunk IDs already in it.
+        """
+        state = self._load_json(BUILD_STATE_FILE, {})
+        if state.get("collection") == shadow_name and state.get("model") == embedding_key:
+            try:
+                shadow = self.client.get_collection(shadow_name)
+                written_ids = set(shadow.get(include=[])["ids"])
+                print(f"Resuming interrupted build of {shadow_name} ({len(written_ids)} chunks already written)")
+                return shadow, written_ids
+            except Exception:
+                pass
+        try:
+            self.client.delete_collection(shadow_name)  # leftover we can't resume
+        except Exception:
+            pass
+        shadow = self.client.create_collection(
+            name=shadow_name,
+            metadata={"description": "Manipal Institute of Technology Knowledge Base"}
+        )
+        self._save_json(BUILD_STATE_FILE, {"collection": shadow_name, "model": embedding_key})
+        return shadow, set()
+    
+    def _clear_build_state(self):
+        try:
+            (self.chroma_dir / BUILD_STATE_FILE).unlink()
+        except FileNotFoundError:
+            pass
+    
+    def _load_manifest(self) -> Dict:
+        return self._load_json(MANIFEST_FILE, {"model": None, "files": {}})
+    
+    def _save_manifest(self, manifest: Dict):
+        self._save_json(MANIFEST_FILE, manifest)
+    
+    def _load_json(self, file_name: str, default: Dict) -> Dict:
+        path = self.chroma_dir / file_name
+        if path.exists():
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    return json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Ignoring unreadable {file_name}: {e}")
+        return default
+    
+    def _save_json(self, file_name: str, data: Dict):
+        path = self.chroma_dir / file_name
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp_path, path)
             
     def _process_json_data(self, data: Dict, source: str) -> List[Dict]:
         """Process JSON data into text chunks with metadata"""
-        chunks = []
-        
-        def extract_text(obj: any, prefix: str = "", depth: int = 0) -> List[str]:
-            """Recursively extract text from JSON structure"""
-            texts = []
-            if isinstance(obj, dict):
-                for key, value in obj.items():
-                    key_text = key.replace("_", " ").title()
-                    if isinstance(value, (dict, list)):
-                        texts.extend(extract_text(value, f"{prefix} {key_text}", depth + 1))
-                    else:
-                        texts.append(f"{prefix} {key_text}: {value}")
-            elif isinstance(obj, list):
-                for item in obj:
-                    if isinstance(item, (dict, list)):
-                        texts.extend(extract_text(item, prefix, depth + 1))
-                    else:
-                        texts.append(f"{prefix}: {item}")
-            else:
-                texts.append(f"{prefix}: {obj}")
-            return texts
-        
-        # Convert JSON to readable text
-        text_parts = extract_text(data)
-        full_text = " ".join(text_parts)
-        
-        # Split into chunks (simple splitting by sentences)
-        sentences = full_text.split(". ")
-        current_chunk = []
-        current_length = 0
-        chunk_size = 400  # Smaller chunks for better retrieval
-        
-        for sentence in sentences:
-            if current_length + len(sentence) > chunk_size and current_chunk:
-                chunk_text = ". ".join(current_chunk) + "."
-                chunks.append({
-                    "text": chunk_text,
-                    "metadata": {"source": source, "type": "structured_data"}
-                })
-                current_chunk = [sentence]
-                current_length = len(sentence)
-            else:
-                current_chunk.append(sentence)
-                current_length += len(sentence)
-        
-        # Add remaining chunk
-        if current_chunk:
-            chunk_text = ". ".join(current_chunk) + "."
-            chunks.append({
-                "text": chunk_text,
-                "metadata": {"source": source, "type": "structured_data"}
-            })
+        return list(self.chunker.chunk_data(data, source))
         
-        return chunks
-        
-    def query(self, question: str, top_k: int = 8) -> Dict:
-        """Query the RAG system"""
-        if not self.initialized or not self.collection:
+    def query(self, question: str, top_k: int = 8, conversation_id: Optional[str] = None) -> Dict:
+        """Query the RAG system; with a conversation_id, follow-ups are answered in context"""
+        question, turn, reused = self._resolve_follow_up(question, conversation_id)
+        result = self._answer(question, top_k, reused)
+        if turn is not None:
+            turn.chunk_ids = tuple(result.get("chunk_ids", ()))
+            self.conversations.append(conversation_id, turn)
+        return result
+    
+    def _resolve_follow_up(self, question: str, conversation_id: Optional[str]):
+        """The question to answer, the turn to record and, for a follow-up on the same chunks, those hits"""
+        if not conversation_id:
+            return question, None, None
+        with stage("conversation"):
+            intent = self.intents.match(question)
+            intent = intent["name"] if intent is not None else None
+            previous = self.conversations.last(conversation_id)
+            if previous is None or not is_follow_up(question, intent, previous):
+                return question, Turn(question, question, intent), None
+            
+            # Retrieve for (and cache under) the follow-up read together with the question that started the topic
+            turn = Turn(question, previous.topic, previous.intent)
+            question = f"{previous.topic} {question}"
+            reused = None
+            if previous.chunk_ids and self.initialized and self.retriever:
+                hits = self.retriever.get(previous.chunk_ids)
+                if len(hits) == len(previous.chunk_ids) and covers(turn.question, (hit["text"] for hit in hits)):
+                    reused = hits
+            return question, turn, reused
+    
+    def _answer(self, question: str, top_k: int, reused: Optional[List[Dict]] = None) -> Dict:
+        if not self.initialized or not self.retriever:
             # Fallback to rule-based responses
             return self._fallback_response(question)
         
         try:
-            # Generate query embedding
-            query_embedding = self.embedding_model.encode([question]).tolist()[0]
-            
-            # Search similar documents
-            results = self.collection.query(
-                query_embeddings=[query_embedding],
-                n_results=top_k
-            )
-            
-            # Extract relevant context
-            contexts = results["documents"][0] if results["documents"] else []
-            sources = results["metadatas"][0] if results["metadatas"] else []
+            generation = self.answer_cache.generation
+            with stage("cache"):
+                cached = self.answer_cache.get_exact(question)
+            if cached is not None:
+                set_path("cache")
+                return {**cached, "timestamp": datetime.now().isoformat()}
             
-            # Generate response using LLM
-            answer = self._generate_response(question, contexts)
-            
-            return {
-                "answer": answer,
-                "sources": [s.get("source", "unknown") for s in sources],
-                "timestamp": datetime.now().isoformat()
-            }
+            if reused is not None:
+                # Follow-up already covered by the previous turn's chunks: no embedding or search
+                query_vector = None
+                hits = reused
+            else:
+                # Generate query embedding
+                with stage("embed"):
+                    query_vector = self.query_embedder.encode(question)
+                with stage("cache"):
+                    cached = self.answer_cache.get_semantic(question, query_vector)
+                if cached is not None:
+                    set_path("cache")
+                    return {**cached, "timestamp": datetime.now().isoformat()}
+                
+                # Search similar documents
+                hits = self._retrieve(question, query_vector, top_k)
+            return self._complete(question, query_vector, hits, generation)
         except Exception as e:
             print(f"Error in RAG query: {e}")
+            record_error("query")
             return self._fallback_response(question)
+    
+    def _complete(self, question: str, query_vector, hits: List[Dict], generation: int) -> Dict:
+        """Generate the answer from retrieved hits, caching it if a model generated it"""
+        contexts, sources = self._contexts(hits)
+        
+        # Generate response using LLM
+        answer, generated = self._generate_response(question, contexts)
+        
+        result = {
+            "answer": answer,
+            "sources": sources,
+            "chunk_ids": [hit["id"] for hit in hits],
+            "timestamp": datetime.now().isoformat()
+        }
+        # Rule-based answers given while the LLM is down would outlive its recovery
+        if generated:
+            self.answer_cache.put(question, query_vector, result, generation)
+        return result
+    
+    def query_many(self, questions: List[str], top_k: int = 8) -> Iterator[Tuple[int, Dict]]:
+        """Answer a list of questions, yielding (index, result) pairs in completion order
+        
+        Questions are embedded and searched BATCH_CHUNK_SIZE at a time, each chunk
+        with one encode call and one multi-query search, and answers are generated
+        on BATCH_CONCURRENCY threads while the next chunk is being embedded.
+        Repeated questions are answered once.
+        """
+        groups = {}
+        for index, question in enumerate(questions):
+            groups.setdefault(self.answer_cache.normalize(question), []).append(index)
+        unique = [(indexes, questions[indexes[0]]) for indexes in groups.values()]
+        
+        if not self.initialized or not self.retriever:
+            for indexes, question in unique:
+                result = self._fallback_response(question)
+                for index in indexes:
+                    yield index, result
+            return
+        
+        generation = self.answer_cache.generation
+        done = queue.Queue()
+        pending = 0
+        trace = current()
+        
+        def answer(indexes: List[int], question: str, query_vector, hits: List[Dict]):
+            # Runs in a copy of the caller's context, with its own trace: BATCH_CONCURRENCY threads
+            # can't share one. The generator merges it back when it takes the result.
+            child = start_trace() if trace is not None else None
+            try:
+                if self.reranker is not None:
+                    hits = self.reranker.rerank(question, hits, top_k)
+                result = self._complete(question, query_vector, hits, generation)
+            except Exception as e:
+                print(f"Error in RAG batch query: {e}")
+                record_error("query")
+                result = self._fallback_response(question)
+            done.put((indexes, result, child))
+        
+        def take(item: Tuple) -> Tuple[List[int], Dict]:
+            indexes, result, child = item
+            if child is not None:
+                trace.merge(child)
+            return indexes, result
+        
+        def fallback(items: List[Tuple], error: Exception):
+            # A failed embed or search costs its own chunk, not the rest of the batch
+            print(f"Error in RAG batch query: {error}")
+            record_error("query")
+            for indexes, question, *_ in items:
+                result = self._fallback_response(question)
+                for index in indexes:
+                    yield index, result
+        
+        pool = ThreadPoolExecutor(max_workers=BATCH_CONCURRENCY, thread_name_prefix="batch-generate")
+        try:
+            for start in range(0, len(unique), BATCH_CHUNK_SIZE):
+                # Don't let embedding run far ahead of generation
+                while pending >= 2 * BATCH_CHUNK_SIZE:
+                    indexes, result = take(done.get())
+                    pending -= 1
+                    for index in indexes:
+                        yield index, result
+                
+                chunk = []
+                for indexes, question in unique[start:start + BATCH_CHUNK_SIZE]:
+                    cached = self.answer_cache.get_exact(question)
+                    if cached is not None:
+                        for index in indexes:
+                            yield index, {**cached, "timestamp": datetime.now().isoformat()}
+                    else:
+                        chunk.append((indexes, question))
+                if not chunk:
+                    continue
+                
+                try:
+                    with stage("embed"):
+                        vectors = self.embedding_model.encode([question for _, question in chunk],
+                                                              batch_size=len(chunk))
+                except Exception as e:
+                    yield from fallback(chunk, e)
+                    continue
+                searches = []
+                for (indexes, question), vector in zip(chunk, vectors):
+                    cached = self.answer_cache.get_semantic(question, vector)
+                    if cached is not None:
+                        for index in indexes:
+                            yield index, {**cached, "timestamp": datetime.now().isoformat()}
+                    else:
+                        searches.append((indexes, question, vector))
+                if not searches:
+                    continue
+                
+                depth = self.reranker.depth(top_k) if self.reranker is not None else top_k
+                try:
+                    with stage("retrieve"):
+                        results = self.retriever.search_many(
+                            np.stack([vector for _, _, vector in searches]), depth,
+                            query_texts=[question for _, question, _ in searches]
+                        )
+                except Exception as e:
+                    yield from fallback(searches, e)
+                    continue
+                for (indexes, question, vector), hits in zip(searches, results):
+                    pool.submit(contextvars.copy_context().run, answer, indexes, question, vector, hits)
+                    pending += 1
+                
+                while True:
+                    try:
+                        indexes, result = take(done.get_nowait())
+                    except queue.Empty:
+                        break
+                    pending -= 1
+                    for index in indexes:
+                        yield index, result
             
-    def _generate_response(self, question: str, contexts: List[str]) -> str:
-        """Generate response using improved prompt and context"""
-        # Combine contexts intelligently
-        context_text = "\n\n".join(contexts[:5])  # Use top 5 contexts
+            while pending:
+                indexes, result = take(done.get())
+                pending -= 1
+                for index in indexes:
+                    yield index, result
+        finally:
+            # Caller stopped early: drop the questions not started yet
+            pool.shutdown(wait=False, cancel_futures=True)
+    
+    def query_stream(self, question: str, top_k: int = 8, conversation_id: Optional[str] = None) -> Iterator[Dict]:
+        """Query the RAG system, yielding the sources first and then answer tokens as events"""
+        question, turn, reused = self._resolve_follow_up(question, conversation_id)
+        try:
+            yield from self._answer_stream(question, top_k, reused, turn)
+        finally:
+            # Recorded even if the client disconnects mid-answer
+            if turn is not None:
+                self.conversations.append(conversation_id, turn)
+    
+    def _answer_stream(self, question: str, top_k: int, reused: Optional[List[Dict]],
+                       turn: Optional[Turn]) -> Iterator[Dict]:
+        if not self.initialized or not self.retriever:
+            yield from self._replay(self._fallback_response(question))
+            return
         
-        # Create improved, more conversational prompt
-        prompt = f"""You are a friendly and knowledgeable AI assistant for Manipal Institute of Technology (MIT), Manipal. 
-You provide detailed, accurate, and helpful answers about the college.
-
-CONTEXT INFORMATION:
-{context_text}
-
-USER QUESTION: {question}
-
-INSTRUCTIONS:
-1. Answer the question naturally and conversationally, like ChatGPT
-2. Use the context information provided above to give accurate, detailed answers
-3. If the context contains relevant information, use it to provide comprehensive answers
-4. Structure your answer clearly with proper paragraphs
-5. If the context doesn't fully answer the question, provide the best answer you can based on the context and mention that for more details, they can contact the college
-6. Be friendly, professional, and helpful
-7. Format numbers, fees, and important details clearly
-8. If asked about something not in the context, politely say you don't have that specific information but offer to help with related topics
-
-ANSWER:"""
+        try:
+            generation = self.answer_cache.generation
+            with stage("cache"):
+                cached = self.answer_cache.get_exact(question)
+            if cached is not None:
+                set_path("cache")
+                if turn is not None:
+                    turn.chunk_ids = tuple(cached.get("chunk_ids", ()))
+                yield from self._replay(cached)
+                return
+            
+            if reused is not None:
+                query_vector = None
+                hits = reused
+            else:
+                with stage("embed"):
+                    query_vector = self.query_embedder.encode(question)
+                with stage("cache"):
+                    cached = self.answer_cache.get_semantic(question, query_vector)
+                if cached is not None:
+                    set_path("cache")
+                    if turn is not None:
+                        turn.chunk_ids = tuple(cached.get("chunk_ids", ()))
+                    yield from self._replay(cached)
+                    return
+                
+                hits = self._retrieve(question, query_vector, top_k)
+            contexts, sources = self._contexts(hits)
+        except Exception as e:
+            print(f"Error in RAG query: {e}")
+            record_error("query")
+            yield from self._replay(self._fallback_response(question))
+            return
+        
+        chunk_ids = [hit["id"] for hit in hits]
+        if turn is not None:
+            turn.chunk_ids = tuple(chunk_ids)
+        
+        # Sources are known before generation starts, so send them straight away
+        yield {"event": "sources", "sources": sources}
+        
+        parts = []
+        generated = False
+        for token, generated in self._generate_response_stream(question, contexts):
+            parts.append(token)
+            yield {"event": "token", "text": token}
+        
+        result = {
+            "answer": "".join(parts).strip(),
+            "sources": sources,
+            "chunk_ids": chunk_ids,
+            "timestamp": datetime.now().isoformat()
+        }
+        if result["answer"] and generated:
+            self.answer_cache.put(question, query_vector, result, generation)
+        yield {"event": "done", "timestamp": result["timestamp"]}
+    
+    def _replay(self, result: Dict) -> Iterator[Dict]:
+        """Emit an already complete answer as stream events"""
+        yield {"event": "sources", "sources": result.get("sources", [])}
+        yield {"event": "token", "text": result["answer"]}
+        yield {"event": "done", "timestamp": datetime.now().isoformat()}
+    
+    def _retrieve(self, question: str, query_vector, top_k: int) -> List[Dict]:
+        """Return the top_k hits, reranked when a reranker is loaded"""
+        reranker = self.reranker
+        if reranker is None:
+            with stage("retrieve"):
+                hits = self.retriever.search(query_vector, top_k, query_text=question)
+        else:
+            # Fetch as many candidates as the latency budget allows scoring, keep the best top_k
+            with stage("retrieve"):
+                hits = self.retriever.search(query_vector, reranker.depth(top_k), query_text=question)
+            with stage("rerank"):
+                hits = reranker.rerank(question, hits, top_k)
+        return hits
+    
+    @staticmethod
+    def _contexts(hits: List[Dict]) -> Tuple[List[str], List[str]]:
+        """Context texts of hits and their source names"""
+        contexts = [hit["text"] for hit in hits]
+        return contexts, [(hit["metadata"] or {}).get("source", "unknown") for hit in hits]
+            
+    def _generate_response(self, question: str, contexts: List[str]) -> Tuple[str, bool]:
+        """Generate response using improved prompt and context; also whether a model generated it"""
+        # Deduplicated contexts packed into the token budget, after the fixed instruction prefix
+        with stage("prompt"):
+            prompt = self.prompt_builder.build(question, contexts)
+        if self.generator is not None:
+            try:
+                with stage("generate"):
+                    answer = self.generator.generate(question, prompt.contexts).strip()
+                if answer:
+                    set_path("local")
+                    return answer, True
+            except Exception as e:
+                print(f"Local generator error: {e}")
+                record_error("generate")
+            return self._improved_rule_based_response(question, contexts), False
         
         # Try Hugging Face Inference API first
         try:
-            return self._call_huggingface_api(prompt, question, contexts)
+            return self._call_huggingface_api(prompt.text, question, contexts)
         except Exception as e:
             print(f"Hugging Face API error: {e}")
+            record_error("llm")
             # Fallback to improved rule-based generation
-            return self._improved_rule_based_response(question, contexts)
+            return self._improved_rule_based_response(question, contexts), False
+    
+    def _generate_response_stream(self, question: str, contexts: List[str]) -> Iterator[Tuple[str, bool]]:
+        """Generate (token, generated) pairs, falling back to the rule-based answer in one piece
+        
+        generated is False only for that fallback.
+        """
+        if self.generator is None and not self.llm_client.configured:
+            yield self._improved_rule_based_response(question, contexts), False
+            return
+        
+        emitted = False
+        try:
+            with stage("prompt"):
+                prompt = self.prompt_builder.build(question, contexts)
+            if self.generator is not None:
+                tokens = self.generator.stream(question, prompt.contexts)
+            else:
+                tokens = self._stream_huggingface_api(prompt.text)
+            started = time.perf_counter()
+            for token in tokens:
+                if not emitted:
+                    token = token.lstrip()
+                    if not token:
+                        continue
+                    record_stage("first_token", time.perf_counter() - started)
+                    set_path("local" if self.generator is not None else "llm")
+                emitted = True
+                yield token, True
+            record_stage("generate", time.perf_counter() - started)
+        except CircuitOpenError:
+            pass
+        except Exception as e:
+            print(f"API streaming error: {e}")
+            record_error("generate" if self.generator is not None else "llm")
+        
+        # Only fall back if nothing reached the client yet; a cut-off stream ends as is
+        if not emitted:
+            yield self._improved_rule_based_response(question, contexts), False
             
-    def _call_huggingface_api(self, prompt: str, question: str, contexts: List[str]) -> str:
+    def _call_huggingface_api(self, prompt: str, question: str, contexts: List[str]) -> Tuple[str, bool]:
         """Call Hugging Face Inference API with better model"""
-        # Try using a better free model
-        API_URL = "https://api-inference.huggingface.co/models/mistralai/Mistral-7B-Instruct-v0.2"
-        headers = {"Authorization": f"Bearer {os.getenv('HUGGINGFACE_API_KEY', '')}"}
-        
         # If no API key, use improved rule-based
-        if not os.getenv('HUGGINGFACE_API_KEY'):
-            return self._improved_rule_based_response(question, contexts)
-        
-        payload = {
-            "inputs": prompt,
-            "parameters": {
-                "max_new_tokens": 512,
-                "temperature": 0.7,
-                "top_p": 0.9,
-                "do_sample": True,
-                "return_full_text": False
-            }
-        }
+        if not self.llm_client.configured:
+            return self._improved_rule_based_response(question, contexts), False
         
         try:
-            response = requests.post(API_URL, headers=headers, json=payload, timeout=15)
-            if response.status_code == 200:
-                result = response.json()
-                if isinstance(result, list) and len(result) > 0:
-                    if "generated_text" in result[0]:
-                        answer = result[0]["generated_text"].strip()
-                        # Clean up the answer
-                        answer = re.sub(r'^ANSWER:\s*', '', answer, flags=re.IGNORECASE)
-                        if answer:
-                            return answer
-            return self._improved_rule_based_response(question, contexts)
+            with stage("generate"):
+                answer = self.llm_client.generate(prompt, HF_GENERATION_PARAMETERS).strip()
+            # Clean up the answer
+            answer = re.sub(r'^ANSWER:\s*', '', answer, flags=re.IGNORECASE)
+            if answer:
+                set_path("llm")
+                return answer, True
+            return self._improved_rule_based_response(question, contexts), False
+        except CircuitOpenError:
+            # Endpoint known to be down: answer locally without waiting on the network
+            record_error("llm_circuit_open")
+            return self._improved_rule_based_response(question, contexts), False
         except Exception as e:
             print(f"API call error: {e}")
-            return self._improved_rule_based_response(question, contexts)
+            record_error("llm")
+            return self._improved_rule_based_response(question, contexts), False
             
-    def _improved_rule_based_response(self, question: str, contexts: List[str]) -> str:
-        """Generate improved, more natural responses using context"""
-        question_lower = question.lower()
-        
-        # Extract and organize relevant information from contexts
-        relevant_sections = []
-        all_info = {}
-        
-        for context in contexts:
-            # Extract key information
-            sentences = context.split(". ")
-            for sentence in sentences:
-                sentence_clean = sentence.strip()
-                if not sentence_clean:
+    def _stream_huggingface_api(self, prompt: str) -> Iterator[str]:
+        """Stream generated tokens from the Hugging Face Inference API"""
+        # Hold back the first few characters so a leading "ANSWER:" can be stripped
+        head = ""
+        started = False
+        for text in self.llm_client.stream(prompt, HF_GENERATION_PARAMETERS):
+            if not started:
+                head += text
+                if len(head.lstrip()) < len("ANSWER:"):
                     continue
-                
-                sentence_lower = sentence_clean.lower()
-                # Categorize information
-                if any(word in question_lower for word in sentence_lower.split()):
-                    relevant_sections.append(sentence_clean)
-                
-                # Extract structured data
-                if ":" in sentence_clean:
-                    parts = sentence_clean.split(":", 1)
-                    if len(parts) == 2:
-                        key = parts[0].strip().lower()
-                        value = parts[1].strip()
-                        if key not in all_info:
-                            all_info[key] = []
-                        all_info[key].append(value)
-        
-        # Build comprehensive answer
-        if relevant_sections:
-            # Remove duplicates while preserving order
-            seen = set()
-            unique_sections = []
-            for section in relevant_sections:
-                if section not in seen:
-                    seen.add(section)
-                    unique_sections.append(section)
-            
-            # Combine into natural answer
-            answer_parts = []
-            
-            # Start with most relevant sentence
-            if unique_sections:
-                main_answer = unique_sections[0]
-                answer_parts.append(main_answer)
-                
-                # Add supporting details
-                for section in unique_sections[1:6]:  # Limit to 5 additional sections
-                    if section != main_answer and len(section) > 20:
-                        answer_parts.append(section)
-                
-                answer = ". ".join(answer_parts)
-                
-                # Ensure proper ending
-                if not answer.endswith((".", "!", "?")):
-                    answer += "."
-                
-                # Add helpful closing if appropriate
-                if len(answer_parts) > 1:
-                    answer += " If you need more specific information, feel free to ask or contact the admissions office."
-                
-                return answer
+                text = re.sub(r'^\s*ANSWER:\s*', '', head, flags=re.IGNORECASE).lstrip()
+                started = True
+            if text:
+                yield text
         
-        # Fallback to keyword-based responses with more detail
-        return self._detailed_fallback_response(question_lower, all_info)
+        if not started:
+            text = re.sub(r'^\s*ANSWER:\s*', '', head, flags=re.IGNORECASE).strip()
+            if text:
+                yield text
+            
+    def _improved_rule_based_response(self, question: str, contexts: List[str]) -> str:
+        """Generate improved, more natural responses using context"""
+        set_path("rule_based")
+        with stage("rule_based"):
+            return self.intents.context_answer(question, contexts)
         
-    def _detailed_fallback_response(self, question_lower: str, info_dict: Dict) -> str:
+    def _detailed_fallback_response(self, question: str) -> str:
         """Generate detailed fallback responses"""
-        
-        if any(word in question_lower for word in ["course", "program", "degree", "b.tech", "m.tech"]):
-            response = "Manipal Institute of Technology (MIT) offers a wide range of programs:\n\n"
-            response += "**Undergraduate Programs (B.Tech):**\n"
-            response += "• Computer Science & Engineering\n"
-            response += "• Information Technology\n"
-            response += "• Electronics & Communication Engineering\n"
-            response += "• Mechanical Engineering\n"
-            response += "• Civil Engineering\n"
-            response += "• Electrical & Electronics Engineering\n"
-            response += "• Aerospace Engineering\n"
-            response += "• Chemical Engineering\n\n"
-            response += "**Postgraduate Programs (M.Tech & MBA):**\n"
-            response += "• Various M.Tech specializations in engineering fields\n"
-            response += "• MBA program\n\n"
-            response += "The duration for B.Tech is 4 years and M.Tech is 2 years. "
-            response += "Admissions are based on MET (Manipal Entrance Test) or JEE Main scores for B.Tech programs. "
-            response += "For detailed information about specific courses, eligibility criteria, and admission requirements, "
-            response += "I'd recommend visiting the official MIT Manipal website or contacting the admissions office."
-            return response
-        
-        if any(word in question_lower for word in ["fee", "cost", "price", "tuition", "money"]):
-            response = "Here's the fee structure at MIT Manipal:\n\n"
-            response += "**B.Tech Programs:**\n"
-            response += "• Annual tuition: ₹4,00,000 - ₹5,00,000 per year\n"
-            response += "• Total 4-year cost: ₹16,00,000 - ₹20,00,000\n\n"
-            response += "**M.Tech Programs:**\n"
-            response += "• Annual tuition: ₹2,00,000 - ₹3,00,000 per year\n\n"
-            response += "**MBA Program:**\n"
-            response += "• Annual tuition: ₹5,00,000 - ₹7,00,000 per year\n\n"
-            response += "**Additional Costs:**\n"
-            response += "• Admission fee (one-time): ₹50,000 - ₹1,00,000\n"
-            response += "• Security deposit (refundable): ₹25,000 - ₹50,000\n"
-            response += "• Hostel fees: ₹80,000 - ₹1,70,000 per year (depending on accommodation type)\n"
-            response += "• Medical insurance: ₹5,000 - ₹10,000 per year\n\n"
-            response += "**Financial Aid:**\n"
-            response += "MIT Manipal offers various scholarships including merit-based scholarships (up to 50% fee waiver based on MET/JEE rank), "
-            response += "sports quota scholarships, need-based financial aid, and alumni scholarships. "
-            response += "Education loans and EMI options are also available."
-            return response
-        
-        if any(word in question_lower for word in ["hostel", "accommodation", "mess", "room", "living"]):
-            response = "MIT Manipal provides comprehensive hostel facilities:\n\n"
-            response += "**Boys Hostels:**\n"
-            response += "• Non-AC Double Occupancy: ₹80,000 - ₹90,000/year\n"
-            response += "• AC Double Occupancy: ₹1,20,000 - ₹1,40,000/year\n"
-            response += "• Non-AC Single Occupancy: ₹1,50,000 - ₹1,70,000/year\n\n"
-            response += "**Girls Hostels:**\n"
-            response += "• Non-AC Double Occupancy: ₹80,000 - ₹90,000/year\n"
-            response += "• AC Double Occupancy: ₹1,20,000 - ₹1,40,000/year\n\n"
-            response += "**Facilities:** All hostels include Wi-Fi, common rooms, laundry services, mess facilities, and 24/7 security.\n\n"
-            response += "**Mess Timings:**\n"
-            response += "• Breakfast: 7:00 AM - 9:00 AM\n"
-            response += "• Lunch: 12:00 PM - 2:00 PM\n"
-            response += "• Snacks: 4:00 PM - 6:00 PM\n"
-            response += "• Dinner: 7:00 PM - 9:00 PM\n\n"
-            response += "Mess fees are included in the hostel fees, and both vegetarian and non-vegetarian options are available."
-            return response
-        
-        if any(word in question_lower for word in ["admission", "apply", "entrance", "met", "jee", "how to"]):
-            response = "**Admission Process for MIT Manipal:**\n\n"
-            response += "**Entrance Exams Accepted:**\n"
-            response += "• MET (Manipal Entrance Test) - conducted by MAHE\n"
-            response += "• JEE Main - for B.Tech programs\n"
-            response += "• GATE - for M.Tech programs (minimum 50 percentile)\n\n"
-            response += "**Application Steps:**\n"
-            response += "1. Register online on the official MIT Manipal website\n"
-            response += "2. Fill out the application form\n"
-            response += "3. Pay application fee (₹600 - ₹2,000)\n"
-            response += "4. Appear for entrance exam (if applicable)\n"
-            response += "5. Participate in counseling and seat allocation\n"
-            response += "6. Complete document verification and fee payment\n\n"
-            response += "**Important Dates:**\n"
-            response += "• Application usually starts: October-November\n"
-            response += "• Application deadline: March-April\n"
-            response += "• Exam date: April-May\n"
-            response += "• Results: May-June\n"
-            response += "• Counseling: June-July\n"
-            response += "• Admission: July-August\n\n"
-            response += "**Contact:**\n"
-            response += "Admissions Office: +91 820 292 2400\n"
-            response += "Email: admissions@manipal.edu\n"
-            response += "Website: https://manipal.edu/mit"
-            return response
-        
-        if any(word in question_lower for word in ["library", "book", "study", "resource"]):
-            response = "The Knowledge Resource Centre (Library) at MIT Manipal is a comprehensive facility:\n\n"
-            response += "**Collection:**\n"
-            response += "• Books: 300,000+\n"
-            response += "• Journals: 1,500+\n"
-            response += "• E-books: 50,000+\n"
-            response += "• Digital databases: Access to IEEE, ACM, Springer, and more\n\n"
-            response += "**Operating Hours:**\n"
-            response += "• Weekdays: 8:00 AM - 10:00 PM\n"
-            response += "• Saturday: 9:00 AM - 6:00 PM\n"
-            response += "• Sunday: 10:00 AM - 6:00 PM\n\n"
-            response += "**Services:**\n"
-            response += "• Book lending (maximum 5 books for 15 days)\n"
-            response += "• 24/7 digital library access\n"
-            response += "• Study room booking\n"
-            response += "• Research assistance\n"
-            response += "• Printing and scanning facilities"
-            return response
-        
-        if any(word in question_lower for word in ["facility", "campus", "lab", "sports", "cafeteria"]):
-            response = "MIT Manipal offers extensive campus facilities:\n\n"
-            response += "**Library:** Knowledge Resource Centre with 300,000+ books and digital resources\n\n"
-            response += "**Laboratories:** Multiple well-equipped computer labs, engineering labs, and advanced research facilities\n\n"
-            response += "**Sports Facilities:**\n"
-            response += "• Indoor: Basketball, Badminton, Table Tennis, Gym, Squash\n"
-            response += "• Outdoor: Cricket, Football, Tennis, Volleyball, Athletics\n"
-            response += "• Sports complex with courts, fields, and gymnasium\n\n"
-            response += "**Cafeterias:** Multiple food courts serving Indian, Chinese, Continental, and Fast Food (7 AM - 10 PM)\n\n"
-            response += "**Medical:** Campus health center with doctors and 24/7 ambulance service\n\n"
-            response += "**Technology:** Campus-wide high-speed Wi-Fi available 24/7\n\n"
-            response += "**Transportation:** Regular bus service within campus and to nearby areas"
-            return response
-        
-        # General helpful response
-        response = "I'm here to help you with information about MIT Manipal! I can provide details about:\n\n"
-        response += "• Academic programs (B.Tech, M.Tech, MBA)\n"
-        response += "• Fee structure and scholarships\n"
-        response += "• Hostel facilities and accommodation\n"
-        response += "• Admission process and requirements\n"
-        response += "• Campus facilities (library, labs, sports, cafeterias)\n"
-        response += "• Campus life and activities\n\n"
-        response += "What specific information would you like to know? Feel free to ask me anything about MIT Manipal!"
-        return response
+        return self.intents.answer(question)
         
     def _fallback_response(self, question: str) -> Dict:
         """Fallback response when RAG system is not initialized"""
-        answer = self._detailed_fallback_response(question.lower(), {})
+        set_path("fallback")
+        with stage("rule_based"):
+            answer = self._detailed_fallback_response(question)
         return {
             "answer": answer,
             "sources": ["general_knowledge"],
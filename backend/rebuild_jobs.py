@@ -0,0 +1,66 @@
+"""
+Background knowledge-base rebuild jobs with pollable status
+"""
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, Optional
+
+
+class RebuildJobs:
+    def __init__(self, rebuild: Callable[[], Dict], history: int = 20):
+        self.rebuild = rebuild
+        self.history = history
+        # One worker: rebuilds never run concurrently with each other
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="kb-rebuild")
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()
+
+    def submit(self) -> Dict:
+        """Queue a rebuild, or return the one already queued/running"""
+        with self._lock:
+            for job in self._jobs.values():
+                if job["status"] in ("queued", "running"):
+                    return dict(job)
+
+            job_id = uuid.uuid4().hex
+            job = {
+                "job_id": job_id,
+                "status": "queued",
+                "created_at": datetime.now().isoformat(),
+                "started_at": None,
+                "finished_at": None,
+                "result": None,
+                "error": None
+            }
+            self._jobs[job_id] = job
+            while len(self._jobs) > self.history:
+                self._jobs.popitem(last=False)
+            self._executor.submit(self._run, job_id)
+            return dict(job)
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def _run(self, job_id: str):
+        self._update(job_id, status="running", started_at=datetime.now().isoformat())
+        try:
+            result = self.rebuild()
+            self._update(job_id, status="succeeded", result=result)
+        except Exception as e:
+            print(f"Knowledge base rebuild {job_id} failed: {e}")
+            self._update(job_id, status="failed", error=str(e))
+        finally:
+            self._update(job_id, finished_at=datetime.now().isoformat())
+
+    def _update(self, job_id: str, **fields):
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs[job_id].update(fields)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
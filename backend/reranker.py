@@ -0,0 +1,165 @@
+"""
+Cross-encoder reranking between retrieval and generation
+
+A small CPU cross-encoder reads each (question, chunk) pair jointly, which
+orders candidates better than comparing two independently computed vectors.
+The cost grows with the number of pairs, so the candidate depth is chosen per
+request from a latency budget and the measured cost per pair. Reranking is
+skipped when the dense retriever's top hit already leads by a clear margin,
+and scores are cached per (question, chunk) so repeated questions only pay for
+chunks they haven't seen.
+"""
+import hashlib
+import heapq
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+
+def question_key(question: str) -> str:
+    return hashlib.sha1(re.sub(r"\s+", " ", question.strip().lower()).encode("utf-8")).hexdigest()
+
+
+class CrossEncoderReranker:
+    def __init__(self, model_name: str = None, budget_ms: float = None, min_depth: int = None,
+                 max_depth: int = None, skip_margin: float = None, cache_size: int = None):
+        self.model_name = model_name or os.getenv("RAG_RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+        self.budget_ms = budget_ms if budget_ms is not None else float(os.getenv("RAG_RERANK_BUDGET_MS", "80"))
+        self.min_depth = min_depth or int(os.getenv("RAG_RERANK_MIN_DEPTH", "8"))
+        self.max_depth = max_depth or int(os.getenv("RAG_RERANK_MAX_DEPTH", "40"))
+        # In the dense retriever's score units: cosine for "numpy", negative squared L2
+        # (2 * cosine - 2 for normalized vectors) for "chroma"
+        self.skip_margin = skip_margin if skip_margin is not None else float(os.getenv("RAG_RERANK_SKIP_MARGIN", "0.15"))
+        self.cache_size = cache_size or int(os.getenv("RAG_RERANK_CACHE_SIZE", "50000"))
+        self._model = None
+        self._load_lock = threading.Lock()
+        # One forward pass at a time; concurrent passes would only split the same CPU cores
+        self._predict_lock = threading.Lock()
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        # Fixed cost of a forward pass and cost per pair, refined from observed passes
+        self._overhead_ms = 5.0
+        self._pair_ms = 2.0
+        self._stats_lock = threading.Lock()
+        self._requests = 0
+        self._reranked = 0
+        self._skipped = 0
+        self._pairs_scored = 0
+        self._cache_hits = 0
+        self._depth_total = 0
+        self._added_ms_total = 0.0
+        self._added_ms_max = 0.0
+
+    def load(self):
+        with self._load_lock:
+            if self._model is not None:
+                return
+            from sentence_transformers import CrossEncoder
+
+            model = CrossEncoder(self.model_name, max_length=256, device="cpu")
+            # Calibrate the cost model on one small and one full-depth pass
+            pair = ("warm up", "warm up " * 40)
+            model.predict([pair])
+            start = time.perf_counter()
+            model.predict([pair])
+            one = (time.perf_counter() - start) * 1000
+            start = time.perf_counter()
+            model.predict([pair] * self.max_depth, batch_size=self.max_depth)
+            full = (time.perf_counter() - start) * 1000
+            self._pair_ms = max((full - one) / max(self.max_depth - 1, 1), 0.01)
+            self._overhead_ms = max(one - self._pair_ms, 0.0)
+            self._model = model
+
+    def depth(self, top_k: int) -> int:
+        """How many candidates to retrieve so that scoring them fits the latency budget"""
+        affordable = int((self.budget_ms - self._overhead_ms) / self._pair_ms)
+        return max(top_k, min(max(affordable, self.min_depth), self.max_depth))
+
+    def _observe(self, pairs: int, elapsed_ms: float):
+        # Exponential moving average of the per-pair cost, overhead held fixed
+        observed = max((elapsed_ms - self._overhead_ms) / pairs, 0.01)
+        self._pair_ms = 0.8 * self._pair_ms + 0.2 * observed
+
+    def _cached(self, key: Tuple[str, str]) -> Optional[float]:
+        with self._cache_lock:
+            score = self._cache.get(key)
+            if score is not None:
+                self._cache.move_to_end(key)
+            return score
+
+    def _store(self, scores: Dict[Tuple[str, str], float]):
+        with self._cache_lock:
+            self._cache.update(scores)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def is_decisive(self, hits: List[Dict]) -> bool:
+        """The dense top hit leads the runner-up by at least skip_margin"""
+        if len(hits) < 2:
+            return True
+        # Hybrid hits come in fused order and carry the dense score separately (None if only BM25 found them)
+        scores = [hit.get("dense_score", hit["score"]) for hit in hits]
+        top = heapq.nlargest(2, (score for score in scores if score is not None))
+        if len(top) < 2:
+            return False
+        return top[0] - top[1] >= self.skip_margin
+
+    def rerank(self, question: str, hits: List[Dict], top_k: int) -> List[Dict]:
+        """The top_k hits by cross-encoder score (in "rerank_score"), best first"""
+        start = time.perf_counter()
+        if self.is_decisive(hits):
+            with self._stats_lock:
+                self._requests += 1
+                self._skipped += 1
+            return hits[:top_k]
+
+        qkey = question_key(question)
+        scores = [self._cached((qkey, hit["id"])) for hit in hits]
+        missing = [i for i, score in enumerate(scores) if score is None]
+        if missing:
+            self.load()
+            pass_start = time.perf_counter()
+            with self._predict_lock:
+                predicted = self._model.predict(
+                    [(question, hits[i]["text"]) for i in missing],
+                    batch_size=len(missing),
+                    show_progress_bar=False
+                )
+            self._observe(len(missing), (time.perf_counter() - pass_start) * 1000)
+            new_scores = {}
+            for i, score in zip(missing, predicted):
+                scores[i] = float(score)
+                new_scores[(qkey, hits[i]["id"])] = scores[i]
+            self._store(new_scores)
+
+        order = sorted(range(len(hits)), key=lambda i: scores[i], reverse=True)[:top_k]
+        added_ms = (time.perf_counter() - start) * 1000
+        with self._stats_lock:
+            self._requests += 1
+            self._reranked += 1
+            self._pairs_scored += len(missing)
+            self._cache_hits += len(hits) - len(missing)
+            self._depth_total += len(hits)
+            self._added_ms_total += added_ms
+            self._added_ms_max = max(self._added_ms_max, added_ms)
+        return [{**hits[i], "rerank_score": scores[i]} for i in order]
+
+    def stats(self) -> Dict:
+        with self._stats_lock:
+            return {
+                "model": self.model_name,
+                "budget_ms": self.budget_ms,
+                "current_depth": self.depth(0),
+                "ms_per_pair": round(self._pair_ms, 3),
+                "requests": self._requests,
+                "reranked": self._reranked,
+                "skipped_decisive": self._skipped,
+                "pairs_scored": self._pairs_scored,
+                "cache_hits": self._cache_hits,
+                "avg_depth": round(self._depth_total / self._reranked, 1) if self._reranked else 0.0,
+                "avg_added_ms": round(self._added_ms_total / self._reranked, 2) if self._reranked else 0.0,
+                "max_added_ms": round(self._added_ms_max, 2)
+            }
@@ -0,0 +1,460 @@
+"""
+Retrieval backends behind RAGSystem.query
+
+All backends return hits as dicts with "id", "text", "metadata" and "score"
+(higher is better), best first. Hybrid hits also carry the dense retriever's
+score as "dense_score" (None for chunks only BM25 found). get() looks chunks
+up by ID and returns the same dicts without a score.
+"""
+import os
+import tempfile
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from bm25 import BM25Index
+
+QUANTIZATIONS = ("int8", "binary")
+# Rows per block when quantizing or scanning codes, and (queries x rows) cells scored at once,
+# so temporaries stay small
+_BLOCK_ROWS = 16384
+_SCAN_CELLS = 1 << 20
+
+if hasattr(np, "bitwise_count"):
+    _popcount = np.bitwise_count
+    # Popcount eight bytes at a time
+    _POPCOUNT_WORD = np.dtype(np.uint64)
+else:
+    _POPCOUNT_TABLE = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+    _POPCOUNT_WORD = np.dtype(np.uint8)
+
+    def _popcount(x):
+        return _POPCOUNT_TABLE[x]
+
+
+def _unit_rows(vectors) -> np.ndarray:
+    rows = np.asarray(vectors, dtype=np.float32)
+    if rows.ndim == 1:
+        rows = rows.reshape(1, -1)
+    norms = np.linalg.norm(rows, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return rows / norms
+
+
+def int8_scale(matrix) -> np.ndarray:
+    """Per-dimension step that maps the largest magnitude seen in that dimension to 127"""
+    peak = np.zeros(matrix.shape[1], dtype=np.float32)
+    for start in range(0, len(matrix), _BLOCK_ROWS):
+        np.maximum(peak, np.abs(matrix[start:start + _BLOCK_ROWS]).max(axis=0), out=peak)
+    peak[peak == 0] = 1.0
+    return peak / 127.0
+
+
+def column_mean(matrix) -> np.ndarray:
+    """Per-dimension mean; sentence embeddings are offset from zero, so bits are taken around it"""
+    total = np.zeros(matrix.shape[1], dtype=np.float64)
+    for start in range(0, len(matrix), _BLOCK_ROWS):
+        total += matrix[start:start + _BLOCK_ROWS].sum(axis=0, dtype=np.float64)
+    return (total / max(len(matrix), 1)).astype(np.float32)
+
+
+def quantize(matrix, mode: str, scale=None, center=None) -> np.ndarray:
+    """Codes for normalized float rows: int8 steps of scale, or bits above center packed eight to a byte"""
+    n, dim = matrix.shape
+    if mode == "int8":
+        codes = np.empty((n, dim), dtype=np.int8)
+        for start in range(0, n, _BLOCK_ROWS):
+            block = matrix[start:start + _BLOCK_ROWS] / scale
+            codes[start:start + _BLOCK_ROWS] = np.clip(np.rint(block), -127, 127)
+    elif mode == "binary":
+        codes = np.empty((n, (dim + 7) // 8), dtype=np.uint8)
+        for start in range(0, n, _BLOCK_ROWS):
+            codes[start:start + _BLOCK_ROWS] = np.packbits(matrix[start:start + _BLOCK_ROWS] > center, axis=1)
+    else:
+        raise ValueError(f"Unknown quantization '{mode}' (expected one of: {', '.join(QUANTIZATIONS)})")
+    return codes
+
+
+def _hamming(codes, bits) -> np.ndarray:
+    """(queries x rows) Hamming distances between packed bit rows"""
+    if codes.shape[1] % _POPCOUNT_WORD.itemsize == 0:
+        codes = codes.view(_POPCOUNT_WORD)
+        bits = bits.view(_POPCOUNT_WORD)
+    return _popcount(codes[None, :, :] ^ bits[:, None, :]).sum(axis=2, dtype=np.int32)
+
+
+class Retriever:
+    name = "base"
+
+    def search(self, query_vector, top_k: int, source: Optional[str] = None, query_text: str = None) -> List[Dict]:
+        """Top-k hits for one query vector, optionally restricted to one source"""
+        query_texts = [query_text] if query_text is not None else None
+        return self.search_many(np.asarray(query_vector, dtype=np.float32).reshape(1, -1), top_k, source, query_texts)[0]
+
+    def search_many(self, query_vectors, top_k: int, source: Optional[str] = None,
+                    query_texts: List[str] = None) -> List[List[Dict]]:
+        """Top-k hits for each row of a (queries x dim) matrix; dense backends ignore query_texts"""
+        raise NotImplementedError
+
+    def get(self, ids: List[str]) -> List[Dict]:
+        """Chunks by ID, in the given order; unknown IDs are skipped"""
+        raise NotImplementedError
+
+    def count(self) -> int:
+        raise NotImplementedError
+
+
+class ChromaRetriever(Retriever):
+    """Queries a Chroma collection (HNSW index on disk)"""
+    name = "chroma"
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def search_many(self, query_vectors, top_k: int, source: Optional[str] = None,
+                    query_texts: List[str] = None) -> List[List[Dict]]:
+        query_vectors = np.asarray(query_vectors, dtype=np.float32)
+        if len(query_vectors) == 0:
+            return []
+        results = self.collection.query(
+            query_embeddings=query_vectors.tolist(),
+            n_results=top_k,
+            where={"source": source} if source else None,
+            include=["documents", "metadatas", "distances"]
+        )
+        hits = []
+        for q in range(len(query_vectors)):
+            ids = results["ids"][q] if results["ids"] else []
+            hits.append([
+                {
+                    "id": ids[i],
+                    "text": results["documents"][q][i],
+                    "metadata": results["metadatas"][q][i],
+                    "score": -float(results["distances"][q][i])
+                }
+                for i in range(len(ids))
+            ])
+        return hits
+
+    def get(self, ids: List[str]) -> List[Dict]:
+        if not ids:
+            return []
+        results = self.collection.get(ids=list(ids), include=["documents", "metadatas"])
+        by_id = {
+            chunk_id: {"id": chunk_id, "text": text, "metadata": metadata}
+            for chunk_id, text, metadata in zip(results["ids"], results["documents"], results["metadatas"])
+        }
+        return [by_id[chunk_id] for chunk_id in ids if chunk_id in by_id]
+
+    def count(self) -> int:
+        return self.collection.count()
+
+
+class NumpyRetriever(Retriever):
+    """Brute-force cosine search over an in-memory, row-normalized float32 matrix.
+
+    For a knowledge base of a few thousand chunks one matmul plus argpartition
+    is far cheaper than a round trip through Chroma's client and HNSW index.
+    """
+    name = "numpy"
+
+    def __init__(self, ids: List[str], texts: List[str], metadatas: List[Dict], embeddings):
+        matrix = np.ascontiguousarray(embeddings, dtype=np.float32).reshape(len(ids), -1)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        self.matrix = matrix / norms
+        self.ids = list(ids)
+        self.texts = list(texts)
+        self.metadatas = list(metadatas)
+        self._index_sources()
+
+    def _index_sources(self):
+        # Row numbers per source, so filtered search only touches those rows
+        by_source = {}
+        for row, metadata in enumerate(self.metadatas):
+            by_source.setdefault((metadata or {}).get("source"), []).append(row)
+        self._source_rows = {source: np.asarray(rows, dtype=np.int64) for source, rows in by_source.items()}
+        self._rows = None
+
+    @classmethod
+    def from_collection(cls, collection, batch_size: int = 5000) -> "NumpyRetriever":
+        """Copy every vector of a Chroma collection into memory"""
+        ids, texts, metadatas, chunks = [], [], [], []
+        total = collection.count()
+        for offset in range(0, total, batch_size):
+            batch = collection.get(
+                include=["embeddings", "documents", "metadatas"],
+                limit=batch_size,
+                offset=offset
+            )
+            ids.extend(batch["ids"])
+            texts.extend(batch["documents"])
+            metadatas.extend(batch["metadatas"])
+            chunks.append(np.asarray(batch["embeddings"], dtype=np.float32))
+        dim = chunks[0].shape[1] if chunks else 0
+        embeddings = np.concatenate(chunks) if chunks else np.zeros((0, dim), dtype=np.float32)
+        return cls(ids, texts, metadatas, embeddings)
+
+    def search_many(self, query_vectors, top_k: int, source: Optional[str] = None,
+                    query_texts: List[str] = None) -> List[List[Dict]]:
+        queries = _unit_rows(query_vectors)
+
+        if source is None:
+            rows = None
+            matrix = self.matrix
+        else:
+            rows = self._source_rows.get(source)
+            if rows is None:
+                return [[] for _ in range(len(queries))]
+            matrix = self.matrix[rows]
+
+        n = matrix.shape[0]
+        k = min(top_k, n)
+        if k == 0:
+            return [[] for _ in range(len(queries))]
+
+        scores = queries @ matrix.T  # (queries, n)
+        if k < n:
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        else:
+            top = np.tile(np.arange(n), (len(queries), 1))
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+
+        hits = []
+        for q in range(len(queries)):
+            row_hits = []
+            for j in range(k):
+                row = int(top[q, j]) if rows is None else int(rows[top[q, j]])
+                row_hits.append({
+                    "id": self.ids[row],
+                    "text": self.texts[row],
+                    "metadata": self.metadatas[row],
+                    "score": float(top_scores[q, j])
+                })
+            hits.append(row_hits)
+        return hits
+
+    def get(self, ids: List[str]) -> List[Dict]:
+        if self._rows is None:
+            self._rows = {chunk_id: row for row, chunk_id in enumerate(self.ids)}
+        rows = [self._rows[chunk_id] for chunk_id in ids if chunk_id in self._rows]
+        return [{"id": self.ids[row], "text": self.texts[row], "metadata": self.metadatas[row]} for row in rows]
+
+    def count(self) -> int:
+        return len(self.ids)
+
+
+class MmapRetriever(NumpyRetriever):
+    """NumpyRetriever over a read-only memory-mapped matrix of already normalized rows.
+
+    Several processes mapping the same file share one copy in the page cache.
+    """
+    name = "mmap"
+
+    def __init__(self, ids: List[str], texts: List[str], metadatas: List[Dict], matrix):
+        self.matrix = matrix
+        self.ids = list(ids)
+        self.texts = list(texts)
+        self.metadatas = list(metadatas)
+        self._index_sources()
+
+
+class QuantizedRetriever(NumpyRetriever):
+    """Search over compressed codes, then exact rescoring of a small candidate set.
+
+    "int8" keeps one byte per dimension (4x smaller than float32), "binary" one
+    bit (32x smaller), set when the value is above the corpus mean for that
+    dimension, compared by Hamming distance. The best
+    rescore_factor * top_k candidates by code are rescored against the float32
+    rows, which are normally memory-mapped, so only candidate rows are read.
+    """
+    name = "quantized"
+
+    def __init__(self, ids: List[str], texts: List[str], metadatas: List[Dict], matrix, mode: str,
+                 codes=None, scale=None, center=None, rescore_factor: int = None, spool=None):
+        if mode not in QUANTIZATIONS:
+            raise ValueError(f"Unknown quantization '{mode}' (expected one of: {', '.join(QUANTIZATIONS)})")
+        # Normalized float32 rows, read only for rescoring
+        self.matrix = matrix
+        self.mode = mode
+        if mode == "int8" and scale is None:
+            scale = int8_scale(matrix)
+        if mode == "binary" and center is None:
+            center = column_mean(matrix)
+        self.scale = scale
+        self.center = center
+        self.codes = codes if codes is not None else quantize(matrix, mode, scale, center)
+        self.rescore_factor = rescore_factor or int(os.getenv("RAG_QUANTIZATION_RESCORE", "8"))
+        # Keeps the unlinked file behind a spooled matrix open
+        self._spool = spool
+        self.ids = list(ids)
+        self.texts = list(texts)
+        self.metadatas = list(metadatas)
+        self._index_sources()
+
+    @classmethod
+    def from_collection(cls, collection, mode: str, batch_size: int = 5000) -> "QuantizedRetriever":
+        """Stream a Chroma collection into codes; the float rows go to an unlinked temporary file"""
+        ids, texts, metadatas = [], [], []
+        total = collection.count()
+        spool = tempfile.TemporaryFile()
+        matrix = None
+        for offset in range(0, total, batch_size):
+            batch = collection.get(
+                include=["embeddings", "documents", "metadatas"],
+                limit=batch_size,
+                offset=offset
+            )
+            vectors = _unit_rows(batch["embeddings"])
+            if matrix is None:
+                matrix = np.memmap(spool, dtype=np.float32, mode="w+", shape=(total, vectors.shape[1]))
+            matrix[offset:offset + len(vectors)] = vectors
+            ids.extend(batch["ids"])
+            texts.extend(batch["documents"])
+            metadatas.extend(batch["metadatas"])
+        if matrix is None:
+            matrix = np.zeros((0, 0), dtype=np.float32)
+        return cls(ids, texts, metadatas, matrix, mode, spool=spool)
+
+    def _candidates(self, queries: np.ndarray, rows, depth: int) -> np.ndarray:
+        """(queries x depth) row positions with the best scores from the codes alone.
+
+        Scans the codes once for all queries, a block at a time, keeping a running
+        top-depth per query, so each block is decoded once per call and nothing
+        the size of (queries x rows) is allocated.
+        """
+        n = len(self.codes) if rows is None else len(rows)
+        if self.mode == "int8":
+            scaled = queries * self.scale
+        else:
+            bits = np.packbits(queries > self.center, axis=1)
+        block_rows = min(_BLOCK_ROWS, max(256, _SCAN_CELLS // len(queries)))
+        best_scores = np.empty((len(queries), 0), dtype=np.float32)
+        best = np.empty((len(queries), 0), dtype=np.int64)
+        for start in range(0, n, block_rows):
+            if rows is None:
+                block = self.codes[start:start + block_rows]
+            else:
+                block = self.codes[rows[start:start + block_rows]]
+            if self.mode == "int8":
+                scores = scaled @ block.astype(np.float32).T
+            else:
+                scores = -_hamming(block, bits).astype(np.float32)
+            positions = np.broadcast_to(np.arange(start, start + len(block)), scores.shape)
+            best_scores = np.concatenate([best_scores, scores], axis=1)
+            best = np.concatenate([best, positions], axis=1)
+            if best.shape[1] > depth:
+                keep = np.argpartition(-best_scores, depth - 1, axis=1)[:, :depth]
+                best_scores = np.take_along_axis(best_scores, keep, axis=1)
+                best = np.take_along_axis(best, keep, axis=1)
+        return best
+
+    def search_many(self, query_vectors, top_k: int, source: Optional[str] = None,
+                    query_texts: List[str] = None) -> List[List[Dict]]:
+        queries = _unit_rows(query_vectors)
+        if source is None:
+            rows = None
+            n = len(self.codes)
+        else:
+            rows = self._source_rows.get(source)
+            if rows is None:
+                return [[] for _ in range(len(queries))]
+            n = len(rows)
+        k = min(top_k, n)
+        if k == 0:
+            return [[] for _ in range(len(queries))]
+        depth = min(n, k * max(1, self.rescore_factor))
+
+        hits = []
+        for query, candidates in zip(queries, self._candidates(queries, rows, depth)):
+            if rows is not None:
+                candidates = rows[candidates]
+            # Ascending row order reads the mapped float rows front to back
+            candidates = np.sort(candidates)
+            exact = self.matrix[candidates] @ query
+            order = np.argsort(-exact)[:k]
+            hits.append([
+                {
+                    "id": self.ids[int(candidates[j])],
+                    "text": self.texts[int(candidates[j])],
+                    "metadata": self.metadatas[int(candidates[j])],
+                    "score": float(exact[j])
+                }
+                for j in order
+            ])
+        return hits
+
+
+class HybridRetriever(Retriever):
+    """Dense hits fused with BM25 hits by reciprocal rank fusion.
+
+    Each list contributes 1 / (rrf_k + rank) per hit, so a chunk that only the
+    lexical side finds (an exact "MET" or "Block B") still reaches the top-k,
+    and one both sides agree on ranks first. Scores are not comparable across
+    the two lists, which is why only ranks are used.
+    """
+    name = "hybrid"
+
+    def __init__(self, dense: Retriever, lexical: BM25Index, rrf_k: int = None, depth: int = None):
+        self.dense = dense
+        self.lexical = lexical
+        self.rrf_k = rrf_k or int(os.getenv("RAG_RRF_K", "60"))
+        # How many hits to take from each side before fusing
+        self.depth = depth or int(os.getenv("RAG_HYBRID_DEPTH", "20"))
+
+    def search_many(self, query_vectors, top_k: int, source: Optional[str] = None,
+                    query_texts: List[str] = None) -> List[List[Dict]]:
+        depth = max(self.depth, top_k)
+        dense_hits = self.dense.search_many(query_vectors, depth, source)
+        if not query_texts:
+            return [hits[:top_k] for hits in dense_hits]
+
+        fused = []
+        for hits, text in zip(dense_hits, query_texts):
+            scores = {}
+            by_id = {}
+            # Kept for consumers that look at the dense margin (the reranker's skip check)
+            dense_scores = {hit["id"]: hit["score"] for hit in hits}
+            for ranked in (hits, self.lexical.search(text, depth, source)):
+                for rank, hit in enumerate(ranked):
+                    scores[hit["id"]] = scores.get(hit["id"], 0.0) + 1.0 / (self.rrf_k + rank + 1)
+                    by_id.setdefault(hit["id"], hit)
+            best = sorted(scores, key=scores.get, reverse=True)[:top_k]
+            fused.append([
+                {**by_id[chunk_id], "score": scores[chunk_id], "dense_score": dense_scores.get(chunk_id)}
+                for chunk_id in best
+            ])
+        return fused
+
+    def get(self, ids: List[str]) -> List[Dict]:
+        return self.dense.get(ids)
+
+    def count(self) -> int:
+        return self.dense.count()
+
+
+RETRIEVERS = {
+    "chroma": ChromaRetriever,
+    "numpy": NumpyRetriever
+}
+
+
+def make_retriever(kind: str, collection, lexical: BM25Index = None, quantization: str = None) -> Retriever:
+    """Build the configured retriever over a Chroma collection, fused with BM25 when a lexical index is given.
+
+    A quantization replaces the dense search of either kind with a QuantizedRetriever.
+    """
+    if quantization:
+        dense = QuantizedRetriever.from_collection(collection, quantization)
+    elif kind == "numpy":
+        dense = NumpyRetriever.from_collection(collection)
+    elif kind == "chroma":
+        dense = ChromaRetriever(collection)
+    else:
+        raise ValueError(f"Unknown retriever '{kind}' (expected one of: {', '.join(RETRIEVERS)})")
+    if lexical is None:
+        return dense
+    return HybridRetriever(dense, lexical)
@@ -0,0 +1,151 @@
+"""
+Multi-process server: build once, load once, fork workers that share memory
+
+    python serve.py --workers 4 --port 8000
+
+uvicorn --workers starts each worker from scratch, so every process loads its
+own copy of the embedding model and opens its own Chroma client, and all of
+them may try to build at once. Here instead:
+
+1. The knowledge base is built (or brought up to date) in a separate process
+   holding the build lock, and the active version is exported as a read-only
+   memory-mapped index (RAG_SHARED_INDEX).
+2. This process loads the embedding model weights and maps the index, without
+   running any inference, so no torch thread pools exist yet. An ONNX encoder
+   (RAG_ENCODER) checks its export here on a throwaway session and opens its
+   serving session in each worker.
+3. Workers are forked from it: model weights, the BM25 arrays and the mapped
+   vectors are shared copy-on-write instead of duplicated, so each extra
+   worker costs little more than its own interpreter state.
+
+Workers serve on one shared listening socket and are restarted if they die.
+A rebuild requested from any worker takes the build lock, publishes the new
+version, and the other workers switch to it within
+RAG_SHARED_INDEX_POLL_SECONDS. Local generators and the reranker are loaded
+per worker. Needs fork, so POSIX only; use run.py elsewhere.
+"""
+import argparse
+import gc
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+import time
+
+os.environ.setdefault("RAG_SHARED_INDEX", "1")
+
+
+def _build_knowledge_base():
+    """Runs in a spawned process, so the server process never runs the model"""
+    from data_collector import DataCollector
+    from rag_system import RAGSystem
+
+    rag = RAGSystem()
+    if not rag.embedding_model:
+        return
+    if not rag.is_initialized():
+        print("Knowledge base not found. Collecting data...")
+        DataCollector().collect_all_data()
+    # Brings the collection up to date and exports it (a no-op if another process just did)
+    rag.initialize()
+
+
+def _run_worker(sock: socket.socket, threads: int):
+    import uvicorn
+
+    import main
+
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    try:
+        import torch
+
+        torch.set_num_threads(threads)
+    except ImportError:  # ONNX encoder without torch installed
+        pass
+    server = uvicorn.Server(uvicorn.Config(main.app, log_level="info"))
+    server.run(sockets=[sock])
+
+
+def _fork_worker(sock: socket.socket, threads: int) -> int:
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            _run_worker(sock, threads)
+        except BaseException as e:
+            print(f"Worker {os.getpid()} failed: {e}")
+            code = 1
+        finally:
+            os._exit(code)
+    return pid
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=int(os.getenv("RAG_WORKERS", "2")))
+    args = parser.parse_args()
+    if not hasattr(os, "fork"):
+        sys.exit("serve.py needs fork(); use run.py on this platform")
+    threads = int(os.getenv("RAG_TORCH_THREADS", str(max(1, (os.cpu_count() or 1) // args.workers))))
+    os.environ.setdefault("RAG_ONNX_INTRA_OP_THREADS", str(threads))
+
+    builder = multiprocessing.get_context("spawn").Process(target=_build_knowledge_base, name="kb-build")
+    builder.start()
+    builder.join()
+    if builder.exitcode != 0:
+        print("Knowledge base build failed; workers will use fallback responses until a rebuild succeeds")
+
+    import main as app_module
+
+    rag_system = app_module.rag_system
+    rag_system.embedding_model
+    rag_system.load_shared_index()
+    # Objects that exist now are shared with the workers; keep the collector from
+    # touching (and so copying) their pages
+    gc.collect()
+    gc.freeze()
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((args.host, args.port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+
+    workers = {_fork_worker(sock, threads) for _ in range(args.workers)}
+    print(f"Serving on {args.host}:{args.port} with {args.workers} workers ({threads} torch threads each)")
+
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in workers:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    while workers:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        workers.discard(pid)
+        if not stopping:
+            print(f"Worker {pid} exited with status {status}, restarting")
+            time.sleep(1)
+            workers.add(_fork_worker(sock, threads))
+    sock.close()
+
+
+if __name__ == "__main__":
+    main()
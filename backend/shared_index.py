@@ -0,0 +1,121 @@
+"""
+Read-only export of the active collection for multi-process serving
+
+Each collection version is written once to <root>/<collection name>/ as a
+normalized float32 matrix (vectors.npy) plus its ids, texts and metadata
+(docs.json), and <root>/CURRENT names the version to serve. Workers map the
+matrix read-only, so however many processes serve it, the vectors sit in the
+page cache once, and none of them needs its own Chroma client. A worker that
+sees CURRENT change maps the new version; old directories are removed with
+their collection.
+
+With a quantization ("int8" or "binary"), the codes are computed from the
+mapped matrix the first time a version is opened that way and saved next to
+it (codes-<mode>.npy, plus the int8 scale or the binary threshold), so they are
+mapped and shared too. The float matrix is then only read for rescoring.
+"""
+import json
+import os
+import shutil
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from retrievers import MmapRetriever, QuantizedRetriever, column_mean, int8_scale, quantize
+
+CURRENT_FILE = "CURRENT"
+
+
+class SharedIndex:
+    def __init__(self, root):
+        self.root = Path(root)
+
+    def current(self) -> Optional[str]:
+        try:
+            return (self.root / CURRENT_FILE).read_text(encoding="utf-8").strip() or None
+        except FileNotFoundError:
+            return None
+
+    def exists(self, name: str) -> bool:
+        return (self.root / name / "docs.json").exists()
+
+    def export(self, collection, batch_size: int = 5000):
+        """Write a collection's vectors and documents (if not already there) and make it CURRENT"""
+        target = self.root / collection.name
+        if not self.exists(collection.name):
+            # Per process, like the codes files: two exporters of the same version never share a staging dir
+            tmp = self.root / f"{collection.name}.{os.getpid()}.tmp"
+            shutil.rmtree(tmp, ignore_errors=True)
+            tmp.mkdir(parents=True)
+            total = collection.count()
+            ids, texts, metadatas = [], [], []
+            matrix = None
+            for offset in range(0, total, batch_size):
+                batch = collection.get(include=["embeddings", "documents", "metadatas"],
+                                       limit=batch_size, offset=offset)
+                vectors = np.asarray(batch["embeddings"], dtype=np.float32)
+                if matrix is None:
+                    # Written in place batch by batch: the whole matrix is never in memory
+                    matrix = np.lib.format.open_memmap(tmp / "vectors.npy", mode="w+", dtype=np.float32,
+                                                       shape=(total, vectors.shape[1]))
+                norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+                norms[norms == 0] = 1.0
+                matrix[offset:offset + len(vectors)] = vectors / norms
+                ids.extend(batch["ids"])
+                texts.extend(batch["documents"])
+                metadatas.extend(batch["metadatas"])
+            if matrix is None:
+                np.save(tmp / "vectors.npy", np.zeros((0, 0), dtype=np.float32))
+            else:
+                matrix.flush()
+                del matrix
+            # docs.json last: its presence marks a complete export
+            with open(tmp / "docs.json", "w", encoding="utf-8") as f:
+                json.dump({"ids": ids, "texts": texts, "metadatas": metadatas}, f, ensure_ascii=False)
+            try:
+                if not self.exists(collection.name):
+                    shutil.rmtree(target, ignore_errors=True)
+                    os.replace(tmp, target)
+            except OSError:
+                if not self.exists(collection.name):
+                    raise
+            # Still here only if another process published the same version first, which workers may map
+            shutil.rmtree(tmp, ignore_errors=True)
+        tmp_current = self.root / f"{CURRENT_FILE}.{os.getpid()}.tmp"
+        tmp_current.write_text(collection.name, encoding="utf-8")
+        os.replace(tmp_current, self.root / CURRENT_FILE)
+
+    def open(self, name: str, quantization: Optional[str] = None):
+        with open(self.root / name / "docs.json", "r", encoding="utf-8") as f:
+            docs = json.load(f)
+        matrix = np.load(self.root / name / "vectors.npy", mmap_mode="r")
+        if not quantization:
+            return MmapRetriever(docs["ids"], docs["texts"], docs["metadatas"], matrix)
+        codes, params = self._codes(name, matrix, quantization)
+        return QuantizedRetriever(
+            docs["ids"], docs["texts"], docs["metadatas"], matrix, quantization, codes=codes,
+            scale=params if quantization == "int8" else None,
+            center=params if quantization == "binary" else None
+        )
+
+    def _codes(self, name: str, matrix, mode: str):
+        """Mapped codes and their scale (int8) or threshold (binary), computed and saved on first use"""
+        codes_path = self.root / name / f"codes-{mode}.npy"
+        params_path = self.root / name / f"params-{mode}.npy"
+        if not codes_path.exists():
+            if mode == "int8":
+                params = int8_scale(matrix)
+                codes = quantize(matrix, mode, scale=params)
+            else:
+                params = column_mean(matrix)
+                codes = quantize(matrix, mode, center=params)
+            # Params first: the codes file marks a complete set
+            for path, array in ((params_path, params), (codes_path, codes)):
+                tmp = path.with_name(f"{path.stem}.{os.getpid()}.tmp.npy")
+                np.save(tmp, array)
+                os.replace(tmp, path)
+        return np.load(codes_path, mmap_mode="r"), np.load(params_path)
+
+    def remove(self, name: str):
+        shutil.rmtree(self.root / name, ignore_errors=True)
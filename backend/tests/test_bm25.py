@@ -0,0 +1,30 @@
+"""
+Saved BM25 index files only load as a matching pair
+
+    python -m pytest tests
+"""
+import shutil
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bm25 import BM25Index
+
+IDS = ["hostel", "library"]
+TEXTS = ["Hostel fees are 1.2 lakh per year", "The library is open until midnight"]
+
+
+def test_round_trip(tmp_path):
+    BM25Index.build(IDS, TEXTS, [{}, {}]).save(tmp_path / "kb")
+    index = BM25Index.load(tmp_path / "kb")
+    assert index.ids == IDS
+    assert index.search("library midnight", 1)[0]["id"] == "library"
+
+
+def test_files_from_different_saves_are_rejected(tmp_path):
+    BM25Index.build(IDS, TEXTS, [{}, {}]).save(tmp_path / "old")
+    BM25Index.build(IDS + ["mess"], TEXTS + ["Mess food is included"], [{}, {}, {}]).save(tmp_path / "kb")
+    # A crash after the new .npz replaced the old one, before the new .json did
+    shutil.copy(tmp_path / "old.json", tmp_path / "kb.json")
+    assert BM25Index.load(tmp_path / "kb") is None
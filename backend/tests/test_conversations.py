@@ -0,0 +1,27 @@
+"""
+Spill file writes are all or nothing
+
+    python -m pytest tests
+"""
+import sqlite3
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from conversations import _SpillFile
+
+
+def test_failed_batch_is_rolled_back(tmp_path):
+    spill = _SpillFile(str(tmp_path / "conversations.db"), 3600)
+    spill.put_many([("a", 1.0, "[]")])
+    with pytest.raises(sqlite3.IntegrityError):
+        # The second row breaks the NOT NULL constraint after the first was inserted
+        spill.put_many([("b", 1.0, "[]"), ("c", None, "[]")])
+    assert spill.take("b") is None
+    assert spill.take("a") == (1.0, "[]")
+    # The connection is usable again
+    spill.put_many([("d", 2.0, "[]")])
+    assert spill.take("d") == (2.0, "[]")
@@ -0,0 +1,49 @@
+"""
+Crash recovery of the on-disk embedding cache
+
+    python -m pytest tests
+"""
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from embedding_store import DIGEST_SIZE, EmbeddingStore
+
+
+class CountingModel:
+    def __init__(self, dim: int):
+        self.dim = dim
+        self.encoded = 0
+
+    def encode(self, texts, batch_size=64, show_progress_bar=False):
+        self.encoded += len(texts)
+        return np.array([[len(text) + i for i in range(self.dim)] for text in texts], dtype=np.float32)
+
+
+def test_torn_append_is_discarded(tmp_path):
+    model = CountingModel(4)
+    store = EmbeddingStore("test-model", 4, cache_dir=str(tmp_path))
+    store.encode(["hostel fees", "library timings"], model)
+
+    # A crash after the vectors and half a digest of the next append were written
+    with open(store.vectors_path, "ab") as f:
+        f.write(np.ones(4, dtype=np.float32).tobytes())
+    with open(store.index_path, "ab") as f:
+        f.write(EmbeddingStore.digest("placements")[:DIGEST_SIZE // 2])
+
+    reopened = EmbeddingStore("test-model", 4, cache_dir=str(tmp_path))
+    assert len(reopened) == 2
+    vectors = reopened.encode(["placements", "admissions"], model)
+    assert model.encoded == 4
+    assert store.index_path.stat().st_size == 4 * DIGEST_SIZE
+    assert store.vectors_path.stat().st_size == 4 * 4 * 4
+
+    # Every row is found again after the repair, in this process and in a fresh one
+    again = EmbeddingStore("test-model", 4, cache_dir=str(tmp_path))
+    result = again.encode(["hostel fees", "library timings", "placements", "admissions"], model)
+    assert model.encoded == 4
+    assert again.hits == 4
+    np.testing.assert_array_equal(result[2:], vectors)
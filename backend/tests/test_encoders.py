@@ -0,0 +1,88 @@
+"""
+Parity check of ONNX encoder exports against their PyTorch reference embeddings
+
+    python -m pytest tests
+"""
+import json
+import sys
+import types
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from encoders import MIN_COSINE, REFERENCE_SENTENCES, OnnxEncoder
+
+DIM = 8
+
+
+class FakeTokenizer:
+    """Encodes each reference sentence as its position in REFERENCE_SENTENCES"""
+
+    def __call__(self, texts, **kwargs):
+        return {"input_ids": np.array([[REFERENCE_SENTENCES.index(text)] for text in texts])}
+
+
+class FakeSession:
+    def __init__(self, vectors):
+        self.vectors = vectors
+
+    def get_inputs(self):
+        return [types.SimpleNamespace(name="input_ids")]
+
+    def run(self, outputs, feeds):
+        return [self.vectors[feeds["input_ids"][:, 0]]]
+
+
+def rotated(reference, cosine, seed=0):
+    """Each row turned away from its reference row to exactly the given cosine similarity"""
+    noise = np.random.default_rng(seed).standard_normal(reference.shape)
+    unit = reference / np.linalg.norm(reference, axis=1, keepdims=True)
+    noise -= np.sum(noise * unit, axis=1, keepdims=True) * unit
+    noise /= np.linalg.norm(noise, axis=1, keepdims=True)
+    return (cosine * unit + np.sqrt(1 - cosine ** 2) * noise).astype(np.float32)
+
+
+@pytest.fixture
+def export(tmp_path, monkeypatch):
+    """An export on disk whose model returns vectors at a chosen cosine from the reference ones"""
+    monkeypatch.delenv("RAG_ONNX_MIN_COSINE", raising=False)
+    monkeypatch.setitem(sys.modules, "onnxruntime", types.SimpleNamespace(__version__="test"))
+    monkeypatch.setitem(sys.modules, "transformers", types.SimpleNamespace(
+        AutoTokenizer=types.SimpleNamespace(from_pretrained=lambda path: FakeTokenizer())
+    ))
+    reference = np.random.default_rng(1).standard_normal((len(REFERENCE_SENTENCES), DIM)).astype(np.float32)
+    model_dir = tmp_path / "test__model"
+    model_dir.mkdir()
+    np.save(model_dir / "reference.npy", reference)
+    for name in ("model.onnx", "model-int8.onnx"):
+        (model_dir / name).write_bytes(b"")
+    with open(model_dir / "encoder.json", "w", encoding="utf-8") as f:
+        json.dump({"model": "test/model", "source": "test", "max_seq_length": 128, "dim": DIM}, f)
+
+    def make(cosine, quantize=False):
+        encoder = OnnxEncoder("test/model", quantize=quantize, model_dir=str(tmp_path))
+        session = FakeSession(rotated(reference, cosine))
+        encoder._new_session = lambda: session
+        return encoder
+
+    return make
+
+
+def test_fp32_export_within_tolerance_loads(export):
+    encoder = export(0.99995).load()
+    assert encoder.parity == pytest.approx(0.99995, abs=1e-5)
+    assert encoder.parity >= MIN_COSINE["onnx"]
+
+
+def test_fp32_export_below_tolerance_is_refused(export):
+    with pytest.raises(ValueError, match="differs from the PyTorch model"):
+        export(0.9995).load()
+
+
+def test_int8_tolerance_is_looser(export):
+    assert export(0.995, quantize=True).load().parity >= MIN_COSINE["onnx-int8"]
+    with pytest.raises(ValueError):
+        export(0.98, quantize=True).load()
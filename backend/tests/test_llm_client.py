@@ -0,0 +1,104 @@
+"""
+Circuit breaker accounting for the bodies of LLM responses
+
+    python -m pytest tests
+"""
+import json
+import sys
+import time
+from pathlib import Path
+
+import pytest
+import requests
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from llm_client import InferenceClient, InferenceError
+
+
+class StreamResponse:
+    status_code = 200
+    headers = {}
+
+    def __init__(self, lines, delay=0.0, error=None):
+        self.lines = lines
+        self.delay = delay
+        self.error = error
+
+    def iter_lines(self, decode_unicode=False):
+        for line in self.lines:
+            time.sleep(self.delay)
+            yield line
+        if self.error is not None:
+            raise self.error
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def token_lines(*texts):
+    return [f"data:{json.dumps({'token': {'text': text}})}" for text in texts]
+
+
+def client_returning(response, failures=1, deadline=15.0):
+    client = InferenceClient(api_url="http://llm.invalid/generate", api_key="test")
+    client.deadline = deadline
+    client.breaker.failure_threshold = failures
+    client.session.post = lambda *args, **kwargs: response
+    return client
+
+
+def test_body_error_opens_the_circuit():
+    client = client_returning(StreamResponse(token_lines("Hello"), error=requests.ConnectionError("reset")))
+    stream = client.stream("prompt", {})
+    assert next(stream) == "Hello"
+    with pytest.raises(InferenceError):
+        list(stream)
+    assert client.breaker.state == "open"
+
+
+def test_deadline_applies_to_the_body():
+    client = client_returning(StreamResponse(token_lines("a", "b", "c", "d"), delay=0.05), deadline=0.12)
+    tokens = []
+    with pytest.raises(InferenceError, match="Deadline"):
+        for token in client.stream("prompt", {}):
+            tokens.append(token)
+    assert len(tokens) < 4
+    assert client.breaker.state == "open"
+
+
+def test_complete_stream_closes_the_circuit():
+    client = client_returning(StreamResponse(token_lines("Hello", " world")), failures=2)
+    client.breaker.record_failure()
+    assert list(client.stream("prompt", {})) == ["Hello", " world"]
+    assert client.breaker._failures == 0
+
+
+class JsonResponse(StreamResponse):
+    def __init__(self, body):
+        super().__init__([])
+        self.body = body
+
+    def json(self):
+        return json.loads(self.body)
+
+
+@pytest.mark.parametrize("body", ["not json", '{"error": "overloaded"}', "[]"])
+def test_unusable_generate_body_opens_the_circuit(body):
+    client = client_returning(JsonResponse(body))
+    with pytest.raises(InferenceError):
+        client.generate("prompt", {})
+    assert client.breaker.state == "open"
+
+
+def test_generate_closes_the_circuit():
+    client = client_returning(JsonResponse('[{"generated_text": "Hello"}]'), failures=2)
+    client.breaker.record_failure()
+    assert client.generate("prompt", {}) == "Hello"
+    assert client.breaker._failures == 0
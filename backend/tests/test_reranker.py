@@ -0,0 +1,35 @@
+"""
+When the dense scores are clear enough to skip reranking
+
+    python -m pytest tests
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from reranker import CrossEncoderReranker
+
+
+def hybrid_hit(score, dense_score):
+    return {"id": str(score), "score": score, "dense_score": dense_score}
+
+
+def test_dense_leader_is_found_outside_the_fused_top_two():
+    reranker = CrossEncoderReranker(skip_margin=0.15)
+    # In fused (RRF) order: a BM25-only hit first, the dense winner third
+    hits = [hybrid_hit(0.033, None), hybrid_hit(0.032, 0.60), hybrid_hit(0.031, 0.90), hybrid_hit(0.030, 0.55)]
+    assert reranker.is_decisive(hits)
+
+
+def test_close_dense_scores_are_not_decisive():
+    reranker = CrossEncoderReranker(skip_margin=0.15)
+    hits = [hybrid_hit(0.033, 0.70), hybrid_hit(0.032, 0.20), hybrid_hit(0.031, 0.65)]
+    assert not reranker.is_decisive(hits)
+    assert not reranker.is_decisive([hybrid_hit(0.033, 0.90), hybrid_hit(0.032, None)])
+
+
+def test_dense_only_hits_use_their_score():
+    reranker = CrossEncoderReranker(skip_margin=0.15)
+    assert reranker.is_decisive([{"score": 0.9}, {"score": 0.5}])
+    assert not reranker.is_decisive([{"score": 0.9}, {"score": 0.8}])
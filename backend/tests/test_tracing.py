@@ -0,0 +1,36 @@
+"""
+Folding per-thread child traces into a request's trace
+
+    python -m pytest tests
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from tracing import Trace
+
+
+def child(path, **stages):
+    trace = Trace()
+    trace.path = path
+    trace.stages.update(stages)
+    return trace
+
+
+def test_merge_adds_stages_and_keeps_a_shared_path():
+    trace = Trace()
+    trace.add("embed", 0.5)
+    trace.merge(child("llm", generate=1.0))
+    trace.merge(child("llm", generate=2.0, prompt=0.25))
+    assert trace.stages == {"embed": 0.5, "generate": 3.0, "prompt": 0.25}
+    assert trace.path == "llm"
+
+
+def test_merge_marks_differing_paths_as_mixed():
+    trace = Trace()
+    trace.merge(child("llm"))
+    trace.merge(child(None))
+    assert trace.path == "llm"
+    trace.merge(child("rule_based"))
+    assert trace.path == "mixed"
@@ -0,0 +1,245 @@
+"""
+Per-request stage timings, answer-path labels and Prometheus metrics
+
+A Trace is started per request and held in a context variable (QueryExecutor
+copies the context into its threads). Work a request fans out to several
+threads at once records into child traces that are merged back on the
+request's own thread, since a Trace isn't locked. Code on the query path wraps its steps
+in stage("embed") etc. and calls set_path() with whatever produced the answer.
+When the request ends, finish() folds the trace into fixed-bucket histograms
+and counters, rendered in Prometheus text format for /metrics. The hot-path
+cost is a context-variable read and two perf_counter() calls per stage, and
+nothing at all outside a traced request.
+
+Set RAG_PROFILE_INTERVAL_MS to run a stack-sampling profiler thread that
+writes collapsed stacks (flamegraph.pl / speedscope input) to
+RAG_PROFILE_OUTPUT every RAG_PROFILE_FLUSH_SECONDS.
+"""
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_current: ContextVar = ContextVar("rag_trace", default=None)
+
+
+class Trace:
+    __slots__ = ("start", "stages", "path")
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.stages = {}
+        self.path = None
+
+    def add(self, name: str, seconds: float):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def merge(self, child: "Trace"):
+        """Fold in the trace of one part of a request that ran on another thread"""
+        for name, seconds in child.stages.items():
+            self.add(name, seconds)
+        if child.path is not None:
+            self.path = child.path if self.path in (None, child.path) else "mixed"
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.start
+
+
+def start_trace() -> Trace:
+    trace = Trace()
+    _current.set(trace)
+    return trace
+
+
+def current() -> Optional[Trace]:
+    return _current.get()
+
+
+class stage:
+    """Adds the time spent in the with-block to the current trace under name"""
+    __slots__ = ("name", "trace", "start")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.trace = _current.get()
+        if self.trace is not None:
+            self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        if self.trace is not None:
+            self.trace.add(self.name, time.perf_counter() - self.start)
+        return False
+
+
+def record_stage(name: str, seconds: float):
+    """For stages that don't fit a with-block, such as time to first streamed token"""
+    trace = _current.get()
+    if trace is not None:
+        trace.add(name, seconds)
+
+
+def set_path(path: str):
+    """Record what answered the request: cache, llm, local, rule_based or fallback"""
+    trace = _current.get()
+    if trace is not None:
+        trace.path = path
+
+
+def record_error(stage_name: str):
+    METRICS.count_error(stage_name)
+
+
+def server_timing(trace: Trace) -> str:
+    """Server-Timing header value, in milliseconds"""
+    parts = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in trace.stages.items()]
+    parts.append(f"total;dur={trace.elapsed() * 1000:.1f}")
+    if trace.path:
+        parts.append(f'path;desc="{trace.path}"')
+    return ", ".join(parts)
+
+
+class Histogram:
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, seconds: float):
+        self.counts[bisect_left(BUCKETS, seconds)] += 1
+        self.total += seconds
+        self.count += 1
+
+
+def _labels(**labels) -> str:
+    return ",".join(f'{key}="{value}"' for key, value in labels.items())
+
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._requests: Dict[tuple, Histogram] = {}
+        self._stages: Dict[str, Histogram] = {}
+        self._errors: Dict[str, int] = {}
+
+    def finish(self, trace: Trace, endpoint: str, status: int = 200):
+        elapsed = trace.elapsed()
+        key = (endpoint, trace.path or "none", status)
+        with self._lock:
+            histogram = self._requests.get(key)
+            if histogram is None:
+                histogram = self._requests[key] = Histogram()
+            histogram.observe(elapsed)
+            for name, seconds in trace.stages.items():
+                histogram = self._stages.get(name)
+                if histogram is None:
+                    histogram = self._stages[name] = Histogram()
+                histogram.observe(seconds)
+
+    def count_error(self, stage_name: str):
+        with self._lock:
+            self._errors[stage_name] = self._errors.get(stage_name, 0) + 1
+
+    @staticmethod
+    def _histogram_lines(name: str, labels: str, histogram: Histogram):
+        cumulative = 0
+        sep = "," if labels else ""
+        for bound, count in zip(BUCKETS, histogram.counts):
+            cumulative += count
+            yield f'{name}_bucket{{{labels}{sep}le="{bound}"}} {cumulative}'
+        yield f'{name}_bucket{{{labels}{sep}le="+Inf"}} {histogram.count}'
+        yield f"{name}_sum{{{labels}}} {histogram.total:.6f}"
+        yield f"{name}_count{{{labels}}} {histogram.count}"
+
+    def render(self, gauges: Dict[str, float] = None, counters: Dict[str, float] = None) -> str:
+        """All metrics in Prometheus text exposition format; counters are named without the _total suffix"""
+        lines = [
+            "# HELP rag_request_duration_seconds End-to-end request latency by endpoint, answer path and status",
+            "# TYPE rag_request_duration_seconds histogram"
+        ]
+        with self._lock:
+            for (endpoint, path, status), histogram in sorted(self._requests.items()):
+                lines.extend(self._histogram_lines(
+                    "rag_request_duration_seconds", _labels(endpoint=endpoint, path=path, status=status), histogram
+                ))
+            lines += [
+                "# HELP rag_stage_duration_seconds Time spent per request in each query stage",
+                "# TYPE rag_stage_duration_seconds histogram"
+            ]
+            for name, histogram in sorted(self._stages.items()):
+                lines.extend(self._histogram_lines("rag_stage_duration_seconds", _labels(stage=name), histogram))
+            lines += ["# HELP rag_errors_total Errors by stage", "# TYPE rag_errors_total counter"]
+            for name, count in sorted(self._errors.items()):
+                lines.append(f"rag_errors_total{{{_labels(stage=name)}}} {count}")
+        for name, value in (gauges or {}).items():
+            lines += [f"# TYPE {name} gauge", f"{name} {value}"]
+        for name, value in (counters or {}).items():
+            lines += [f"# TYPE {name}_total counter", f"{name}_total {value}"]
+        return "\n".join(lines) + "\n"
+
+
+METRICS = Metrics()
+
+
+class SamplingProfiler:
+    """Samples every thread's stack at a fixed interval and aggregates collapsed stacks"""
+
+    def __init__(self, interval_ms: float, output: str, flush_seconds: float = 30.0):
+        self.interval = interval_ms / 1000.0
+        self.output = output
+        self.flush_seconds = flush_seconds
+        self._counts: Dict[str, int] = {}
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        print(f"Sampling profiler on: every {self.interval * 1000:.0f} ms, writing {self.output}")
+
+    def _run(self):
+        own = threading.get_ident()
+        last_flush = time.monotonic()
+        while True:
+            time.sleep(self.interval)
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                names = []
+                while frame is not None:
+                    code = frame.f_code
+                    names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                stack = ";".join(reversed(names))
+                self._counts[stack] = self._counts.get(stack, 0) + 1
+            if time.monotonic() - last_flush >= self.flush_seconds:
+                self.flush()
+                last_flush = time.monotonic()
+
+    def flush(self):
+        tmp = f"{self.output}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            for stack, count in sorted(self._counts.items()):
+                f.write(f"{stack} {count}\n")
+        os.replace(tmp, self.output)
+
+
+def start_profiler_from_env() -> Optional[SamplingProfiler]:
+    interval_ms = float(os.getenv("RAG_PROFILE_INTERVAL_MS", "0"))
+    if interval_ms <= 0:
+        return None
+    profiler = SamplingProfiler(
+        interval_ms,
+        os.getenv("RAG_PROFILE_OUTPUT", f"profile-{os.getpid()}.collapsed"),
+        float(os.getenv("RAG_PROFILE_FLUSH_SECONDS", "30"))
+    )
+    profiler.start()
+    return profiler
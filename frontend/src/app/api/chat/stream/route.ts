@@ -0,0 +1,65 @@
+import { NextRequest, NextResponse } from 'next/server'
+
+const BACKEND_URL = process.env.BACKEND_URL || 'http://localhost:8000'
+
+// Never cache or statically optimise a streaming route
+export const dynamic = 'force-dynamic'
+
+const SSE_HEADERS = {
+  'Content-Type': 'text/event-stream; charset=utf-8',
+  'Cache-Control': 'no-cache, no-transform',
+  'Connection': 'keep-alive',
+  'X-Accel-Buffering': 'no',
+}
+
+function fallbackStream(message: string) {
+  const encoder = new TextEncoder()
+  const events = [
+    `event: sources\ndata: ${JSON.stringify({ sources: [] })}\n\n`,
+    `event: token\ndata: ${JSON.stringify({ text: message })}\n\n`,
+    `event: done\ndata: ${JSON.stringify({ timestamp: new Date().toISOString() })}\n\n`,
+  ]
+  return new ReadableStream({
+    start(controller) {
+      events.forEach(event => controller.enqueue(encoder.encode(event)))
+      controller.close()
+    },
+  })
+}
+
+export async function POST(request: NextRequest) {
+  const { message, conversationId } = await request.json()
+
+  if (!message || typeof message !== 'string') {
+    return NextResponse.json(
+      { error: 'Message is required and must be a string' },
+      { status: 400 }
+    )
+  }
+
+  try {
+    const response = await fetch(`${BACKEND_URL}/api/chat/stream`, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+        'Accept': 'text/event-stream',
+      },
+      body: JSON.stringify({ message, conversation_id: conversationId }),
+      signal: request.signal,
+      cache: 'no-store',
+    })
+
+    if (!response.ok || !response.body) {
+      throw new Error(`Backend responded with status: ${response.status}`)
+    }
+
+    // Hand the backend's byte stream straight to the browser, no buffering
+    return new Response(response.body, { headers: SSE_HEADERS })
+  } catch (backendError) {
+    console.error('Backend error:', backendError)
+    return new Response(
+      fallbackStream('I apologize, but I\'m currently unable to connect to the AI service. Please make sure the backend server is running on port 8000. You can start it by running "python backend/main.py" in the project root.'),
+      { headers: SSE_HEADERS }
+    )
+  }
+}
@@ -28,6 +28,11 @@ const quickActions: QuickAction[] = [
   { id: '6', label: 'Academic Calendar', query: 'Show me the academic calendar' },
 ]
 
+// Lets the backend answer follow-up questions in the context of this chat
+function newConversationId() {
+  return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2, 10)}`
+}
+
 function MessageTimestamp({ timestamp, align }: { timestamp: string; align: 'left' | 'right' }) {
   const [timeString, setTimeString] = useState<string>('')
 
@@ -59,10 +64,12 @@ export default function ChatInterface() {
   ])
   const [inputValue, setInputValue] = useState('')
   const [isLoading, setIsLoading] = useState(false)
+  const [isStreaming, setIsStreaming] = useState(false)
   const [isSidebarOpen, setIsSidebarOpen] = useState(false)
   const [abortController, setAbortController] = useState<AbortController | null>(null)
   const messagesEndRef = useRef<HTMLDivElement>(null)
   const inputRef = useRef<HTMLTextAreaElement>(null)
+  const conversationId = useRef<string>(newConversationId())
 
   const scrollToBottom = () => {
     messagesEndRef.current?.scrollIntoView({ behavior: 'smooth' })
@@ -96,25 +103,63 @@ export default function ChatInterface() {
     setIsLoading(true)
 
     try {
-      const response = await fetch('/api/chat', {
+      const response = await fetch('/api/chat/stream', {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ message: content.trim() }),
+        body: JSON.stringify({ message: content.trim(), conversationId: conversationId.current }),
         signal: controller.signal,
       })
 
-      if (!response.ok) throw new Error('Failed to get response')
-
-      const data = await response.json()
-      
-      const aiMessage: Message = {
-        id: (Date.now() + 1).toString(),
-        type: 'ai',
-        content: data.response || 'I apologize, but I encountered an error. Please try again.',
-        timestamp: new Date().toISOString(),
+      if (!response.ok || !response.body) throw new Error('Failed to get response')
+
+      // Read Server-Sent Events and grow the AI message as tokens arrive
+      const aiMessageId = (Date.now() + 1).toString()
+      const reader = response.body.getReader()
+      const decoder = new TextDecoder()
+      let buffer = ''
+      let answer = ''
+
+      while (true) {
+        const { done, value } = await reader.read()
+        if (done) break
+
+        buffer += decoder.decode(value, { stream: true })
+        const rawEvents = buffer.split('\n\n')
+        buffer = rawEvents.pop() || ''
+
+        for (const rawEvent of rawEvents) {
+          const lines = rawEvent.split('\n')
+          const eventName = lines.find(line => line.startsWith('event:'))?.slice(6).trim()
+          const data = lines.filter(line => line.startsWith('data:')).map(line => line.slice(5)).join('\n')
+          if (eventName !== 'token' || !data) continue
+          const text: string = JSON.parse(data).text || ''
+          if (!text) continue
+
+          const isFirstToken = !answer
+          answer += text
+          if (isFirstToken) {
+            setIsStreaming(true)
+            setMessages(prev => [...prev, {
+              id: aiMessageId,
+              type: 'ai',
+              content: answer,
+              timestamp: new Date().toISOString(),
+            }])
+          } else {
+            const current = answer
+            setMessages(prev => prev.map(m => m.id === aiMessageId ? { ...m, content: current } : m))
+          }
+        }
       }
 
-      setMessages(prev => [...prev, aiMessage])
+      if (!answer) {
+        setMessages(prev => [...prev, {
+          id: aiMessageId,
+          type: 'ai',
+          content: 'I apologize, but I encountered an error. Please try again.',
+          timestamp: new Date().toISOString(),
+        }])
+      }
     } catch (error: any) {
       if (error.name === 'AbortError') {
         const stopMessage: Message = {
@@ -136,6 +181,7 @@ export default function ChatInterface() {
       }
     } finally {
       setIsLoading(false)
+      setIsStreaming(false)
       setAbortController(null)
       inputRef.current?.focus()
     }
@@ -164,6 +210,7 @@ export default function ChatInterface() {
     }])
     setInputValue('')
     setIsSidebarOpen(false)
+    conversationId.current = newConversationId()
   }
 
   const handleKeyPress = (e: React.KeyboardEvent<HTMLTextAreaElement>) => {
@@ -410,7 +457,7 @@ export default function ChatInterface() {
                 ))}
               </AnimatePresence>
 
-              {isLoading && (
+              {isLoading && !isStreaming && (
                 <motion.div
                   initial={{ opacity: 0, y: 10 }}
                   animate={{ opacity: 1, y: 0 }}